@@ -50,6 +50,24 @@ class HeatmapGenerator:
             print(f"Erro ao gerar heatmap: {e}")
             return self._format_heatmap_data()
 
+    def generate_from_cells(self, cells: List[Tuple[int, float]]) -> Dict[str, Any]:
+        """Gerar heatmap a partir de pesos por célula (id = linha * largura + coluna)"""
+        self.heatmap = np.zeros(self.resolution, dtype=np.float32)
+        for cell_id, weight in cells:
+            row, column = divmod(int(cell_id), self.resolution[0])
+            if row < self.resolution[1]:
+                self._add_to_heatmap((column, row), weight)
+        self._normalize_heatmap()
+        return self._format_heatmap_data()
+
+    def get_points(self) -> List[Dict[str, Any]]:
+        """Células com intensidade > 0 (formato esparso para o frontend)"""
+        ys, xs = np.nonzero(self.heatmap)
+        return [
+            {"x": int(x), "y": int(y), "intensity": round(float(self.heatmap[y, x]), 4)}
+            for y, x in zip(ys, xs)
+        ]
+
     def _convert_to_heatmap_coords(self, bbox: List[int], frame_width: int, frame_height: int) -> Tuple[int, int]:
         """Converter coordenadas do frame para heatmap"""
         x1, y1, x2, y2 = bbox
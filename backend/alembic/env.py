@@ -0,0 +1,69 @@
+"""
+Ambiente das migrações Alembic
+
+Usa a mesma URL e os mesmos modelos da aplicação (config.py / database.py).
+"""
+import os
+import sys
+from logging.config import fileConfig
+
+from alembic import context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings  # noqa: E402
+from database import Base, engine  # noqa: E402
+import models.camera  # noqa: E402,F401
+import models.event  # noqa: E402,F401
+import models.event_archive  # noqa: E402,F401
+import models.event_detection  # noqa: E402,F401
+import models.event_rollup  # noqa: E402,F401
+import models.user  # noqa: E402,F401
+
+config = context.config
+
+# Logging do alembic.ini apenas quando executado pela linha de comando
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Gerar SQL sem conexão (alembic upgrade head --sql)"""
+    context.configure(
+        url=settings.database_url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=settings.database_url.startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Aplicar migrações usando a conexão recebida (create_tables) ou o engine da aplicação"""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+
+def _run(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite não suporta ALTER completo; batch recria a tabela quando necessário
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
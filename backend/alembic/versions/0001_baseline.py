@@ -0,0 +1,89 @@
+"""Esquema inicial (tabelas criadas por create_all antes das migrações)
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_baseline'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('username', sa.String(length=100), nullable=False),
+        sa.Column('hashed_password', sa.String(length=255), nullable=False),
+        sa.Column('full_name', sa.String(length=255), nullable=True),
+        sa.Column('role', sa.Enum('ADMIN', 'USER', name='userrole'), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table(
+        'cameras',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('location', sa.String(length=255), nullable=True),
+        sa.Column('stream_url', sa.String(length=500), nullable=False),
+        sa.Column('zone', sa.String(length=50), nullable=True),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('detection_enabled', sa.Boolean(), nullable=False),
+        sa.Column('detection_line', sa.JSON(), nullable=True),
+        sa.Column('detection_zone', sa.JSON(), nullable=True),
+        sa.Column('sensitivity', sa.Integer(), nullable=False),
+        sa.Column('fps', sa.Integer(), nullable=False),
+        sa.Column('resolution', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_cameras_id', 'cameras', ['id'], unique=False)
+
+    op.create_table(
+        'events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('camera_id', sa.Integer(), nullable=True),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('confidence', sa.Float(), nullable=True),
+        sa.Column('image_path', sa.String(length=500), nullable=True),
+        sa.Column('video_path', sa.String(length=500), nullable=True),
+        sa.Column('detected_objects', sa.JSON(), nullable=True),
+        sa.Column('bounding_boxes', sa.JSON(), nullable=True),
+        sa.Column('heatmap_data', sa.JSON(), nullable=True),
+        sa.Column('is_processed', sa.Boolean(), nullable=False),
+        sa.Column('is_notified', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['camera_id'], ['cameras.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_events_id', 'events', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_id', table_name='events')
+    op.drop_table('events')
+    op.drop_index('ix_cameras_id', table_name='cameras')
+    op.drop_table('cameras')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,33 @@
+"""Colunas de agenda de armação das câmeras
+
+Revision ID: 0002_arming_schedule
+Revises: 0001_baseline
+Create Date: 2026-10-19 00:00:01
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_arming_schedule'
+down_revision: Union[str, None] = '0001_baseline'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('cameras') as batch_op:
+        batch_op.add_column(sa.Column('arming_schedule', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('arming_overrides', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('disarmed_mode', sa.String(length=20), nullable=False,
+                                      server_default='capture'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('cameras') as batch_op:
+        batch_op.drop_column('disarmed_mode')
+        batch_op.drop_column('arming_overrides')
+        batch_op.drop_column('arming_schedule')
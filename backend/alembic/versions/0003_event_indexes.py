@@ -0,0 +1,37 @@
+"""Índices compostos para as consultas de eventos
+
+Consultas de eventos filtram por câmera, tipo ou status de notificação e
+ordenam por timestamp decrescente; sem estes índices são varreduras completas.
+
+Revision ID: 0003_event_indexes
+Revises: 0002_arming_schedule
+Create Date: 2026-10-19 00:00:02
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_event_indexes'
+down_revision: Union[str, None] = '0002_arming_schedule'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    'ix_events_timestamp': ['timestamp'],
+    'ix_events_camera_timestamp': ['camera_id', 'timestamp'],
+    'ix_events_type_timestamp': ['event_type', 'timestamp'],
+    'ix_events_notified_timestamp': ['is_notified', 'timestamp'],
+}
+
+
+def upgrade() -> None:
+    for name, columns in INDEXES.items():
+        op.create_index(name, 'events', columns, unique=False)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name='events')
@@ -0,0 +1,68 @@
+"""Agregação horária de eventos (event_rollups)
+
+Cria a tabela e a preenche com os eventos existentes. Depois disso ela é
+mantida pelo ORM a cada INSERT/DELETE de evento; para reconstruí-la use
+scripts/backfill_event_rollups.py.
+
+Revision ID: 0004_event_rollups
+Revises: 0003_event_indexes
+Create Date: 2026-10-19 00:00:03
+
+"""
+from collections import Counter
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004_event_rollups'
+down_revision: Union[str, None] = '0003_event_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    rollups = op.create_table(
+        'event_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('camera_id', sa.Integer(), nullable=False),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('camera_id', 'event_type', 'bucket', name='uq_event_rollups_key'),
+    )
+    op.create_index('ix_event_rollups_bucket', 'event_rollups', ['bucket'], unique=False)
+
+    # Sem conexão (--sql) não há dados para agregar; rode o script de backfill depois
+    if op.get_context().as_sql:
+        return
+
+    events = sa.table(
+        'events',
+        sa.column('camera_id', sa.Integer()),
+        sa.column('event_type', sa.String()),
+        sa.column('timestamp', sa.DateTime(timezone=True)),
+    )
+    counts = Counter()
+    result = op.get_bind().execution_options(yield_per=10000).execute(
+        sa.select(events.c.camera_id, events.c.event_type, events.c.timestamp)
+    )
+    for camera_id, event_type, timestamp in result:
+        if timestamp is not None:
+            bucket = timestamp.replace(minute=0, second=0, microsecond=0)
+            counts[(camera_id or 0, event_type, bucket)] += 1
+
+    rows = [
+        {'camera_id': camera_id, 'event_type': event_type, 'bucket': bucket, 'count': count}
+        for (camera_id, event_type, bucket), count in counts.items()
+    ]
+    if rows:
+        op.bulk_insert(rollups, rows)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_event_rollups_bucket', table_name='event_rollups')
+    op.drop_table('event_rollups')
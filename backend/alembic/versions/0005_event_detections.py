@@ -0,0 +1,52 @@
+"""Tabela normalizada de detecções por evento (event_detections)
+
+Uma linha por objeto detectado, indexada por (classe, câmera, timestamp) para
+consultas filtradas por classe e heatmaps sem varrer os JSONs dos eventos.
+
+Revision ID: 0005_event_detections
+Revises: 0004_event_rollups
+Create Date: 2026-10-19 00:00:04
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005_event_detections'
+down_revision: Union[str, None] = '0004_event_rollups'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'event_detections',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('camera_id', sa.Integer(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('class_id', sa.SmallInteger(), nullable=False),
+        sa.Column('confidence', sa.Float(), nullable=False),
+        sa.Column('x1', sa.SmallInteger(), nullable=False),
+        sa.Column('y1', sa.SmallInteger(), nullable=False),
+        sa.Column('x2', sa.SmallInteger(), nullable=False),
+        sa.Column('y2', sa.SmallInteger(), nullable=False),
+        sa.Column('zone_index', sa.SmallInteger(), nullable=True),
+        sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_event_detections_event_id', 'event_detections', ['event_id'], unique=False)
+    op.create_index('ix_event_detections_class_camera_timestamp', 'event_detections',
+                    ['class_id', 'camera_id', 'timestamp'], unique=False)
+    op.create_index('ix_event_detections_camera_timestamp', 'event_detections',
+                    ['camera_id', 'timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_event_detections_camera_timestamp', table_name='event_detections')
+    op.drop_index('ix_event_detections_class_camera_timestamp', table_name='event_detections')
+    op.drop_index('ix_event_detections_event_id', table_name='event_detections')
+    op.drop_table('event_detections')
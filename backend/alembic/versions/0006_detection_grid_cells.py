@@ -0,0 +1,64 @@
+"""Célula da grade 32x32 nas detecções (consultas por região do frame)
+
+Adiciona event_detections.cell_id (linha * 32 + coluna do centro da caixa) com
+índice (camera_id, cell_id, timestamp) e calcula a célula das linhas existentes.
+
+Revision ID: 0006_detection_grid_cells
+Revises: 0005_event_detections
+Create Date: 2026-10-19 00:00:05
+
+"""
+from collections import defaultdict
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006_detection_grid_cells'
+down_revision: Union[str, None] = '0005_event_detections'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+GRID_SIZE = 32
+BBOX_SCALE = 10000
+
+
+def upgrade() -> None:
+    op.add_column('event_detections', sa.Column('cell_id', sa.SmallInteger(), nullable=True))
+
+    if not op.get_context().as_sql:
+        detections = sa.table(
+            'event_detections',
+            sa.column('id', sa.Integer()),
+            sa.column('x1', sa.SmallInteger()),
+            sa.column('y1', sa.SmallInteger()),
+            sa.column('x2', sa.SmallInteger()),
+            sa.column('y2', sa.SmallInteger()),
+            sa.column('cell_id', sa.SmallInteger()),
+        )
+        bind = op.get_bind()
+        cells = defaultdict(list)
+        for detection_id, x1, y1, x2, y2 in bind.execute(
+            sa.select(detections.c.id, detections.c.x1, detections.c.y1, detections.c.x2, detections.c.y2)
+        ):
+            column = min(GRID_SIZE - 1, (x1 + x2) * GRID_SIZE // (2 * BBOX_SCALE))
+            row = min(GRID_SIZE - 1, (y1 + y2) * GRID_SIZE // (2 * BBOX_SCALE))
+            cells[row * GRID_SIZE + column].append(detection_id)
+        # Uma atualização por célula (no máximo 1024)
+        for cell_id, ids in cells.items():
+            for start in range(0, len(ids), 1000):
+                bind.execute(detections.update().where(detections.c.id.in_(ids[start:start + 1000]))
+                             .values(cell_id=cell_id))
+
+    with op.batch_alter_table('event_detections') as batch_op:
+        batch_op.alter_column('cell_id', existing_type=sa.SmallInteger(), nullable=False)
+    op.create_index('ix_event_detections_camera_cell_timestamp', 'event_detections',
+                    ['camera_id', 'cell_id', 'timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_event_detections_camera_cell_timestamp', table_name='event_detections')
+    with op.batch_alter_table('event_detections') as batch_op:
+        batch_op.drop_column('cell_id')
@@ -0,0 +1,41 @@
+"""Registro dos arquivos mensais de eventos (event_archives)
+
+Revision ID: 0007_event_archives
+Revises: 0006_detection_grid_cells
+Create Date: 2026-10-19 00:00:06
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007_event_archives'
+down_revision: Union[str, None] = '0006_detection_grid_cells'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'event_archives',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('month_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('month_end', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('path', sa.String(length=500), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('event_count', sa.Integer(), nullable=False),
+        sa.Column('detection_count', sa.Integer(), nullable=False),
+        sa.Column('size_bytes', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_event_archives_month_start', 'event_archives', ['month_start'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_event_archives_month_start', table_name='event_archives')
+    op.drop_table('event_archives')
@@ -0,0 +1,35 @@
+"""Políticas de retenção por câmera e tamanho dos arquivos dos eventos
+
+Revision ID: 0008_retention
+Revises: 0007_event_archives
+Create Date: 2026-10-19 00:00:07
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008_retention'
+down_revision: Union[str, None] = '0007_event_archives'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('cameras') as batch_op:
+        batch_op.add_column(sa.Column('retention_days', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('retention_max_mb', sa.Integer(), nullable=True))
+    # Preenchida na gravação do screenshot; eventos antigos são medidos pela retenção
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.add_column(sa.Column('file_bytes', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.drop_column('file_bytes')
+    with op.batch_alter_table('cameras') as batch_op:
+        batch_op.drop_column('retention_max_mb')
+        batch_op.drop_column('retention_days')
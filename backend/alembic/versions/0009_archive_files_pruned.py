@@ -0,0 +1,28 @@
+"""Marca dos arquivos mensais cujos arquivos de eventos já foram removidos
+
+Revision ID: 0009_archive_files_pruned
+Revises: 0008_retention
+Create Date: 2026-10-19 00:00:08
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009_archive_files_pruned'
+down_revision: Union[str, None] = '0008_retention'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('event_archives') as batch_op:
+        batch_op.add_column(sa.Column('files_pruned', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('event_archives') as batch_op:
+        batch_op.drop_column('files_pruned')
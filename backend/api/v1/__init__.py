@@ -8,6 +8,8 @@ from .stream import router as stream_router
 from .detection import router as detection_router
 from .monitoring import router as monitoring_router
 from .youtube import router as youtube_router
+from .analysis import router as analysis_router
+from .jobs import router as jobs_router
 
 api_router = APIRouter()
 
@@ -18,4 +20,6 @@ api_router.include_router(webcam_router, prefix="/webcam", tags=["webcam"])
 api_router.include_router(stream_router, prefix="/stream", tags=["stream"])
 api_router.include_router(detection_router, prefix="/detection", tags=["detection"])
 api_router.include_router(monitoring_router, prefix="/monitoring", tags=["monitoring"])
-api_router.include_router(youtube_router, prefix="/youtube", tags=["youtube"])
\ No newline at end of file
+api_router.include_router(youtube_router, prefix="/youtube", tags=["youtube"])
+api_router.include_router(analysis_router, prefix="/analysis", tags=["analysis"])
+api_router.include_router(jobs_router, prefix="/jobs", tags=["jobs"])
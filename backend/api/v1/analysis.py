@@ -0,0 +1,163 @@
+"""
+Endpoints de análise offline de vídeos
+"""
+import os
+import shutil
+import uuid
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import get_db
+from models.camera import Camera
+from schemas.user import User
+from services.auth_service import AuthService
+from services.job_manager import JobStatus, job_manager
+from services.video_analysis_service import VIDEO_EXTENSIONS, video_analysis_service
+
+router = APIRouter()
+
+
+class VideoAnalysisRequest(BaseModel):
+    """Parâmetros de análise de um vídeo já disponível no servidor"""
+    filename: str  # arquivo em temp_videos/ (YouTube) ou uploads/videos/
+    camera_id: Optional[int] = None  # usar zona/linha/sensibilidade desta câmera
+    sensitivity: Optional[int] = None  # 0-100
+    sample_fps: Optional[float] = None
+    detection_line: Optional[Dict[str, Any]] = None
+    detection_zone: Optional[Dict[str, Any]] = None
+
+
+def _build_options(request: VideoAnalysisRequest, db: Session) -> Dict:
+    options = {
+        "sensitivity": request.sensitivity,
+        "sample_fps": request.sample_fps,
+        "detection_line": request.detection_line,
+        "detection_zone": request.detection_zone,
+    }
+    if request.camera_id is not None:
+        camera = db.query(Camera).filter(Camera.id == request.camera_id).first()
+        if not camera:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Câmera não encontrada"
+            )
+        # Valores explícitos na requisição têm precedência sobre os da câmera
+        options["sensitivity"] = options["sensitivity"] or camera.sensitivity
+        options["detection_line"] = options["detection_line"] or camera.detection_line
+        options["detection_zone"] = options["detection_zone"] or camera.detection_zone
+        options["camera_id"] = camera.id
+    return options
+
+
+def _get_job_or_404(job_id: str):
+    job = job_manager.get(job_id)
+    if not job or job.kind != "video_analysis":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Análise não encontrada"
+        )
+    return job
+
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+def create_analysis_job(
+    request: VideoAnalysisRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Iniciar análise de um vídeo baixado (YouTube) ou enviado anteriormente"""
+    video_path = video_analysis_service.resolve_video(request.filename)
+    if not video_path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Arquivo de vídeo não encontrado: {request.filename}"
+        )
+    job = video_analysis_service.start_analysis(video_path, _build_options(request, db), current_user.email)
+    return job.to_dict(include_result=False)
+
+
+@router.post("/upload", status_code=status.HTTP_202_ACCEPTED)
+def upload_and_analyze(
+    file: UploadFile = File(...),
+    camera_id: Optional[int] = Form(None),
+    sensitivity: Optional[int] = Form(None),
+    sample_fps: Optional[float] = Form(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Enviar arquivo de vídeo e iniciar a análise"""
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in VIDEO_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato de arquivo inválido"
+        )
+    videos_dir = os.path.join(settings.upload_dir, "videos")
+    os.makedirs(videos_dir, exist_ok=True)
+    filename = f"{uuid.uuid4().hex}{extension}"
+    with open(os.path.join(videos_dir, filename), "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+
+    request = VideoAnalysisRequest(filename=filename, camera_id=camera_id,
+                                   sensitivity=sensitivity, sample_fps=sample_fps)
+    video_path = video_analysis_service.resolve_video(filename)
+    job = video_analysis_service.start_analysis(video_path, _build_options(request, db), current_user.email,
+                                                uploaded=True)
+    return job.to_dict(include_result=False)
+
+
+@router.get("/jobs")
+def list_analysis_jobs(
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Listar análises recentes"""
+    return [job.to_dict(include_result=False) for job in job_manager.list("video_analysis")]
+
+
+@router.get("/jobs/{job_id}")
+def get_analysis_job(
+    job_id: str,
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Obter status, progresso e linha do tempo de eventos da análise"""
+    return _get_job_or_404(job_id).to_dict()
+
+
+@router.delete("/jobs/{job_id}")
+def delete_analysis_job(
+    job_id: str,
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Excluir análise: cancela se em andamento e apaga miniaturas e vídeo enviado"""
+    job = _get_job_or_404(job_id)
+    if not job.can_be_cancelled_by(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Sem permissão para excluir esta análise"
+        )
+    finished = job.status in JobStatus.FINISHED
+    job_manager.remove(job_id)
+    if finished:
+        return {"message": "Análise excluída", "status": job.status}
+    return {"message": "Cancelamento solicitado; análise excluída ao terminar", "status": job.status}
+
+
+@router.get("/jobs/{job_id}/thumbnails/{name}")
+def get_analysis_thumbnail(
+    job_id: str,
+    name: str,
+    current_user: Optional[User] = Depends(AuthService.get_current_active_user_optional)
+):
+    """Servir miniatura de um evento da análise (autenticação opcional, como imagens de eventos)"""
+    path = video_analysis_service.resolve_thumbnail(job_id, name)
+    if not path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Miniatura não encontrada"
+        )
+    return FileResponse(str(path), media_type="image/jpeg")
@@ -7,10 +7,15 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from database import get_db
-from schemas.camera import Camera, CameraCreate, CameraUpdate, DetectionLineConfig, DetectionZoneConfig
+from schemas.camera import (
+    Camera, CameraCreate, CameraUpdate, DetectionLineConfig, DetectionZoneConfig, ArmingScheduleConfig,
+    RetentionPolicyConfig
+)
 from schemas.user import User
 from services.camera_service import CameraService
 from services.auth_service import AuthService
+from services.arming_schedule import ArmingSchedule
+from services.retention_service import RetentionService
 
 logger = logging.getLogger(__name__)
 
@@ -84,18 +89,12 @@ def update_camera(
     current_user: User = Depends(AuthService.get_current_admin_user)
 ):
     """Atualizar câmera"""
-    camera = CameraService.update_camera(db, camera_id, camera_update)
+    camera = CameraService.update_camera(db, camera_id, camera_update, current_user.email)
     if not camera:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Câmera não encontrada"
         )
-    # Se detecção foi habilitada ou stream foi atualizado, reiniciar com email do usuário
-    if camera.detection_enabled and camera.stream_url:
-        from services.detection_service import detection_service
-        if camera_id in detection_service.active_monitors:
-            detection_service.stop_monitoring(camera_id)
-        detection_service.start_monitoring(camera_id, camera.stream_url, current_user.email)
     return camera
 
 
@@ -158,6 +157,104 @@ def configure_detection_zone(
         )
 
 
+@router.get("/{camera_id}/arming-schedule")
+def get_arming_schedule(
+    camera_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Obter agenda de armação e estado atual da câmera"""
+    camera = CameraService.get_camera(db, camera_id)
+    if not camera:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Câmera não encontrada"
+        )
+    try:
+        schedule = ArmingSchedule.from_camera(camera)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Agenda de armação inválida: {str(e)}"
+        )
+    armed, next_transition = schedule.state() if schedule else (True, None)
+    config = camera.arming_schedule or {}
+    return {
+        "camera_id": camera_id,
+        "timezone": config.get("timezone"),
+        "windows": config.get("windows", []),
+        "overrides": camera.arming_overrides or [],
+        "disarmed_mode": camera.disarmed_mode,
+        "armed": armed,
+        "next_transition": next_transition.isoformat() if next_transition else None,
+    }
+
+
+@router.put("/{camera_id}/arming-schedule")
+def configure_arming_schedule(
+    camera_id: int,
+    schedule: ArmingScheduleConfig,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(AuthService.get_current_admin_user)
+):
+    """Configurar agenda de armação (janelas vazias e sem exceções = sempre armada)"""
+    data = schedule.dict()
+    try:
+        # Validar antes de salvar (horários, dias, datas e fuso horário)
+        ArmingSchedule(data["windows"], data["overrides"], data["timezone"])
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    camera = CameraService.configure_arming_schedule(db, camera_id, data)
+    if not camera:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Câmera não encontrada"
+        )
+    return {"message": "Agenda de armação configurada com sucesso"}
+
+
+@router.get("/{camera_id}/retention")
+def get_retention_policy(
+    camera_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Obter política de retenção da câmera, limites efetivos e uso atual"""
+    camera = CameraService.get_camera(db, camera_id)
+    if not camera:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Câmera não encontrada"
+        )
+    return {
+        "camera_id": camera_id,
+        "retention_days": camera.retention_days,
+        "retention_max_mb": camera.retention_max_mb,
+        "effective": RetentionService.effective_policy(camera),
+        "usage": RetentionService.usage(db, camera_id),
+    }
+
+
+@router.put("/{camera_id}/retention")
+def configure_retention_policy(
+    camera_id: int,
+    policy: RetentionPolicyConfig,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(AuthService.get_current_admin_user)
+):
+    """Configurar retenção (aplicada pela próxima passada em segundo plano)"""
+    camera = CameraService.configure_retention(db, camera_id, policy.dict())
+    if not camera:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Câmera não encontrada"
+        )
+    return {"message": "Política de retenção configurada com sucesso"}
+
+
 @router.get("/stats/summary")
 def get_camera_stats(
     db: Session = Depends(get_db),
@@ -1,14 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, WebSocket, WebSocketDisconnect, Query
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Union
+import asyncio
 import json
+from concurrent.futures import ThreadPoolExecutor
+import time
 import cv2
+import numpy as np
 from datetime import datetime
+from pydantic import BaseModel, Field, ValidationError
 
-from database import get_db
+from config import settings
+from database import get_db, SessionLocal
 from models.camera import Camera
 from services.auth_service import AuthService
+from services.capture_supervisor import capture_supervisor, open_video_capture
 from services.detection_service import detection_service
+from services.inference_service import inference_batcher
 from models.user import User
 
 router = APIRouter()
@@ -32,6 +40,8 @@ def configure_detection_line(
         # Salvar configuração da linha
         camera.detection_line = json.dumps(line_config)
         db.commit()
+        # Monitor em execução aplica a nova linha sem reiniciar
+        detection_service.bump_config_version(camera_id)
         
         return {"message": "Linha de detecção configurada com sucesso", "success": True}
         
@@ -61,6 +71,8 @@ def configure_detection_zone(
         # Salvar configuração da zona
         camera.detection_zone = json.dumps(zone_config)
         db.commit()
+        # Monitor em execução aplica a nova zona sem reiniciar
+        detection_service.bump_config_version(camera_id)
         
         return {"message": "Zona de detecção configurada com sucesso", "success": True}
         
@@ -120,6 +132,10 @@ def toggle_detection(
         enabled = request_data.get('enabled', False)
         camera.detection_enabled = enabled
         db.commit()
+        # Desabilitar encerra o monitor no próximo frame; habilitar inicia se não estiver rodando
+        detection_service.bump_config_version(camera_id)
+        if enabled and camera.stream_url and not detection_service.is_monitoring_active(camera_id):
+            detection_service.start_monitoring(camera_id, camera.stream_url, current_user.email)
         
         status_text = "ativada" if enabled else "desativada"
         return {"message": f"Detecção {status_text} com sucesso", "success": True}
@@ -131,6 +147,133 @@ def toggle_detection(
             detail=f"Erro ao alterar status da detecção: {str(e)}"
         )
 
+def _camera_test_info(camera: Camera) -> Dict[str, Any]:
+    """Atributos da câmera usados no teste (independentes da sessão do banco)"""
+    return {
+        "id": camera.id,
+        "name": camera.name,
+        "stream_url": camera.stream_url,
+        "sensitivity": camera.sensitivity,
+        "detection_enabled": camera.detection_enabled,
+        "detection_line": camera.detection_line,
+        "detection_zone": camera.detection_zone,
+    }
+
+
+def _grab_test_frame(camera: Dict[str, Any]):
+    """
+    Frame para teste: o mais recente da captura em execução (monitor ou stream);
+    sem captura ativa, abre uma conexão avulsa e lê um frame. Webcams em uso por
+    uma captura supervisionada (mesmo reconectando) não são abertas de novo.
+    """
+    frame, frame_time = capture_supervisor.get_latest_frame(
+        camera["id"], max_age=settings.detection_test_max_frame_age
+    )
+    if frame is not None:
+        return frame, "live", round(time.time() - frame_time, 3)
+
+    stream_url = camera["stream_url"]
+    if not stream_url:
+        return None, "unavailable", None
+    if stream_url.startswith("webcam://"):
+        token = stream_url.split("://")[1]
+        if (int(token) if token.isdigit() else 0) in capture_supervisor.get_claimed_webcams():
+            return None, "busy", None
+
+    # Mesmo limite de aberturas simultâneas das capturas supervisionadas
+    with capture_supervisor.open_slot(timeout=settings.detection_test_open_timeout) as acquired:
+        if not acquired:
+            return None, "busy", None
+        cap = open_video_capture(stream_url)
+    try:
+        if cap is None or not cap.isOpened():
+            return None, "unavailable", None
+        ret, frame = cap.read()
+        return (frame if ret else None), "capture", 0.0
+    finally:
+        if cap is not None:
+            cap.release()
+
+
+def _run_detection_test(camera: Dict[str, Any]) -> Dict[str, Any]:
+    """Testar detecção de uma câmera sem interferir no monitor em execução"""
+    camera_info = {
+        "id": camera["id"],
+        "name": camera["name"],
+        "stream_url": camera["stream_url"],
+        "detection_enabled": camera["detection_enabled"]
+    }
+    # Verificar se modelo YOLO está carregado
+    if not detection_service.is_model_loaded():
+        return {
+            "success": False,
+            "error": "Modelo YOLO não está carregado",
+            "model_loaded": False,
+            "model_state": detection_service.model_state,
+            "camera_info": camera_info
+        }
+
+    frame, frame_source, frame_age = _grab_test_frame(camera)
+    if frame is None:
+        return {
+            "success": False,
+            "error": ("Câmera em uso ou limite de conexões simultâneas atingido; tente novamente"
+                      if frame_source == "busy" else "Não foi possível obter frame da câmera"),
+            "model_loaded": True,
+            "camera_connected": frame_source == "capture",
+            "frame_source": frame_source,
+            "frame_captured": False,
+            "camera_info": camera_info
+        }
+
+    # Detecção pelo caminho de inferência em lote compartilhado
+    sensitivity = camera["sensitivity"] / 100.0
+    objects = detection_service.test_detection(frame, sensitivity)
+
+    # Verificar intrusão com rastreador descartável (cópia do estado do monitor)
+    has_line = camera["detection_line"] is not None
+    has_zone = camera["detection_zone"] is not None
+    intrusion_detected = False
+    if objects:
+        tracked_objects = detection_service.test_tracking(frame, camera["id"], objects)
+        if tracked_objects:
+            intrusion_detected = detection_service.test_intrusion_check(
+                frame, tracked_objects, camera["detection_line"], camera["detection_zone"]
+            )
+
+    return {
+        "success": True,
+        "model_loaded": True,
+        "camera_connected": True,
+        "frame_captured": True,
+        "frame_source": frame_source,
+        "frame_age_seconds": frame_age,
+        "detection_results": {
+            "objects_detected": len(objects),
+            "objects": [
+                {
+                    "class": obj["class"],
+                    "confidence": round(obj["confidence"], 2),
+                    "area": obj["area"],
+                    "center": obj["center"]
+                }
+                for obj in objects
+            ],
+            "intrusion_detected": intrusion_detected,
+            "has_detection_line": has_line,
+            "has_detection_zone": has_zone,
+            "mode": "basic" if (not has_line and not has_zone) else "advanced"
+        },
+        "camera_info": {
+            "id": camera["id"],
+            "name": camera["name"],
+            "sensitivity": camera["sensitivity"],
+            "detection_enabled": camera["detection_enabled"]
+        },
+        "timestamp": datetime.now().isoformat()
+    }
+
+
 @router.post("/test/{camera_id}")
 def test_detection(
     camera_id: int,
@@ -146,105 +289,8 @@ def test_detection(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Câmera não encontrada"
             )
-        
-        # Verificar se modelo YOLO está carregado
-        if not detection_service.is_model_loaded():
-            return {
-                "success": False,
-                "error": "Modelo YOLO não está carregado",
-                "model_loaded": False,
-                "camera_info": {
-                    "id": camera.id,
-                    "name": camera.name,
-                    "stream_url": camera.stream_url,
-                    "detection_enabled": camera.detection_enabled
-                }
-            }
-        
-        # Tentar capturar um frame da câmera
-        cap = None
-        try:
-            if camera.stream_url.startswith("webcam://"):
-                camera_index = int(camera.stream_url.split("://")[1])
-                cap = cv2.VideoCapture(camera_index)
-            else:
-                cap = cv2.VideoCapture(camera.stream_url)
-            
-            if not cap.isOpened():
-                return {
-                    "success": False,
-                    "error": "Não foi possível conectar à câmera",
-                    "model_loaded": True,
-                    "camera_connected": False,
-                    "camera_info": {
-                        "id": camera.id,
-                        "name": camera.name,
-                        "stream_url": camera.stream_url
-                    }
-                }
-            
-            # Capturar frame
-            ret, frame = cap.read()
-            if not ret:
-                return {
-                    "success": False,
-                    "error": "Não foi possível ler frame da câmera",
-                    "model_loaded": True,
-                    "camera_connected": True,
-                    "frame_captured": False
-                }
-            
-            # Testar detecção YOLO usando método público
-            sensitivity = camera.sensitivity / 100.0
-            objects = detection_service.test_detection(frame, sensitivity)
-            
-            # Testar verificação de intrusão
-            has_line = camera.detection_line is not None
-            has_zone = camera.detection_zone is not None
-            intrusion_detected = False
-            
-            if objects:
-                # Converter objetos para formato esperado pelo tracking
-                tracked_objects = detection_service.test_tracking(frame, camera_id, objects)
-                if tracked_objects:
-                    intrusion_detected = detection_service.test_intrusion_check(
-                        frame, tracked_objects, camera.detection_line, camera.detection_zone
-                    )
-            
-            return {
-                "success": True,
-                "model_loaded": True,
-                "camera_connected": True,
-                "frame_captured": True,
-                "detection_results": {
-                    "objects_detected": len(objects),
-                    "objects": [
-                        {
-                            "class": obj["class"],
-                            "confidence": round(obj["confidence"], 2),
-                            "area": obj["area"],
-                            "center": obj["center"]
-                        }
-                        for obj in objects
-                    ],
-                    "intrusion_detected": intrusion_detected,
-                    "has_detection_line": has_line,
-                    "has_detection_zone": has_zone,
-                    "mode": "basic" if (not has_line and not has_zone) else "advanced"
-                },
-                "camera_info": {
-                    "id": camera.id,
-                    "name": camera.name,
-                    "sensitivity": camera.sensitivity,
-                    "detection_enabled": camera.detection_enabled
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-            
-        finally:
-            if cap:
-                cap.release()
-        
+        return _run_detection_test(_camera_test_info(camera))
+
     except HTTPException:
         raise
     except Exception as e:
@@ -253,16 +299,214 @@ def test_detection(
             detail=f"Erro ao testar detecção: {str(e)}"
         )
 
+@router.post("/test-all")
+def test_detection_all(
+    current_user: User = Depends(AuthService.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Testar detecção de todas as câmeras em paralelo (frames entram no mesmo lote de inferência)"""
+    try:
+        cameras = [_camera_test_info(camera) for camera in db.query(Camera).order_by(Camera.id).all()]
+        if not cameras:
+            return {"results": [], "total": 0, "successful": 0, "intrusions": 0}
+
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, min(len(cameras), settings.inference_batch_size))) as executor:
+            futures = {camera["id"]: executor.submit(_run_detection_test, camera) for camera in cameras}
+        results = []
+        for camera in cameras:
+            try:
+                results.append(futures[camera["id"]].result())
+            except Exception as e:
+                results.append({"success": False, "error": str(e), "camera_info": {"id": camera["id"], "name": camera["name"]}})
+
+        return {
+            "results": results,
+            "total": len(results),
+            "successful": sum(1 for r in results if r.get("success")),
+            "intrusions": sum(1 for r in results if r.get("detection_results", {}).get("intrusion_detected")),
+            "duration_ms": round((time.time() - started) * 1000, 2),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao testar detecção: {str(e)}"
+        )
+
 @router.get("/health")
 def detection_health():
-    """Estado do modelo de detecção para diagnóstico (sem auth para facilitar teste)."""
+    """Estado do modelo de detecção para diagnóstico (sem auth para facilitar teste).
+
+    state: idle (não iniciado), loading (carregando/aquecendo), ready ou failed.
+    """
     try:
-        loaded = False
-        errors = None
-        try:
-            loaded = detection_service.is_model_loaded()
-        except Exception as e:
-            errors = str(e)
-        return {"model_loaded": loaded, "errors": errors}
+        model_status = detection_service.get_model_status()
+        return {
+            "model_loaded": model_status["model_loaded"],
+            "state": model_status["state"],
+            "load_seconds": model_status["load_seconds"],
+            "errors": model_status["error"]
+        }
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+class InferConfigMessage(BaseModel):
+    """Mensagem de texto do WebSocket /infer/ws (ajuste da configuração)"""
+    camera_id: Optional[int] = None
+    sensitivity: Optional[int] = Field(default=None, ge=0, le=100)
+    detection_line: Optional[Union[Dict[str, Any], str]] = None
+    detection_zone: Optional[Union[Dict[str, Any], str]] = None
+
+
+def _resolve_infer_config(db: Session, camera_id: Optional[int], sensitivity: Optional[int],
+                          detection_line=None, detection_zone=None) -> Dict[str, Any]:
+    """Sensibilidade, linha e zona para /infer (valores explícitos sobrepõem os da câmera)"""
+    config = {"conf": None, "detection_line": detection_line, "detection_zone": detection_zone}
+    if camera_id is not None:
+        camera = db.query(Camera).filter(Camera.id == camera_id).first()
+        if not camera:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Câmera não encontrada"
+            )
+        sensitivity = sensitivity if sensitivity is not None else camera.sensitivity
+        config["detection_line"] = detection_line or camera.detection_line
+        config["detection_zone"] = detection_zone or camera.detection_zone
+    # Mesma conversão usada pelos monitores (0-100 -> confiança 0.25-0.7)
+    config["conf"] = max(0.25, min(0.7, (sensitivity if sensitivity is not None else 50) / 100.0))
+    return config
+
+
+def _decode_frame(data: bytes) -> Optional[np.ndarray]:
+    if not data:
+        return None
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def _frame_result(index: int, frame: np.ndarray, objects: List[Dict], config: Dict[str, Any]) -> Dict[str, Any]:
+    objects = detection_service.evaluate_zone_hits(
+        objects, frame.shape, config["detection_line"], config["detection_zone"]
+    )
+    return {
+        "index": index,
+        "width": frame.shape[1],
+        "height": frame.shape[0],
+        "objects": objects,
+        "zone_hits": sum(1 for obj in objects if obj["in_zone"]),
+        "line_hits": sum(1 for obj in objects if obj["near_line"]),
+    }
+
+
+@router.post("/infer")
+def infer_frames(
+    files: List[UploadFile] = File(...),
+    camera_id: Optional[int] = Form(None),
+    sensitivity: Optional[int] = Form(None),
+    detection_line: Optional[str] = Form(None),
+    detection_zone: Optional[str] = Form(None),
+    current_user: User = Depends(AuthService.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Detectar objetos em um ou mais frames JPEG pelo caminho de inferência em lote do servidor"""
+    if not detection_service.is_model_loaded():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Modelo YOLO não está carregado (estado: {detection_service.model_state})"
+        )
+    if len(files) > settings.inference_max_frames:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {settings.inference_max_frames} frames por requisição"
+        )
+    config = _resolve_infer_config(db, camera_id, sensitivity, detection_line, detection_zone)
+
+    frames = []
+    for index, upload in enumerate(files):
+        frame = _decode_frame(upload.file.read())
+        if frame is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Frame {index} não é uma imagem válida"
+            )
+        frames.append(frame)
+
+    started = time.time()
+    try:
+        # Todos os frames entram na fila juntos e são agrupados no mesmo lote
+        futures = [inference_batcher.submit(frame, config["conf"]) for frame in frames]
+        results = [
+            _frame_result(index, frame, future.result(timeout=settings.inference_timeout), config)
+            for index, (frame, future) in enumerate(zip(frames, futures))
+        ]
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro na inferência: {str(e)}"
+        )
+    return {
+        "frames": results,
+        "inference_ms": round((time.time() - started) * 1000, 2),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@router.websocket("/infer/ws")
+async def infer_frames_ws(websocket: WebSocket, token: str = Query(...)):
+    """
+    Inferência contínua: cada mensagem binária é um frame JPEG e recebe um JSON
+    com os objetos detectados. Mensagens de texto (JSON) ajustam camera_id,
+    sensitivity, detection_line e detection_zone.
+    """
+    db = SessionLocal()
+    try:
+        try:
+            token_data = AuthService.verify_token(token, HTTPException(status_code=status.HTTP_401_UNAUTHORIZED))
+            user = db.query(User).filter(User.email == token_data.email).first()
+        except HTTPException:
+            user = None
+        if not user or not user.is_active:
+            await websocket.close(code=1008)
+            return
+        await websocket.accept()
+        config = _resolve_infer_config(db, None, None)
+        index = 0
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("text") is not None:
+                try:
+                    options = InferConfigMessage.model_validate_json(message["text"])
+                    config = _resolve_infer_config(
+                        db, options.camera_id, options.sensitivity, options.detection_line, options.detection_zone
+                    )
+                    await websocket.send_json({"type": "config", "success": True})
+                except ValidationError as e:
+                    error = "; ".join(f"{'.'.join(map(str, err['loc'])) or 'mensagem'}: {err['msg']}"
+                                      for err in e.errors())
+                    await websocket.send_json({"type": "error", "error": f"Configuração inválida ({error})"})
+                except (ValueError, TypeError, HTTPException) as e:
+                    await websocket.send_json({"type": "error", "error": getattr(e, "detail", str(e))})
+                continue
+
+            frame = _decode_frame(message.get("bytes"))
+            if frame is None:
+                await websocket.send_json({"type": "error", "index": index, "error": "Frame inválido"})
+                index += 1
+                continue
+            try:
+                objects = await asyncio.wait_for(
+                    asyncio.wrap_future(inference_batcher.submit(frame, config["conf"])),
+                    timeout=settings.inference_timeout
+                )
+                await websocket.send_json({"type": "result", **_frame_result(index, frame, objects, config)})
+            except (RuntimeError, asyncio.TimeoutError) as e:
+                await websocket.send_json({"type": "error", "index": index, "error": str(e) or "Tempo esgotado"})
+            index += 1
+    except WebSocketDisconnect:
+        pass
+    finally:
+        db.close()
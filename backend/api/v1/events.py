@@ -1,24 +1,32 @@
 """
 Endpoints de eventos
 """
-from typing import List, Optional
-from datetime import datetime
+from typing import List, Literal, Optional, Union
+from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 import os
 import shutil
+import zlib
 
-from database import get_db
-from schemas.event import Event, EventCreate, EventUpdate, EventStats, HeatmapData
+from database import SessionLocal, get_db
+from schemas.event import (Event, EventCreate, EventUpdate, EventStats, HeatmapData, EventPage, EventTimelinePoint,
+                           EventArchiveList, EventBulkDelete)
 from schemas.user import User
+from services.event_archive_service import event_archive_service
 from services.event_service import EventService
+from services.retention_service import retention_service
+from services.event_rollup_service import EventRollupService
 from services.auth_service import AuthService
 from models.event import EventType
 from config import settings
 
 router = APIRouter()
 
+# Classes com detecções normalizadas (event_detections)
+ObjectClass = Literal["person", "bicycle", "car", "motorcycle", "bus", "truck"]
+
 
 @router.post("/", response_model=Event, status_code=status.HTTP_201_CREATED)
 def create_event(
@@ -30,7 +38,18 @@ def create_event(
     return EventService.create_event(db, event)
 
 
-@router.get("/", response_model=List[Event])
+def _get_page(db: Session, limit: int, cursor: Optional[str], **filters) -> EventPage:
+    try:
+        items, next_cursor = EventService.get_events_page(db, limit=limit, cursor=cursor, **filters)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return EventPage(items=items, next_cursor=next_cursor)
+
+
+@router.get("/", response_model=Union[List[Event], EventPage])
 def get_events(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
@@ -38,13 +57,23 @@ def get_events(
     event_type: Optional[EventType] = Query(None),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
+    object_class: Optional[ObjectClass] = Query(None, description="Eventos com detecção desta classe"),
+    paginate: Literal["offset", "cursor"] = Query("offset", description="cursor: página com next_cursor"),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior (implica paginate=cursor)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(AuthService.get_current_active_user)
 ):
-    """Obter lista de eventos com filtros"""
+    """Obter lista de eventos com filtros
+
+    Modo offset (padrão, lista simples) mantido por compatibilidade; o modo
+    cursor devolve {items, next_cursor} e é estável sob inserções.
+    """
+    if paginate == "cursor" or cursor:
+        return _get_page(db, limit, cursor, camera_id=camera_id, event_type=event_type,
+                         start_date=start_date, end_date=end_date, object_class=object_class)
     return EventService.get_events(
         db, skip=skip, limit=limit, camera_id=camera_id,
-        event_type=event_type, start_date=start_date, end_date=end_date
+        event_type=event_type, start_date=start_date, end_date=end_date, object_class=object_class
     )
 
 
@@ -106,14 +135,40 @@ def get_event_stats(
     return EventService.get_event_stats(db)
 
 
-@router.get("/camera/{camera_id}", response_model=List[Event])
+@router.get("/stats/timeline", response_model=List[EventTimelinePoint])
+def get_event_timeline(
+    interval: Literal["hour", "day"] = Query("hour"),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    camera_id: Optional[int] = Query(None),
+    event_type: Optional[EventType] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Série de eventos por hora/dia para gráficos (padrão: últimas 24h ou 30 dias)"""
+    end_date = end_date or datetime.now()
+    start_date = start_date or end_date - (timedelta(days=30) if interval == "day" else timedelta(hours=23))
+    max_span = timedelta(days=366) if interval == "day" else timedelta(days=31)
+    if start_date > end_date or end_date - start_date > max_span:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Período inválido para o intervalo solicitado"
+        )
+    return EventRollupService.get_timeline(db, start_date, end_date, interval, camera_id, event_type)
+
+
+@router.get("/camera/{camera_id}", response_model=Union[List[Event], EventPage])
 def get_events_by_camera(
     camera_id: int,
     limit: int = Query(50, ge=1, le=1000),
+    paginate: Literal["offset", "cursor"] = Query("offset"),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(AuthService.get_current_active_user)
 ):
-    """Obter eventos por câmera"""
+    """Obter eventos por câmera (paginate=cursor para páginas com next_cursor)"""
+    if paginate == "cursor" or cursor:
+        return _get_page(db, limit, cursor, camera_id=camera_id)
     return EventService.get_events_by_camera(db, camera_id, limit)
 
 
@@ -143,19 +198,53 @@ def mark_event_as_notified(
     return {"message": "Evento marcado como notificado"}
 
 
+EXPORT_MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
 @router.get("/export/data")
 def export_events(
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
     camera_id: Optional[int] = Query(None),
     event_type: Optional[EventType] = Query(None),
-    db: Session = Depends(get_db),
+    export_format: Literal["json", "ndjson", "csv"] = Query("json", alias="format",
+                                                          description="json (array), ndjson ou csv"),
+    compress: bool = Query(False, description="Compactar com gzip (arquivo .gz)"),
     current_user: User = Depends(AuthService.get_current_active_user)
 ):
-    """Exportar eventos para relatório"""
-    return EventService.export_events(
-        db, start_date=start_date, end_date=end_date,
-        camera_id=camera_id, event_type=event_type
+    """Exportar eventos para relatório (resposta em streaming, memória constante)"""
+    def generate():
+        # Sessão própria: a resposta continua sendo enviada após o fim do endpoint
+        db = SessionLocal()
+        try:
+            compressor = zlib.compressobj(wbits=31) if compress else None  # 31 = formato gzip
+            for chunk in EventService.export_events(
+                db, export_format, start_date=start_date, end_date=end_date,
+                camera_id=camera_id, event_type=event_type
+            ):
+                data = chunk.encode("utf-8")
+                if compressor:
+                    data = compressor.compress(data)
+                if data:
+                    yield data
+            if compressor:
+                yield compressor.flush()
+        finally:
+            db.close()
+
+    filename = f"eventos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    media_type = EXPORT_MEDIA_TYPES[export_format]
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
 
@@ -163,12 +252,126 @@ def export_events(
 def get_heatmap_data(
     camera_id: int,
     date_range: str = Query("7d", description="Período: 1d, 7d, 30d"),
+    object_class: Optional[ObjectClass] = Query(None, description="Apenas detecções desta classe"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Obter dados do heatmap (detecções normalizadas da câmera)"""
+    try:
+        return EventService.get_heatmap_data(db, camera_id, date_range, object_class)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.get("/region/{camera_id}", response_model=EventPage)
+def get_events_in_region(
+    camera_id: int,
+    x1: float = Query(..., ge=0, description="Retângulo: frações do frame (0-1) ou pixels com ref_w/ref_h"),
+    y1: float = Query(..., ge=0),
+    x2: float = Query(..., ge=0),
+    y2: float = Query(..., ge=0),
+    ref_w: Optional[float] = Query(None, gt=0, description="Largura de referência das coordenadas em pixels"),
+    ref_h: Optional[float] = Query(None, gt=0, description="Altura de referência das coordenadas em pixels"),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    object_class: Optional[ObjectClass] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Eventos com detecções centradas num retângulo da imagem da câmera"""
+    if (ref_w is None) != (ref_h is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe ref_w e ref_h juntos"
+        )
+    if ref_w:
+        x1, x2 = x1 / ref_w, x2 / ref_w
+        y1, y2 = y1 / ref_h, y2 / ref_h
+    try:
+        items, next_cursor = EventService.get_events_in_region(
+            db, camera_id, (x1, y1, x2, y2), limit=limit, cursor=cursor,
+            start_date=start_date, end_date=end_date, object_class=object_class
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return EventPage(items=items, next_cursor=next_cursor)
+
+
+@router.get("/archives/list", response_model=EventArchiveList)
+def list_event_archives(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Listar arquivos mensais de eventos
+
+    Eventos anteriores a `archived_until` não aparecem nas listagens: estão nos
+    arquivos (contagens e gráficos continuam disponíveis em /stats).
+    """
+    return EventArchiveList(
+        cutoff=event_archive_service.cutoff(),
+        archived_until=event_archive_service.archived_until(db),
+        archives=event_archive_service.list_archives(db)
+    )
+
+
+@router.post("/archives/run", status_code=status.HTTP_202_ACCEPTED)
+def run_event_archive(
+    current_user: User = Depends(AuthService.get_current_admin_user)
+):
+    """Arquivar agora os meses anteriores ao corte (tarefa em segundo plano)"""
+    if settings.event_archive_after_days <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Arquivamento desativado (EVENT_ARCHIVE_AFTER_DAYS=0)"
+        )
+    return event_archive_service.submit(owner=current_user.email).to_dict(include_result=False)
+
+
+@router.get("/archives/{archive_id}/download")
+def download_event_archive(
+    archive_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(AuthService.get_current_active_user)
 ):
-    """Obter dados do heatmap"""
-    from services.detection_service import detection_service
-    return detection_service.get_heatmap_data(camera_id, date_range)
+    """Baixar arquivo mensal de eventos (NDJSON compactado, um evento por linha)"""
+    path = event_archive_service.resolve_archive(db, archive_id)
+    if not path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Arquivo não encontrado"
+        )
+    return FileResponse(str(path), media_type="application/gzip", filename=path.name)
+
+
+@router.post("/bulk-delete", status_code=status.HTTP_202_ACCEPTED)
+def bulk_delete_events(
+    filters: EventBulkDelete,
+    current_user: User = Depends(AuthService.get_current_admin_user)
+):
+    """Excluir eventos e seus arquivos em segundo plano (tarefa acompanhada em /jobs)"""
+    if not any(value is not None for value in filters.dict().values()):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe ao menos um filtro (camera_id, event_type, start_date ou end_date)"
+        )
+    job = retention_service.submit_bulk_delete(**filters.dict(), owner=current_user.email)
+    return job.to_dict(include_result=False)
+
+
+@router.post("/retention/run", status_code=status.HTTP_202_ACCEPTED)
+def run_event_retention(
+    current_user: User = Depends(AuthService.get_current_admin_user)
+):
+    """Aplicar agora as políticas de retenção e remover screenshots sem evento"""
+    return retention_service.submit(owner=current_user.email).to_dict(include_result=False)
 
 
 @router.post("/screenshot")
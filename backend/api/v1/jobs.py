@@ -0,0 +1,62 @@
+"""
+Endpoints de consulta e cancelamento de tarefas em segundo plano
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from schemas.user import User
+from services.auth_service import AuthService
+from services.job_manager import JobStatus, job_manager
+
+router = APIRouter()
+
+
+@router.get("/")
+def list_jobs(
+    kind: Optional[str] = None,
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Listar tarefas recentes (opcionalmente de um tipo)"""
+    return [job.to_dict(include_result=False) for job in job_manager.list(kind)]
+
+
+@router.get("/{job_id}")
+def get_job(
+    job_id: str,
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Obter status, progresso e resultado (parcial durante a execução) de uma tarefa"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tarefa não encontrada"
+        )
+    return job.to_dict()
+
+
+@router.delete("/{job_id}")
+def cancel_job(
+    job_id: str,
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Solicitar cancelamento de uma tarefa em andamento (dono da tarefa ou admin)"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tarefa não encontrada"
+        )
+    if not job.can_be_cancelled_by(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Sem permissão para cancelar esta tarefa"
+        )
+    if job.status in JobStatus.FINISHED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Tarefa já finalizada ({job.status})"
+        )
+    job_manager.cancel(job_id)
+    return {"message": "Cancelamento solicitado", "status": job.status}
@@ -1,32 +1,40 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from database import get_db
 from models.camera import Camera
 from models.event import Event
 from services.auth_service import AuthService
+from services.event_service import EventService
+from services.camera_service import CameraService
+from services.stats_cache import stats_cache
+from services.recent_events_cache import recent_events_cache
 from services.detection_service import detection_service
+from services.capture_supervisor import capture_supervisor
+from services.camera_scheduler import camera_scheduler
+from services.analysis_budget import analysis_budget
+from services.overload_controller import overload_controller
+from services.cpu_topology import cpu_topology
+from services.inference_service import inference_batcher
+from services.monitor_lifecycle import monitor_lifecycle
 from models.user import User
 
 router = APIRouter()
-@router.post("/restart-all")
+@router.post("/restart-all", status_code=status.HTTP_202_ACCEPTED)
 def restart_all_detections(
-    current_user: User = Depends(AuthService.get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(AuthService.get_current_active_user)
 ):
-    """Reiniciar detecção para todas as câmeras com detecção habilitada"""
+    """Reiniciar detecção de todas as câmeras habilitadas em segundo plano
+
+    Retorna imediatamente o id da tarefa; o progresso por câmera fica em
+    GET /jobs/{job_id} e é publicado no WebSocket (event=job_progress).
+    """
     try:
-        cameras = db.query(Camera).all()
-        restarted = 0
-        for cam in cameras:
-            if cam.detection_enabled and cam.stream_url:
-                detection_service.stop_monitoring(cam.id)
-                detection_service.start_monitoring(cam.id, cam.stream_url, current_user.email)
-                restarted += 1
-        return {"success": True, "restarted": restarted}
+        job = monitor_lifecycle.submit_restart_all(owner=current_user.email, user_email=current_user.email)
+        return {"success": True, "job_id": job.id, "job": job.to_dict()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao reiniciar: {e}")
 
@@ -38,30 +46,22 @@ def get_detection_status(
 ):
     """Obter status do sistema de detecção"""
     try:
-        # Estatísticas das câmeras
-        cameras = db.query(Camera).all()
-        active_cameras = [c for c in cameras if c.detection_enabled]
-        
-        # Estatísticas dos eventos (últimas 24 horas)
-        yesterday = datetime.now().timestamp() - 86400
-        recent_events = db.query(Event).filter(Event.timestamp >= datetime.fromtimestamp(yesterday)).all()
-        
-        # Eventos por tipo
-        event_types = {}
-        for event in recent_events:
-            event_type = event.event_type
-            event_types[event_type] = event_types.get(event_type, 0) + 1
-        
+        def compute() -> Dict[str, Any]:
+            # Contagens agregadas no banco (sem carregar os eventos das últimas 24h)
+            camera_stats = CameraService.get_camera_stats(db)
+            event_types = EventService.count_events_by_type(db, datetime.now() - timedelta(days=1))
+            return {
+                "total_cameras": camera_stats["total_cameras"],
+                "active_cameras": camera_stats["detection_enabled"],
+                "detection_enabled": camera_stats["detection_enabled"] > 0,
+                "recent_events_24h": sum(event_types.values()),
+                "event_types": event_types,
+            }
+
         # Status do sistema
-        system_status = {
-            "total_cameras": len(cameras),
-            "active_cameras": len(active_cameras),
-            "detection_enabled": len(active_cameras) > 0,
-            "recent_events_24h": len(recent_events),
-            "event_types": event_types,
-            "system_uptime": time.time(),
-            "last_update": datetime.now().isoformat()
-        }
+        system_status = dict(stats_cache.get_or_compute("monitoring:status", compute))
+        system_status["system_uptime"] = time.time()
+        system_status["last_update"] = datetime.now().isoformat()
         
         return system_status
         
@@ -88,12 +88,13 @@ def get_camera_detection_status(
         
         # Verificar se monitoramento está realmente ativo
         monitoring_active = detection_service.is_monitoring_active(camera_id)
-        thread_alive = camera_id in detection_service.camera_threads and detection_service.camera_threads[camera_id].is_alive()
+        task = detection_service.monitor_tasks.get(camera_id)
+        thread_alive = task is not None and task.is_alive()
+        
+        connection_state = capture_supervisor.get_camera_state(camera_id)
         
-        # Últimos eventos da câmera
-        recent_events = db.query(Event).filter(
-            Event.camera_id == camera_id
-        ).order_by(Event.timestamp.desc()).limit(5).all()
+        # Últimos eventos da câmera (cache em memória)
+        recent_events = recent_events_cache.get(db, 5, camera_id)
         
         return {
             "camera_id": camera_id,
@@ -106,13 +107,17 @@ def get_camera_detection_status(
             "sensitivity": camera.sensitivity,
             "stream_url": camera.stream_url,
             "status": "active" if (monitoring_active and thread_alive) else "inactive",
+            "connection_state": connection_state.value if connection_state else None,
+            "analysis": analysis_budget.get_camera_report(camera_id),
+            "degradation_level": overload_controller.get_level(camera_id).label,
+            "arming": detection_service.get_arming_state(camera_id),
             "recent_events": [
                 {
-                    "id": event.id,
-                    "type": event.event_type,
-                    "confidence": event.confidence,
-                    "timestamp": event.timestamp.isoformat(),
-                    "description": event.description
+                    "id": event["id"],
+                    "type": event["event_type"],
+                    "confidence": event["confidence"],
+                    "timestamp": event["timestamp"],
+                    "description": event["description"]
                 }
                 for event in recent_events
             ],
@@ -131,19 +136,27 @@ def get_camera_detection_status(
 def get_recent_events(
     limit: int = 10,
     camera_id: int = None,
+    cursor: Optional[str] = None,
+    paginate: str = "offset",
     current_user: User = Depends(AuthService.get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Obter eventos recentes"""
+    """Obter eventos recentes (paginate=cursor ou cursor=... devolve {items, next_cursor})"""
     try:
+        fields = ("id", "camera_id", "event_type", "confidence", "description", "timestamp", "image_path")
+        cursor_mode = paginate == "cursor" or bool(cursor)
+        if not cursor_mode:
+            # Últimos eventos vêm do cache em memória (consulta só se limit exceder o cache)
+            return [{field: event[field] for field in fields}
+                    for event in recent_events_cache.get(db, limit, camera_id or None)]
+
         query = db.query(Event)
         
         if camera_id:
             query = query.filter(Event.camera_id == camera_id)
         
-        events = query.order_by(Event.timestamp.desc()).limit(limit).all()
-        
-        return [
+        events, next_cursor = EventService.paginate(query, limit, cursor)
+        items = [
             {
                 "id": event.id,
                 "camera_id": event.camera_id,
@@ -155,7 +168,13 @@ def get_recent_events(
             }
             for event in events
         ]
+        return {"items": items, "next_cursor": next_cursor}
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -218,7 +237,8 @@ def get_detection_performance(
             },
             "background_subtractors": len(detection_service.bg_subtractors),
             "system_load": {
-                "active_threads": len(detection_service.camera_threads),
+                "active_threads": len(detection_service.monitor_tasks),
+                "scheduler_workers": camera_scheduler.worker_count,
                 "memory_usage": "N/A",  # Implementar se necessário
                 "cpu_usage": "N/A"      # Implementar se necessário
             },
@@ -232,3 +252,127 @@ def get_detection_performance(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao obter performance: {str(e)}"
         )
+
+@router.get("/connections")
+def get_camera_connections(
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Obter estado das conexões supervisionadas (connecting/live/degraded/offline)"""
+    try:
+        connections = capture_supervisor.get_status()
+        states: Dict[str, int] = {}
+        for info in connections.values():
+            states[info["state"]] = states.get(info["state"], 0) + 1
+        return {
+            "cameras": connections,
+            "summary": states,
+            "last_update": datetime.now().isoformat()
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao obter conexões: {str(e)}"
+        )
+
+@router.get("/scheduler")
+def get_scheduler_stats(
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Obter métricas do escalonador de câmeras (carga, atrasos e perdas de prazo por câmera)"""
+    try:
+        stats = camera_scheduler.get_stats()
+        stats["last_update"] = datetime.now().isoformat()
+        return stats
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao obter métricas do escalonador: {str(e)}"
+        )
+
+@router.get("/analysis-budget")
+def get_analysis_budget(
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Obter orçamento global de análise e taxa alvo vs alcançada por câmera"""
+    try:
+        report = analysis_budget.get_report()
+        report["last_update"] = datetime.now().isoformat()
+        return report
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao obter orçamento de análise: {str(e)}"
+        )
+
+@router.get("/inference")
+def get_inference_stats(
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Obter estatísticas da inferência em lote (tamanho médio do lote, fila e tempos)"""
+    try:
+        report = inference_batcher.get_stats()
+        report["last_update"] = datetime.now().isoformat()
+        return report
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao obter estatísticas de inferência: {str(e)}"
+        )
+
+
+@router.get("/overload")
+def get_overload_status(
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Obter estado do controle de sobrecarga (sinais, níveis de degradação e transições)"""
+    try:
+        report = overload_controller.get_status()
+        report["last_update"] = datetime.now().isoformat()
+        return report
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao obter estado de sobrecarga: {str(e)}"
+        )
+
+@router.get("/cpu-topology")
+def get_cpu_topology(
+    current_user: User = Depends(AuthService.get_current_active_user)
+):
+    """Obter plano de topologia de CPU em uso e o último benchmark"""
+    return cpu_topology.get_status()
+
+@router.post("/cpu-topology/benchmark")
+def run_cpu_topology_benchmark(
+    duration: float = 3.0,
+    apply: bool = False,
+    current_user: User = Depends(AuthService.get_current_admin_user)
+):
+    """Medir a vazão de cada divisão de núcleos e, opcionalmente, aplicar a melhor
+
+    Usa o mesmo modelo e os mesmos limites de threads dos monitores: só roda
+    com o monitoramento parado (409 caso contrário).
+    """
+    def busy() -> Optional[str]:
+        active = detection_service.get_active_monitors()
+        if active:
+            return f"Benchmark indisponível com monitoramento ativo ({len(active)} câmera(s)); pare os monitores antes"
+        return None
+
+    try:
+        return cpu_topology.benchmark(
+            model=detection_service.model,
+            duration=max(0.5, min(duration, 30.0)),
+            apply=apply,
+            busy=busy
+        )
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro no benchmark de topologia: {str(e)}"
+        )
@@ -1,16 +1,40 @@
 """
 Endpoints para streaming de câmeras
 """
-from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
 from typing import Optional
+import asyncio
+import os
+from config import settings
+from database import get_db
+from models.camera import Camera
 from services.stream_service import stream_service
+from services.webrtc_service import webrtc_service
+from services.hls_service import hls_service, MASTER_PLAYLIST
 from schemas.user import User
+from models.user import User as UserModel
 from services.auth_service import AuthService
 
 router = APIRouter()
 
 
+HLS_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+}
+
+
+class WebRTCOffer(BaseModel):
+    sdp: str
+    type: str = "offer"
+
+
 @router.get("/start/{camera_id}")
 def start_camera_stream(
     camera_id: int, 
@@ -117,3 +141,132 @@ def get_stream_info(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao obter informações: {str(e)}"
         )
+
+
+@router.post("/webrtc/{camera_id}")
+async def webrtc_signaling(
+    camera_id: int,
+    offer: WebRTCOffer,
+    current_user: User = Depends(AuthService.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Sinalização WebRTC: recebe oferta SDP e devolve a resposta do servidor"""
+    if not webrtc_service.is_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="WebRTC indisponível neste servidor"
+        )
+    if offer.type != "offer":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Tipo de descrição SDP inválido (esperado 'offer')"
+        )
+
+    # Garantir que a captura da câmera está rodando
+    capture = None
+    if not stream_service.is_stream_active(camera_id):
+        camera = db.query(Camera).filter(Camera.id == camera_id).first()
+        if not camera:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Câmera não encontrada"
+            )
+        started = await run_in_threadpool(stream_service.start_stream, camera_id, camera.stream_url)
+        if not started:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Erro ao iniciar stream da câmera {camera_id}"
+            )
+        # Captura aberta pelo WebRTC: encerrada quando o último peer se desconectar
+        capture = stream_service.active_streams.get(camera_id)
+
+    try:
+        return await webrtc_service.handle_offer(camera_id, offer.sdp, offer.type, capture=capture)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro na negociação WebRTC: {str(e)}"
+        )
+
+
+def _user_from_token(db: Session, token: Optional[str]) -> Optional[UserModel]:
+    """Usuário ativo do token JWT passado na URL (None se ausente ou inválido)"""
+    if not token:
+        return None
+    try:
+        token_data = AuthService.verify_token(token, HTTPException(status_code=status.HTTP_401_UNAUTHORIZED))
+    except HTTPException:
+        return None
+    user = db.query(UserModel).filter(UserModel.email == token_data.email).first()
+    return user if user and user.is_active else None
+
+
+@router.get("/hls/{camera_id}/{path:path}")
+async def get_hls_file(
+    camera_id: int,
+    path: str,
+    token: Optional[str] = Query(None),
+    current_user: Optional[User] = Depends(AuthService.get_current_active_user_optional),
+    db: Session = Depends(get_db)
+):
+    """Servir playlists e segmentos HLS (master.m3u8 por padrão)
+
+    Iniciar a codificação (e a captura, se parada) exige autenticação: header
+    Bearer ou `token` na URL da playlist. Arquivos de um segmentador já ativo
+    são servidos sem token, como o /mjpeg, pois players HLS pedem as playlists
+    e segmentos relativos sem repassar a query string.
+    """
+    path = path or MASTER_PLAYLIST
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in HLS_MEDIA_TYPES:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Arquivo HLS inválido")
+
+    if extension == ".m3u8":
+        if not hls_service.is_available():
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="HLS indisponível (ffmpeg não encontrado)"
+            )
+        if not (current_user or _user_from_token(db, token)):
+            # Sem autenticação: apenas manter ativo um segmentador em execução
+            if not hls_service.request_playlist(camera_id, start=False):
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Autenticação necessária para iniciar o HLS",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+        else:
+            # Garantir captura ativa antes de iniciar o segmentador
+            capture = None
+            if not stream_service.is_stream_active(camera_id):
+                camera = db.query(Camera).filter(Camera.id == camera_id).first()
+                if not camera:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Câmera não encontrada"
+                    )
+                started = await run_in_threadpool(stream_service.start_stream, camera_id, camera.stream_url)
+                if not started:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Erro ao iniciar stream da câmera {camera_id}"
+                    )
+                # Captura aberta pelo HLS: encerrada quando o segmentador ficar ocioso
+                capture = stream_service.active_streams.get(camera_id)
+            hls_service.request_playlist(camera_id, capture=capture)
+
+        # Na primeira requisição, aguardar o primeiro segmento ser produzido
+        deadline = settings.hls_segment_seconds * 2 + 5
+        waited = 0.0
+        while hls_service.resolve_file(camera_id, path) is None and waited < deadline:
+            await asyncio.sleep(0.25)
+            waited += 0.25
+
+    file_path = hls_service.resolve_file(camera_id, path)
+    if not file_path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Arquivo HLS não disponível para câmera {camera_id}"
+        )
+    headers = {"Cache-Control": "no-cache"} if extension == ".m3u8" else None
+    return FileResponse(file_path, media_type=HLS_MEDIA_TYPES[extension], headers=headers)
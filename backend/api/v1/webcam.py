@@ -1,43 +1,27 @@
 """
 Endpoints para gerenciamento de câmeras web
 """
-import cv2
+from datetime import datetime
 from fastapi import APIRouter, HTTPException, status
 from typing import List, Dict
 
+from services.capture_supervisor import open_video_capture
+from services.device_registry import device_registry
+
 router = APIRouter()
 
 
 @router.get("/devices")
-def get_available_cameras():
-    """Listar câmeras disponíveis no sistema"""
+def get_available_cameras(refresh: bool = False):
+    """Listar câmeras disponíveis no sistema (registro em cache, sondagem paralela)"""
     try:
-        available_cameras = []
-        
-        # Testar índices de câmera de 0 a 10
-        for i in range(10):
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                # Tentar ler um frame para verificar se a câmera está funcionando
-                ret, frame = cap.read()
-                if ret:
-                    # Obter propriedades da câmera
-                    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                    fps = cap.get(cv2.CAP_PROP_FPS)
-                    
-                    available_cameras.append({
-                        "index": i,
-                        "name": f"Câmera {i}",
-                        "resolution": f"{width}x{height}",
-                        "fps": fps,
-                        "stream_url": f"webcam://{i}"
-                    })
-                cap.release()
+        available_cameras = device_registry.get_devices(force_refresh=refresh)
         
         return {
             "cameras": available_cameras,
-            "total": len(available_cameras)
+            "total": len(available_cameras),
+            "cached_at": datetime.fromtimestamp(device_registry.last_refresh).isoformat()
+            if device_registry.last_refresh else None
         }
         
     except Exception as e:
@@ -51,7 +35,17 @@ def get_available_cameras():
 def test_camera(camera_index: int):
     """Testar câmera específica"""
     try:
-        cap = cv2.VideoCapture(camera_index)
+        # Webcam já em uso por uma captura: responder pelo registro sem reabrir
+        device = device_registry.get_device(camera_index)
+        if device and device.get("in_use"):
+            return {
+                "success": True,
+                "message": f"Câmera {camera_index} está em uso e funcionando",
+                "camera_index": camera_index,
+                "in_use": True
+            }
+        
+        cap = open_video_capture(f"webcam://{camera_index}")
         if not cap.isOpened():
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -51,7 +51,141 @@ class Settings(BaseSettings):
     # Configurações de Câmera
     default_fps: int = Field(default=15, env="DEFAULT_FPS")
     default_resolution: str = Field(default="640x480", env="DEFAULT_RESOLUTION")
-    
+
+    # Supervisão de conexões de câmera
+    # Limite global de aberturas simultâneas de VideoCapture (evita tempestade de reconexões)
+    capture_max_concurrent_opens: int = Field(default=4, env="CAPTURE_MAX_CONCURRENT_OPENS")
+    capture_backoff_base: float = Field(default=1.0, env="CAPTURE_BACKOFF_BASE")  # segundos
+    capture_backoff_max: float = Field(default=60.0, env="CAPTURE_BACKOFF_MAX")  # segundos
+    # Falhas de leitura consecutivas para marcar como degradada / forçar reconexão
+    capture_degraded_after: int = Field(default=5, env="CAPTURE_DEGRADED_AFTER")
+    capture_reconnect_after: int = Field(default=30, env="CAPTURE_RECONNECT_AFTER")
+    # Tentativas de conexão falhas seguidas para considerar a câmera offline
+    capture_offline_after: int = Field(default=3, env="CAPTURE_OFFLINE_AFTER")
+
+    # Escalonador de câmeras (pool fixo de threads para todas as câmeras)
+    # 0 = definido pelo plano de topologia de CPU
+    scheduler_workers: int = Field(default=0, env="SCHEDULER_WORKERS")
+    # Atraso acima do qual uma execução conta como perda de prazo
+    scheduler_deadline_tolerance_ms: int = Field(default=50, env="SCHEDULER_DEADLINE_TOLERANCE_MS")
+
+    # Topologia de CPU (threads intra-op de torch/OpenCV por thread de trabalho)
+    cpu_reserved_cores: int = Field(default=1, env="CPU_RESERVED_CORES")  # API e codificação
+    cpu_threads_per_worker: int = Field(default=1, env="CPU_THREADS_PER_WORKER")
+    # Fixar cada thread de trabalho em seus núcleos (apenas Linux)
+    cpu_affinity_enabled: bool = Field(default=False, env="CPU_AFFINITY_ENABLED")
+
+    # Orçamento global de análise (frames analisados por segundo, somando todas as câmeras)
+    # 0 = automático, a partir do custo medido e do número de threads do escalonador
+    analysis_budget_fps: float = Field(default=0.0, env="ANALYSIS_BUDGET_FPS")
+    # Fração das threads do escalonador reservada para análise no modo automático
+    analysis_target_utilization: float = Field(default=0.7, env="ANALYSIS_TARGET_UTILIZATION")
+    analysis_floor_fps: float = Field(default=0.5, env="ANALYSIS_FLOOR_FPS")  # câmeras ociosas
+    analysis_max_fps: float = Field(default=5.0, env="ANALYSIS_MAX_FPS")  # por câmera
+    # Segundos em que movimento/intrusão recentes mantêm a câmera priorizada
+    analysis_priority_window: float = Field(default=30.0, env="ANALYSIS_PRIORITY_WINDOW")
+    analysis_rebalance_interval: float = Field(default=2.0, env="ANALYSIS_REBALANCE_INTERVAL")
+    analysis_rate_window: float = Field(default=10.0, env="ANALYSIS_RATE_WINDOW")  # janela da taxa alcançada
+    # Taxa de leitura de frames entre análises (mantém o buffer da câmera atualizado)
+    capture_fps: int = Field(default=15, env="CAPTURE_FPS")
+    capture_min_fps: float = Field(default=5.0, env="CAPTURE_MIN_FPS")
+
+    # Controle de sobrecarga (degradação automática sob saturação da inferência)
+    overload_eval_interval: float = Field(default=2.0, env="OVERLOAD_EVAL_INTERVAL")  # segundos
+    # Profundidade de fila (tarefas atrasadas + fila de inferência) para degradar / recuperar
+    overload_queue_high: int = Field(default=4, env="OVERLOAD_QUEUE_HIGH")
+    overload_queue_low: int = Field(default=1, env="OVERLOAD_QUEUE_LOW")
+    # Latência por frame (pior câmera) para degradar / recuperar
+    overload_latency_high_ms: float = Field(default=500.0, env="OVERLOAD_LATENCY_HIGH_MS")
+    overload_latency_low_ms: float = Field(default=200.0, env="OVERLOAD_LATENCY_LOW_MS")
+    # Carga baixa contínua necessária antes de cada passo de recuperação
+    overload_recovery_seconds: float = Field(default=10.0, env="OVERLOAD_RECOVERY_SECONDS")
+    overload_reduced_imgsz: int = Field(default=320, env="OVERLOAD_REDUCED_IMGSZ")  # entrada do YOLO
+    overload_rate_factor: float = Field(default=0.5, env="OVERLOAD_RATE_FACTOR")  # nível de taxa reduzida
+
+    # Descoberta de webcams locais
+    webcam_max_index: int = Field(default=10, env="WEBCAM_MAX_INDEX")
+    webcam_probe_timeout: float = Field(default=3.0, env="WEBCAM_PROBE_TIMEOUT")  # segundos por índice
+    webcam_registry_ttl: int = Field(default=60, env="WEBCAM_REGISTRY_TTL")  # segundos
+
+    # Configurações de WebRTC (opcional, requer aiortc)
+    webrtc_enabled: bool = Field(default=True, env="WEBRTC_ENABLED")
+    webrtc_fps: int = Field(default=15, env="WEBRTC_FPS")
+    webrtc_bitrate: int = Field(default=1_000_000, env="WEBRTC_BITRATE")
+    # Intervalo entre keyframes (em frames); novos peers aguardam o próximo keyframe
+    webrtc_keyframe_interval: int = Field(default=15, env="WEBRTC_KEYFRAME_INTERVAL")
+
+    # Configurações de HLS (requer ffmpeg no PATH)
+    ffmpeg_path: str = Field(default="ffmpeg", env="FFMPEG_PATH")
+    hls_dir: str = Field(default="./hls", env="HLS_DIR")
+    # Alturas das renditions separadas por vírgula (ex.: "360,720")
+    hls_renditions: str = Field(default="360,720", env="HLS_RENDITIONS")
+    hls_fps: int = Field(default=10, env="HLS_FPS")
+    hls_segment_seconds: int = Field(default=2, env="HLS_SEGMENT_SECONDS")
+    hls_playlist_size: int = Field(default=6, env="HLS_PLAYLIST_SIZE")
+    hls_segment_type: str = Field(default="mpegts", env="HLS_SEGMENT_TYPE")  # mpegts ou fmp4
+    # Codificação para quando nenhum cliente pediu playlist nos últimos N segundos
+    hls_idle_timeout: int = Field(default=30, env="HLS_IDLE_TIMEOUT")
+
+    # Tarefas em segundo plano
+    job_max_concurrent: int = Field(default=4, env="JOB_MAX_CONCURRENT")
+    job_history_size: int = Field(default=100, env="JOB_HISTORY_SIZE")  # tarefas mantidas para consulta
+    # Pool separado para início/reinício em lote dos monitores
+    job_lifecycle_concurrent: int = Field(default=2, env="JOB_LIFECYCLE_CONCURRENT")
+    # Câmeras paradas/iniciadas em paralelo por operações em lote (restart-all, inicialização)
+    lifecycle_concurrency: int = Field(default=8, env="LIFECYCLE_CONCURRENCY")
+
+    # Validade (s) das estatísticas do dashboard em cache; 0 desativa o cache
+    stats_cache_ttl: float = Field(default=10.0, env="STATS_CACHE_TTL")
+
+    # Eventos mais recentes mantidos em memória (total e por câmera) para dashboard e monitoramento
+    recent_events_cache_size: int = Field(default=100, env="RECENT_EVENTS_CACHE_SIZE")
+
+    # Exportação de eventos: linhas lidas do cursor do banco por vez
+    export_batch_size: int = Field(default=1000, env="EXPORT_BATCH_SIZE")
+
+    # Arquivamento de eventos: meses anteriores a N dias saem da tabela events
+    # para arquivos .ndjson.gz (estatísticas seguem na agregação horária); 0 desativa
+    event_archive_after_days: int = Field(default=0, env="EVENT_ARCHIVE_AFTER_DAYS")
+    event_archive_dir: str = Field(default="./archive", env="EVENT_ARCHIVE_DIR")
+    event_archive_batch_size: int = Field(default=1000, env="EVENT_ARCHIVE_BATCH_SIZE")  # eventos por transação
+    event_archive_interval_hours: float = Field(default=24.0, env="EVENT_ARCHIVE_INTERVAL_HOURS")
+
+    # Retenção de eventos e arquivos (padrões para câmeras sem política própria; 0 = sem limite)
+    retention_default_days: int = Field(default=0, env="RETENTION_DEFAULT_DAYS")
+    retention_default_max_mb: int = Field(default=0, env="RETENTION_DEFAULT_MAX_MB")
+    retention_interval_minutes: float = Field(default=60.0, env="RETENTION_INTERVAL_MINUTES")
+    retention_batch_size: int = Field(default=500, env="RETENTION_BATCH_SIZE")  # eventos por transação
+    # Screenshots sem evento são removidos após este prazo (arquivos em gravação ficam protegidos)
+    screenshot_gc_grace_minutes: float = Field(default=60.0, env="SCREENSHOT_GC_GRACE_MINUTES")
+
+    # Análise offline de vídeos
+    # 0 = número de threads de trabalho do plano de topologia de CPU
+    video_analysis_workers: int = Field(default=0, env="VIDEO_ANALYSIS_WORKERS")
+    video_analysis_sample_fps: float = Field(default=5.0, env="VIDEO_ANALYSIS_SAMPLE_FPS")  # frames analisados por segundo de vídeo
+    video_analysis_chunk_seconds: int = Field(default=20, env="VIDEO_ANALYSIS_CHUNK_SECONDS")
+    # Segundos antes de cada trecho usados para aquecer o modelo de fundo
+    video_analysis_warmup_seconds: float = Field(default=2.0, env="VIDEO_ANALYSIS_WARMUP_SECONDS")
+    video_analysis_thumbnail_width: int = Field(default=320, env="VIDEO_ANALYSIS_THUMBNAIL_WIDTH")
+    # Detecções separadas por até N segundos formam um único evento na linha do tempo
+    video_analysis_merge_gap: float = Field(default=3.0, env="VIDEO_ANALYSIS_MERGE_GAP")
+    # Miniaturas e vídeos enviados sem tarefa no histórico (ex.: após reinício)
+    # são removidos pela passada de retenção depois de N minutos
+    video_analysis_orphan_grace_minutes: float = Field(default=60.0, env="VIDEO_ANALYSIS_ORPHAN_GRACE_MINUTES")
+
+    # Inferência YOLO em lote (monitores e /detection/infer compartilham a fila)
+    inference_batching_enabled: bool = Field(default=True, env="INFERENCE_BATCHING_ENABLED")
+    inference_batch_size: int = Field(default=8, env="INFERENCE_BATCH_SIZE")
+    # Espera máxima para completar um lote a partir do primeiro frame da fila
+    inference_batch_wait_ms: float = Field(default=10.0, env="INFERENCE_BATCH_WAIT_MS")
+    inference_timeout: float = Field(default=10.0, env="INFERENCE_TIMEOUT")
+    # Frames por requisição em /detection/infer
+    inference_max_frames: int = Field(default=16, env="INFERENCE_MAX_FRAMES")
+    # Idade máxima (s) do frame ao vivo usado em /detection/test; mais antigo abre captura avulsa
+    detection_test_max_frame_age: float = Field(default=5.0, env="DETECTION_TEST_MAX_FRAME_AGE")
+    # Espera (s) por uma vaga de abertura de conexão (capture_max_concurrent_opens) na captura avulsa
+    detection_test_open_timeout: float = Field(default=10.0, env="DETECTION_TEST_OPEN_TIMEOUT")
+
     # Configurações de Email (SMTP)
     smtp_server: str = Field(default="smtp.gmail.com", env="SMTP_SERVER")
     smtp_port: int = Field(default=587, env="SMTP_PORT")
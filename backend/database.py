@@ -1,11 +1,16 @@
 """
 Configuração do banco de dados MySQL
 """
-from sqlalchemy import create_engine, MetaData
+import logging
+import os
+
+from sqlalchemy import create_engine, inspect, MetaData
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
 
+logger = logging.getLogger(__name__)
+
 # Criar engine do MySQL
 engine = create_engine(
     settings.database_url,
@@ -33,9 +38,41 @@ def get_db():
         db.close()
 
 
+# Revisão correspondente a bancos criados por create_all antes das migrações
+LEGACY_BASELINE_REVISION = "0001_baseline"
+LEGACY_ARMING_REVISION = "0002_arming_schedule"
+
+
+def _alembic_config():
+    from alembic.config import Config
+
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    config = Config(os.path.join(backend_dir, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(backend_dir, "alembic"))
+    # Manter a configuração de logging da aplicação
+    config.attributes["configure_logger"] = False
+    return config
+
+
 def create_tables():
-    """Criar todas as tabelas no banco"""
-    Base.metadata.create_all(bind=engine)
+    """Criar/atualizar tabelas no banco aplicando as migrações (alembic upgrade head)
+
+    Bancos criados por create_all antes das migrações são marcados na revisão
+    equivalente ao esquema existente e então atualizados.
+    """
+    from alembic import command
+
+    config = _alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        inspector = inspect(connection)
+        tables = set(inspector.get_table_names())
+        if "alembic_version" not in tables and "events" in tables:
+            camera_columns = {column["name"] for column in inspector.get_columns("cameras")}
+            revision = LEGACY_ARMING_REVISION if "arming_schedule" in camera_columns else LEGACY_BASELINE_REVISION
+            logger.info(f"Banco existente sem migrações: marcando revisão {revision}")
+            command.stamp(config, revision)
+        command.upgrade(config, "head")
 
 
 def drop_tables():
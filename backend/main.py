@@ -9,10 +9,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
-from sqlalchemy.orm import Session
 
 from config import settings
-from database import create_tables, SessionLocal
+from database import SessionLocal, create_tables
 from api.v1 import api_router
 from models.camera import Camera
 from services.detection_service import detection_service
@@ -72,23 +71,40 @@ async def startup_event():
     os.makedirs(os.path.join(settings.upload_dir, "videos"), exist_ok=True)
     logger.info("Diretórios criados")
     
-    # Iniciar monitoramento para todas as câmeras com detecção habilitada
+    # Aquecer cache dos eventos recentes (dashboard e monitoramento não consultam o banco)
     try:
-        db: Session = SessionLocal()
-        cameras = db.query(Camera).all()
-        started = 0
-        for cam in cameras:
-            if cam.detection_enabled and cam.stream_url:
-                try:
-                    detection_service.start_monitoring(cam.id, cam.stream_url)
-                    started += 1
-                except Exception as e:
-                    logger.error(f"Falha ao iniciar detecção para câmera {cam.id}: {e}")
-        db.close()
-        logger.info(f"Detecção iniciada para {started} câmera(s)")
+        from services.recent_events_cache import recent_events_cache
+        db = SessionLocal()
+        try:
+            recent_events_cache.warm(db)
+        finally:
+            db.close()
+    except Exception as e:
+        logger.warning(f"Não foi possível aquecer o cache de eventos recentes: {e}")
+
+    # Carregar modelo YOLO em segundo plano (monitores aguardam o aquecimento)
+    detection_service.start_model_warmup()
+
+    # Controle de sobrecarga da inferência (avaliação periódica no escalonador)
+    from services.overload_controller import overload_controller
+    overload_controller.start()
+
+    # Iniciar monitoramento das câmeras habilitadas em paralelo, sem bloquear a inicialização
+    try:
+        from services.monitor_lifecycle import monitor_lifecycle
+        job = monitor_lifecycle.submit_start_all(owner="system")
+        logger.info(f"Início da detecção agendado (tarefa {job.id})")
     except Exception as e:
         logger.warning(f"Não foi possível iniciar detecção automática: {e}")
 
+    # Arquivamento mensal de eventos antigos (se EVENT_ARCHIVE_AFTER_DAYS > 0)
+    from services.event_archive_service import event_archive_service
+    event_archive_service.start()
+
+    # Retenção por câmera e coleta de screenshots sem evento
+    from services.retention_service import retention_service
+    retention_service.start()
+
     logger.info("SecureVision iniciado com sucesso!")
 
 
@@ -104,6 +120,57 @@ async def shutdown_event():
             detection_service.stop_monitoring(camera_id)
     except Exception as e:
         logger.error(f"Erro ao parar monitoramentos: {e}")
+
+    # Parar agendamento do arquivamento de eventos
+    try:
+        from services.event_archive_service import event_archive_service
+        event_archive_service.stop()
+    except Exception as e:
+        logger.error(f"Erro ao parar arquivamento de eventos: {e}")
+
+    # Parar agendamento da retenção de eventos
+    try:
+        from services.retention_service import retention_service
+        retention_service.stop()
+    except Exception as e:
+        logger.error(f"Erro ao parar retenção de eventos: {e}")
+
+    # Parar segmentadores HLS
+    try:
+        from services.hls_service import hls_service
+        hls_service.shutdown()
+    except Exception as e:
+        logger.error(f"Erro ao encerrar HLS: {e}")
+
+    # Fechar peers WebRTC
+    try:
+        from services.webrtc_service import webrtc_service
+        await webrtc_service.shutdown()
+    except Exception as e:
+        logger.error(f"Erro ao encerrar WebRTC: {e}")
+
+    # Encerrar tarefas restantes (streams) e as threads do escalonador
+    try:
+        from services.camera_scheduler import camera_scheduler
+        camera_scheduler.shutdown()
+    except Exception as e:
+        logger.error(f"Erro ao encerrar escalonador de câmeras: {e}")
+
+    # Parar fila de inferência em lote
+    try:
+        from services.inference_service import inference_batcher
+        inference_batcher.shutdown()
+    except Exception as e:
+        logger.error(f"Erro ao encerrar inferência em lote: {e}")
+
+    # Cancelar tarefas em segundo plano e encerrar processos de análise de vídeo
+    try:
+        from services.job_manager import job_manager
+        from services.video_analysis_service import video_analysis_service
+        job_manager.shutdown()
+        video_analysis_service.shutdown()
+    except Exception as e:
+        logger.error(f"Erro ao encerrar tarefas em segundo plano: {e}")
     
     logger.info("SecureVision parado com sucesso!")
 
@@ -31,6 +31,15 @@ class Camera(Base):
     sensitivity = Column(Integer, default=50, nullable=False)  # 0-100
     fps = Column(Integer, default=15, nullable=False)
     resolution = Column(String(20), default="640x480", nullable=False)
+    # Agenda de armação: {"timezone": ..., "windows": [{"days": [0-6], "start": "HH:MM", "end": "HH:MM"}]}
+    arming_schedule = Column(JSON, nullable=True)
+    # Exceções por data (feriados): [{"date": "YYYY-MM-DD", "armed": false}]
+    arming_overrides = Column(JSON, nullable=True)
+    # Comportamento fora das janelas armadas: "capture" (só captura) ou "release" (libera o stream)
+    disarmed_mode = Column(String(20), default="capture", nullable=False)
+    # Retenção de eventos (None = padrão global; 0 = sem limite)
+    retention_days = Column(Integer, nullable=True)
+    retention_max_mb = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
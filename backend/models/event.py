@@ -1,7 +1,7 @@
 """
 Modelo de evento
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Float, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -18,6 +18,13 @@ class EventType(str, enum.Enum):
 class Event(Base):
     """Modelo de evento"""
     __tablename__ = "events"
+    # Índices das consultas quentes (filtro + ordenação por timestamp); ver migração 0003
+    __table_args__ = (
+        Index("ix_events_timestamp", "timestamp"),
+        Index("ix_events_camera_timestamp", "camera_id", "timestamp"),
+        Index("ix_events_type_timestamp", "event_type", "timestamp"),
+        Index("ix_events_notified_timestamp", "is_notified", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     camera_id = Column(Integer, ForeignKey("cameras.id"), nullable=True)  # Permitir NULL para eventos sem câmera
@@ -29,6 +36,7 @@ class Event(Base):
     # Arquivos
     image_path = Column(String(500), nullable=True)
     video_path = Column(String(500), nullable=True)
+    file_bytes = Column(Integer, nullable=True)  # Tamanho dos arquivos em disco (retenção por espaço)
     
     # Metadados da detecção
     detected_objects = Column(JSON, nullable=True)  # Lista de objetos detectados
@@ -47,3 +55,8 @@ class Event(Base):
     def __repr__(self):
         return f"<Event(id={self.id}, type='{self.event_type}', camera_id={self.camera_id})>"
 
+
+
+# Registra os eventos de mapper das tabelas derivadas (event_rollups, event_detections)
+import models.event_rollup  # noqa: E402,F401
+import models.event_detection  # noqa: E402,F401
@@ -0,0 +1,36 @@
+"""
+Modelo de arquivo de eventos
+
+Registro de cada arquivo .ndjson.gz com os eventos de um mês que saíram da
+tabela events. `status` = "deleting" enquanto os eventos arquivados ainda
+estão sendo removidos do banco (retomado na próxima execução).
+`files_pruned` marca arquivos cujos screenshots/vídeos já foram todos
+removidos pela retenção (a passada deixa de relê-los).
+"""
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Integer, String, false
+from sqlalchemy.sql import func
+
+from database import Base
+
+ARCHIVE_DELETING = "deleting"
+ARCHIVE_DONE = "done"
+
+
+class EventArchive(Base):
+    """Arquivo compactado com os eventos de um mês"""
+    __tablename__ = "event_archives"
+
+    id = Column(Integer, primary_key=True)
+    month_start = Column(DateTime(timezone=True), nullable=False, index=True)
+    month_end = Column(DateTime(timezone=True), nullable=False)
+    path = Column(String(500), nullable=False)
+    status = Column(String(20), nullable=False, default=ARCHIVE_DELETING)
+    event_count = Column(Integer, nullable=False, default=0)
+    detection_count = Column(Integer, nullable=False, default=0)
+    size_bytes = Column(BigInteger, nullable=False, default=0)
+    files_pruned = Column(Boolean, nullable=False, default=False, server_default=false())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<EventArchive(month={self.month_start:%Y-%m}, events={self.event_count}, status='{self.status}')>"
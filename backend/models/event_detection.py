@@ -0,0 +1,108 @@
+"""
+Modelo de detecção de evento
+
+Uma linha compacta por objeto detectado num evento: classe (id COCO),
+confiança, caixa normalizada, zona e célula da grade 32x32 do centro. Câmera e
+timestamp são copiados do evento para que consultas por classe/câmera/período
+ou por região do frame usem só os índices desta tabela.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, SmallInteger, delete, event
+
+from database import Base
+from models.event import Event
+
+# Coordenadas da caixa normalizadas para 0..BBOX_SCALE (independente da resolução)
+BBOX_SCALE = 10000
+# Grade de células do centro da caixa (mesma resolução do HeatmapGenerator)
+GRID_SIZE = 32
+
+# Ids COCO das classes relevantes (os mesmos do modelo YOLO)
+CLASS_IDS = {
+    'person': 0,
+    'bicycle': 1,
+    'car': 2,
+    'motorcycle': 3,
+    'bus': 5,
+    'truck': 7,
+}
+CLASS_NAMES = {class_id: name for name, class_id in CLASS_IDS.items()}
+
+
+class EventDetection(Base):
+    """Objeto detectado num evento"""
+    __tablename__ = "event_detections"
+    __table_args__ = (
+        Index("ix_event_detections_class_camera_timestamp", "class_id", "camera_id", "timestamp"),
+        Index("ix_event_detections_camera_timestamp", "camera_id", "timestamp"),
+        Index("ix_event_detections_camera_cell_timestamp", "camera_id", "cell_id", "timestamp"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False, index=True)
+    camera_id = Column(Integer, nullable=True)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    class_id = Column(SmallInteger, nullable=False)
+    confidence = Column(Float, nullable=False)
+    x1 = Column(SmallInteger, nullable=False)
+    y1 = Column(SmallInteger, nullable=False)
+    x2 = Column(SmallInteger, nullable=False)
+    y2 = Column(SmallInteger, nullable=False)
+    zone_index = Column(SmallInteger, nullable=True)  # zona que contém o centro (None = fora/sem zona)
+    cell_id = Column(SmallInteger, nullable=False)  # célula do centro na grade: linha * GRID_SIZE + coluna
+
+    def __repr__(self):
+        return f"<EventDetection(event_id={self.event_id}, class={CLASS_NAMES.get(self.class_id, self.class_id)})>"
+
+
+def grid_cell(x1: int, y1: int, x2: int, y2: int) -> int:
+    """Célula da grade que contém o centro da caixa normalizada"""
+    column = min(GRID_SIZE - 1, (x1 + x2) * GRID_SIZE // (2 * BBOX_SCALE))
+    row = min(GRID_SIZE - 1, (y1 + y2) * GRID_SIZE // (2 * BBOX_SCALE))
+    return row * GRID_SIZE + column
+
+
+def cell_ranges(x1: int, y1: int, x2: int, y2: int) -> List[Tuple[int, int]]:
+    """Intervalos contíguos de células (uma por linha da grade) cobertos pelo retângulo normalizado"""
+    first_column, last_column = (min(GRID_SIZE - 1, value * GRID_SIZE // BBOX_SCALE) for value in (x1, x2))
+    first_row, last_row = (min(GRID_SIZE - 1, value * GRID_SIZE // BBOX_SCALE) for value in (y1, y2))
+    if first_column == 0 and last_column == GRID_SIZE - 1:
+        # Linhas inteiras formam um único intervalo
+        return [(first_row * GRID_SIZE, last_row * GRID_SIZE + GRID_SIZE - 1)]
+    return [(row * GRID_SIZE + first_column, row * GRID_SIZE + last_column) for row in range(first_row, last_row + 1)]
+
+
+def detection_rows(event: Event, objects: List[Dict], frame_shape: Tuple[int, ...]) -> List[Dict]:
+    """Linhas de event_detections para os objetos YOLO de um evento já inserido"""
+    height, width = frame_shape[0], frame_shape[1]
+    rows = []
+    for obj in objects:
+        class_id: Optional[int] = obj.get('class_id', CLASS_IDS.get(obj.get('class')))
+        if class_id is None or not obj.get('bbox'):
+            continue
+        x1, y1, x2, y2 = (_scale(value, size) for value, size in zip(obj['bbox'], (width, height, width, height)))
+        rows.append({
+            'event_id': event.id,
+            'camera_id': event.camera_id,
+            'timestamp': event.timestamp,
+            'class_id': class_id,
+            'confidence': round(float(obj['confidence']), 4),
+            'x1': x1,
+            'y1': y1,
+            'x2': x2,
+            'y2': y2,
+            'zone_index': obj.get('zone_index'),
+            'cell_id': grid_cell(x1, y1, x2, y2),
+        })
+    return rows
+
+
+def _scale(value: float, size: int) -> int:
+    return max(0, min(BBOX_SCALE, int(round(value * BBOX_SCALE / max(1, size)))))
+
+
+@event.listens_for(Event, "before_delete")
+def _delete_event_detections(mapper, connection, target: Event):
+    # Sem depender de ON DELETE CASCADE (desligado por padrão no SQLite)
+    connection.execute(delete(EventDetection.__table__).where(EventDetection.__table__.c.event_id == target.id))
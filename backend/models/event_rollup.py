@@ -0,0 +1,102 @@
+"""
+Modelo de agregação horária de eventos
+
+Uma linha por (câmera, tipo, hora) com o número de eventos daquela hora. A
+tabela é mantida na mesma transação de cada INSERT/DELETE de evento feito pelo
+ORM (eventos de mapper abaixo), então estatísticas e gráficos leem O(horas) em
+vez de O(eventos). Exclusões em massa (`query.delete()`) não passam pelo
+mapper e devem usar `EventRollupService.subtract_events`; a exceção é o
+arquivamento mensal, que mantém as contagens dos meses arquivados.
+"""
+import enum
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, Integer, String, UniqueConstraint, event, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from database import Base
+from models.event import Event
+
+# Eventos sem câmera usam 0: a chave única não funciona com NULL
+NO_CAMERA = 0
+
+
+class EventRollup(Base):
+    """Contagem de eventos por câmera, tipo e hora"""
+    __tablename__ = "event_rollups"
+    __table_args__ = (
+        UniqueConstraint("camera_id", "event_type", "bucket", name="uq_event_rollups_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    camera_id = Column(Integer, nullable=False, default=NO_CAMERA)
+    event_type = Column(String(50), nullable=False)
+    bucket = Column(DateTime(timezone=True), nullable=False, index=True)  # início da hora
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<EventRollup(camera_id={self.camera_id}, type='{self.event_type}', bucket={self.bucket}, count={self.count})>"
+
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    """Início da hora do timestamp"""
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_key(camera_id: Optional[int], event_type, timestamp: datetime) -> tuple:
+    # Eventos criados pela API trazem EventType; os lidos do banco, a string
+    event_type = event_type.value if isinstance(event_type, enum.Enum) else str(event_type)
+    return (camera_id if camera_id is not None else NO_CAMERA, event_type, hour_bucket(timestamp))
+
+
+def apply_rollup_delta(connection, key: tuple, delta: int):
+    """Somar `delta` à contagem de uma hora (upsert); linhas zeradas são removidas"""
+    if delta == 0:
+        return
+    table = EventRollup.__table__
+    camera_id, event_type, bucket = key
+    match = (table.c.camera_id == camera_id) & (table.c.event_type == event_type) & (table.c.bucket == bucket)
+
+    if delta < 0:
+        connection.execute(table.update().where(match).values(count=table.c.count + delta))
+        connection.execute(table.delete().where(match & (table.c.count <= 0)))
+        return
+
+    values = {"camera_id": camera_id, "event_type": event_type, "bucket": bucket, "count": delta}
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        statement = insert(table).values(**values).on_conflict_do_update(
+            index_elements=["camera_id", "event_type", "bucket"],
+            set_={"count": table.c.count + delta},
+        )
+        connection.execute(statement)
+    elif dialect in ("mysql", "mariadb"):
+        statement = mysql.insert(table).values(**values)
+        connection.execute(statement.on_duplicate_key_update(count=table.c.count + delta))
+    else:
+        updated = connection.execute(table.update().where(match).values(count=table.c.count + delta))
+        if not updated.rowcount:
+            connection.execute(table.insert().values(**values))
+
+
+def _event_timestamp(connection, target: Event) -> datetime:
+    # Eventos sem timestamp explícito recebem o server_default do banco
+    if target.timestamp is not None:
+        return target.timestamp
+    return connection.execute(
+        select(Event.__table__.c.timestamp).where(Event.__table__.c.id == target.id)
+    ).scalar_one()
+
+
+@event.listens_for(Event, "after_insert")
+def _rollup_after_insert(mapper, connection, target: Event):
+    apply_rollup_delta(connection, rollup_key(target.camera_id, target.event_type,
+                                              _event_timestamp(connection, target)), 1)
+
+
+@event.listens_for(Event, "after_delete")
+def _rollup_after_delete(mapper, connection, target: Event):
+    if target.timestamp is not None:
+        apply_rollup_delta(connection, rollup_key(target.camera_id, target.event_type, target.timestamp), -1)
@@ -1,7 +1,7 @@
 """
 Schemas de câmera
 """
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, field_validator
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from models.camera import CameraStatus
@@ -46,6 +46,11 @@ class CameraInDB(CameraBase):
     # No banco é JSON, expor como dict no schema para evitar 500 de validação
     detection_line: Optional[Dict[str, Any]] = None
     detection_zone: Optional[Dict[str, Any]] = None
+    arming_schedule: Optional[Dict[str, Any]] = None
+    arming_overrides: Optional[List[Dict[str, Any]]] = None
+    disarmed_mode: Optional[str] = "capture"
+    retention_days: Optional[int] = None
+    retention_max_mb: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -90,3 +95,36 @@ class DetectionZoneConfig(BaseModel):
             int: lambda v: int(v)
         }
 
+
+class ArmingWindow(BaseModel):
+    """Janela semanal armada (fim <= início indica janela que vira a meia-noite)"""
+    days: List[int] = [0, 1, 2, 3, 4, 5, 6]  # 0=segunda ... 6=domingo
+    start: str = "00:00"
+    end: str = "24:00"
+
+
+class ArmingOverride(BaseModel):
+    """Exceção por data (feriado): arma ou desarma o dia inteiro"""
+    date: str  # YYYY-MM-DD
+    armed: bool = False
+
+
+class ArmingScheduleConfig(BaseModel):
+    """Schema para configuração da agenda de armação"""
+    timezone: Optional[str] = None
+    windows: List[ArmingWindow] = []
+    overrides: List[ArmingOverride] = []
+    disarmed_mode: str = "capture"
+
+    @field_validator("disarmed_mode")
+    @classmethod
+    def validate_disarmed_mode(cls, value: str) -> str:
+        if value not in ("capture", "release"):
+            raise ValueError("disarmed_mode deve ser 'capture' ou 'release'")
+        return value
+
+
+class RetentionPolicyConfig(BaseModel):
+    """Schema para política de retenção da câmera (None = padrão global, 0 = sem limite)"""
+    retention_days: Optional[int] = Field(default=None, ge=0)  # idade máxima dos eventos em dias
+    retention_max_mb: Optional[int] = Field(default=None, ge=0)  # espaço máximo dos arquivos dos eventos em MB
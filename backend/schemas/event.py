@@ -50,6 +50,12 @@ class Event(EventInDB):
     pass
 
 
+class EventPage(BaseModel):
+    """Página de eventos com paginação por cursor"""
+    items: List[Event]
+    next_cursor: Optional[str] = None  # None quando não há mais páginas
+
+
 class EventWithCamera(Event):
     """Schema de evento com dados da câmera"""
     camera: "Camera"
@@ -68,6 +74,45 @@ class EventStats(BaseModel):
     peak_hour: Optional[int] = None
 
 
+class EventTimelinePoint(BaseModel):
+    """Contagem de eventos de uma hora/dia da série (agregação horária)"""
+    bucket: datetime
+    total: int
+    counts: Dict[str, int]
+
+
+class EventArchiveInfo(BaseModel):
+    """Arquivo mensal de eventos (.ndjson.gz)"""
+    id: int
+    month_start: datetime
+    month_end: datetime
+    status: str
+    event_count: int
+    detection_count: int
+    size_bytes: int
+    files_pruned: bool = False  # screenshots/vídeos do mês já removidos pela retenção
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class EventArchiveList(BaseModel):
+    """Arquivos de eventos e limites entre dados arquivados e quentes"""
+    cutoff: Optional[datetime] = None  # início do primeiro mês mantido no banco
+    archived_until: Optional[datetime] = None  # eventos anteriores só existem nos arquivos
+    archives: List[EventArchiveInfo]
+
+
+class EventBulkDelete(BaseModel):
+    """Filtros da exclusão em massa de eventos (ao menos um é obrigatório)"""
+    camera_id: Optional[int] = None
+    event_type: Optional[EventType] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+
+
 class HeatmapData(BaseModel):
     """Schema para dados do heatmap"""
     camera_id: int
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Reconstruir a agregação horária de eventos (tabela event_rollups)
+
+A migração 0004_event_rollups já preenche a tabela com os eventos existentes;
+use este script depois de importar eventos direto no banco ou para conferir a
+agregação.
+
+Uso:
+    python scripts/backfill_event_rollups.py          # reconstruir
+    python scripts/backfill_event_rollups.py --check  # só comparar com os eventos
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+
+from database import SessionLocal, create_tables
+from models.event import Event
+from models.event_rollup import EventRollup
+from services.event_archive_service import EventArchiveService
+from services.event_rollup_service import EventRollupService
+
+
+def check(db, since=None) -> bool:
+    """Comparar a agregação com a contagem direta dos eventos (a partir de `since`)"""
+    if since is None:
+        expected = EventRollupService._aggregate(db)
+        rollups = db.query(EventRollup.camera_id, EventRollup.event_type, EventRollup.bucket, EventRollup.count)
+    else:
+        expected = EventRollupService._aggregate(db, Event.timestamp >= since)
+        rollups = db.query(EventRollup.camera_id, EventRollup.event_type, EventRollup.bucket,
+                           EventRollup.count).filter(EventRollup.bucket >= since)
+    stored = {
+        (camera_id, event_type, bucket.replace(tzinfo=None)): count
+        for camera_id, event_type, bucket, count in rollups
+    }
+    expected = {(c, t, b.replace(tzinfo=None)): n for (c, t, b), n in expected.items()}
+    divergent = {key for key in set(expected) | set(stored) if expected.get(key, 0) != stored.get(key, 0)}
+    total = db.query(func.count(Event.id)).scalar()
+    print(f"Eventos: {total} | linhas na agregação: {len(stored)} | divergências: {len(divergent)}")
+    for key in sorted(divergent, key=lambda k: k[2])[:20]:
+        print(f"  câmera={key[0]} tipo={key[1]} hora={key[2]}: "
+              f"esperado {expected.get(key, 0)}, armazenado {stored.get(key, 0)}")
+    return not divergent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruir a agregação horária de eventos")
+    parser.add_argument("--check", action="store_true", help="apenas verificar divergências")
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        # Meses arquivados não estão mais na tabela events: suas contagens são preservadas
+        since = EventArchiveService.archived_until(db)
+        if since:
+            print(f"Eventos anteriores a {since:%Y-%m-%d} estão arquivados; agregação preservada até essa data")
+        if args.check:
+            sys.exit(0 if check(db, since) else 1)
+        result = EventRollupService.rebuild(db, since)
+        print(f"✅ Agregação reconstruída: {result['events']} eventos em {result['rows']} linhas")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 try:
     from database import SessionLocal
     from models.event import Event, EventType
+    from models.event_rollup import EventRollup
     from models.camera import Camera
     DB_AVAILABLE = True
 except ImportError:
@@ -52,7 +53,7 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 def load_real_data():
     """Carregar dados reais do banco de dados"""
     data = {
-        'events': [],
+        'event_rollups': [],
         'cameras': [],
         'load_test': None
     }
@@ -60,19 +61,16 @@ def load_real_data():
     if DB_AVAILABLE:
         try:
             db = SessionLocal()
-            # Carregar eventos
-            events = db.query(Event).all()
-            data['events'] = [
+            # Carregar contagens horárias (event_rollups) em vez de todos os eventos
+            rollups = db.query(EventRollup).order_by(EventRollup.bucket).all()
+            data['event_rollups'] = [
                 {
-                    'id': e.id,
-                    'camera_id': e.camera_id,
-                    'event_type': e.event_type,
-                    'timestamp': e.timestamp,
-                    'confidence': e.confidence or 0.0,
-                    'is_processed': e.is_processed,
-                    'is_notified': e.is_notified
+                    'camera_id': r.camera_id,
+                    'event_type': r.event_type,
+                    'bucket': r.bucket,
+                    'count': r.count
                 }
-                for e in events
+                for r in rollups
             ]
             
             # Carregar câmeras
@@ -1021,10 +1019,17 @@ def generate_image_11():
     
     # (b) Gráfico de eventos ao longo do tempo
     ax2 = fig.add_subplot(gs[0, 1:])
-    # Gerar dados de eventos ao longo do tempo
-    hours = pd.date_range(start='2024-11-13 00:00:00', periods=24, freq='H')
-    events_count = np.random.poisson(5, 24) + np.sin(np.arange(24) * np.pi / 12) * 3
-    events_count = np.maximum(events_count, 0).astype(int)
+    if real_data['event_rollups']:
+        # Últimas 24 horas com eventos registrados, a partir da agregação horária
+        rollups_df = pd.DataFrame(real_data['event_rollups'])
+        per_hour = rollups_df.groupby(pd.to_datetime(rollups_df['bucket']).dt.tz_localize(None))['count'].sum()
+        hours = pd.date_range(end=per_hour.index.max(), periods=24, freq='H')
+        events_count = per_hour.reindex(hours, fill_value=0).astype(int).values
+    else:
+        # Gerar dados de eventos ao longo do tempo
+        hours = pd.date_range(start='2024-11-13 00:00:00', periods=24, freq='H')
+        events_count = np.random.poisson(5, 24) + np.sin(np.arange(24) * np.pi / 12) * 3
+        events_count = np.maximum(events_count, 0).astype(int)
     ax2.plot(hours, events_count, 'o-', linewidth=2, markersize=6, color='#3498db')
     ax2.fill_between(hours, events_count, alpha=0.3, color='#3498db')
     ax2.set_xlabel('Hora do Dia', fontweight='bold')
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Script para testar o WebRTC localmente com captura de arquivo e peer loopback
+
+Uso:
+    python scripts/test_webrtc.py [caminho_do_video]
+
+Se nenhum vídeo for informado, um vídeo sintético é gerado em temp_videos/.
+"""
+import asyncio
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.stream_service import stream_service
+from services.webrtc_service import webrtc_service
+
+CAMERA_ID = 9999
+
+
+def create_test_video(path: str, seconds: int = 10, fps: int = 15):
+    """Gerar vídeo sintético com um quadrado em movimento"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (640, 480))
+    for i in range(seconds * fps):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        x = (i * 8) % 600
+        cv2.rectangle(frame, (x, 200), (x + 40, 240), (0, 255, 0), -1)
+        writer.write(frame)
+    writer.release()
+
+
+async def run_loopback(video_path: str, duration: float = 5.0):
+    from aiortc import RTCPeerConnection, RTCSessionDescription
+
+    print(f"🎬 Iniciando captura de arquivo: {video_path}")
+    if not stream_service.start_stream(CAMERA_ID, video_path):
+        print("❌ Não foi possível abrir o vídeo")
+        return False
+
+    client = RTCPeerConnection()
+    client.addTransceiver("video", direction="recvonly")
+    received = {"frames": 0, "first": None}
+
+    @client.on("track")
+    def on_track(track):
+        async def consume():
+            while True:
+                try:
+                    await track.recv()
+                except Exception:
+                    return
+                received["frames"] += 1
+                if received["first"] is None:
+                    received["first"] = time.time()
+        asyncio.ensure_future(consume())
+
+    started = time.time()
+    offer = await client.createOffer()
+    await client.setLocalDescription(offer)
+    answer = await webrtc_service.handle_offer(
+        CAMERA_ID, client.localDescription.sdp, client.localDescription.type
+    )
+    await client.setRemoteDescription(RTCSessionDescription(**answer))
+
+    await asyncio.sleep(duration)
+
+    encoder = webrtc_service.encoders.get(CAMERA_ID)
+    print(f"📊 Frames codificados (uma vez para todos os peers): {encoder.frames_encoded if encoder else 0}")
+    print(f"📊 Frames recebidos pelo peer loopback: {received['frames']}")
+    if received["first"]:
+        print(f"⏱️ Tempo até o primeiro frame: {(received['first'] - started) * 1000:.0f} ms")
+
+    await client.close()
+    await webrtc_service.shutdown()
+    stream_service.stop_stream(CAMERA_ID)
+    return received["frames"] > 0
+
+
+def main():
+    if not webrtc_service.is_available():
+        print("❌ aiortc não está instalado (pip install aiortc)")
+        sys.exit(1)
+
+    if len(sys.argv) > 1:
+        video_path = sys.argv[1]
+    else:
+        os.makedirs("temp_videos", exist_ok=True)
+        video_path = os.path.join("temp_videos", "webrtc_test.mp4")
+        create_test_video(video_path)
+
+    ok = asyncio.run(run_loopback(video_path))
+    print("✅ WebRTC funcionando" if ok else "❌ Nenhum frame recebido")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Orçamento global de análise
+
+Mede o custo de cada estágio (captura, movimento, YOLO...) por câmera e reparte
+um orçamento global de frames analisados por segundo entre as câmeras ativas.
+Câmeras com intrusão ou movimento recentes, ou com zona/linha armada, recebem
+prioridade; câmeras ociosas caem para uma taxa mínima. A taxa alcançada é
+reportada junto à taxa alvo.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from config import settings
+from services.camera_scheduler import camera_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Peso relativo de cada motivo de prioridade (multiplicativo)
+PRIORITY_WEIGHTS = {
+    "armed": 2.0,
+    "motion": 3.0,
+    "intrusion": 5.0,
+}
+
+# Fator de suavização das médias móveis exponenciais de custo
+EWMA_ALPHA = 0.2
+
+
+class CameraBudget:
+    """Estado de orçamento de uma câmera"""
+
+    def __init__(self, camera_id: int):
+        self.camera_id = camera_id
+        self.armed = False
+        self.last_motion = 0.0
+        self.last_intrusion = 0.0
+        self.stage_costs: Dict[str, float] = {}
+        self.target_fps = settings.analysis_max_fps
+        # Redução imposta pelo controle de sobrecarga (1.0 = sem redução)
+        self.rate_factor = 1.0
+        self.next_analysis = 0.0
+        self.analyses: Deque[float] = deque()
+        self.registered_at = time.time()
+
+    def record_stage(self, stage: str, seconds: float):
+        previous = self.stage_costs.get(stage)
+        self.stage_costs[stage] = seconds if previous is None else previous + EWMA_ALPHA * (seconds - previous)
+
+    def analysis_cost(self) -> float:
+        """Custo médio de uma análise completa (sem a captura)"""
+        return self.stage_costs.get("analysis", 0.0)
+
+    def priority_reasons(self, now: float) -> list:
+        window = settings.analysis_priority_window
+        reasons = []
+        if self.armed:
+            reasons.append("armed")
+        if now - self.last_motion < window:
+            reasons.append("motion")
+        if now - self.last_intrusion < window:
+            reasons.append("intrusion")
+        return reasons
+
+    def weight(self, now: float) -> float:
+        weight = 1.0
+        for reason in self.priority_reasons(now):
+            weight *= PRIORITY_WEIGHTS[reason]
+        return weight
+
+    def achieved_fps(self, now: float) -> float:
+        window = settings.analysis_rate_window
+        while self.analyses and now - self.analyses[0] > window:
+            self.analyses.popleft()
+        if not self.analyses:
+            return 0.0
+        # Logo após o registro a janela ainda não está cheia
+        return len(self.analyses) / max(1.0, min(window, now - self.registered_at))
+
+
+class AnalysisBudget:
+    """Gerenciador do orçamento global de análise por câmera"""
+
+    def __init__(self):
+        self.cameras: Dict[int, CameraBudget] = {}
+        self.budget_fps = 0.0
+        self.last_rebalance = 0.0
+        self._lock = threading.Lock()
+
+    def register(self, camera_id: int, armed: bool = False):
+        """Registrar câmera no orçamento"""
+        with self._lock:
+            budget = self.cameras.get(camera_id) or CameraBudget(camera_id)
+            budget.armed = armed
+            self.cameras[camera_id] = budget
+            self._rebalance(time.time())
+
+    def unregister(self, camera_id: int):
+        with self._lock:
+            self.cameras.pop(camera_id, None)
+            self._rebalance(time.time())
+
+    def set_armed(self, camera_id: int, armed: bool):
+        budget = self.cameras.get(camera_id)
+        if budget:
+            budget.armed = armed
+
+    def set_rate_factor(self, camera_id: int, factor: float):
+        """Reduzir taxa mínima e máxima de uma câmera (controle de sobrecarga)"""
+        with self._lock:
+            budget = self.cameras.get(camera_id)
+            if budget:
+                budget.rate_factor = factor
+                self._rebalance(time.time())
+
+    def record_stage(self, camera_id: int, stage: str, seconds: float):
+        """Registrar custo medido de um estágio do pipeline"""
+        budget = self.cameras.get(camera_id)
+        if budget:
+            budget.record_stage(stage, seconds)
+
+    def mark_activity(self, camera_id: int, kind: str):
+        """Registrar movimento ou intrusão (eleva a prioridade da câmera)"""
+        budget = self.cameras.get(camera_id)
+        if not budget:
+            return
+        now = time.time()
+        if kind == "intrusion":
+            budget.last_intrusion = now
+        elif kind == "motion":
+            budget.last_motion = now
+
+    def should_analyze(self, camera_id: int) -> bool:
+        """Verificar se a câmera deve analisar o frame atual (consome o orçamento)"""
+        budget = self.cameras.get(camera_id)
+        if not budget:
+            return True
+        now = time.time()
+        if now - self.last_rebalance >= settings.analysis_rebalance_interval:
+            with self._lock:
+                self._rebalance(now)
+        if now < budget.next_analysis:
+            return False
+        interval = 1.0 / max(budget.target_fps, 1e-3)
+        # Sem acumular atraso: se perdeu a janela, a próxima conta a partir de agora
+        budget.next_analysis = max(budget.next_analysis + interval, now)
+        budget.analyses.append(now)
+        return True
+
+    def time_until_next(self, camera_id: int) -> float:
+        """Segundos até a próxima análise permitida"""
+        budget = self.cameras.get(camera_id)
+        if not budget:
+            return 0.0
+        return max(0.0, budget.next_analysis - time.time())
+
+    def _compute_budget(self) -> float:
+        """Orçamento global: fixo pela configuração ou derivado do custo medido"""
+        if settings.analysis_budget_fps > 0:
+            return float(settings.analysis_budget_fps)
+        costs = [b.analysis_cost() for b in self.cameras.values() if b.analysis_cost() > 0]
+        if not costs:
+            # Sem medições ainda: não restringir
+            return settings.analysis_max_fps * max(1, len(self.cameras))
+        avg_cost = sum(costs) / len(costs)
+        return camera_scheduler.worker_count * settings.analysis_target_utilization / avg_cost
+
+    def _rebalance(self, now: float):
+        """Repartir o orçamento: taxa mínima para todas, restante proporcional ao peso"""
+        self.last_rebalance = now
+        cameras = list(self.cameras.values())
+        if not cameras:
+            return
+        self.budget_fps = self._compute_budget()
+
+        targets = {b.camera_id: settings.analysis_floor_fps * b.rate_factor for b in cameras}
+        ceilings = {b.camera_id: settings.analysis_max_fps * b.rate_factor for b in cameras}
+        remaining = max(0.0, self.budget_fps - sum(targets.values()))
+        open_cameras = [b for b in cameras if targets[b.camera_id] < ceilings[b.camera_id]]
+        # Distribuição com teto: o excedente de quem atinge o máximo volta para as demais
+        while remaining > 1e-6 and open_cameras:
+            total_weight = sum(b.weight(now) for b in open_cameras)
+            leftover = 0.0
+            for b in open_cameras:
+                share = remaining * b.weight(now) / total_weight
+                granted = min(share, ceilings[b.camera_id] - targets[b.camera_id])
+                targets[b.camera_id] += granted
+                leftover += share - granted
+            remaining = leftover
+            open_cameras = [b for b in open_cameras if targets[b.camera_id] < ceilings[b.camera_id] - 1e-6]
+
+        for b in cameras:
+            b.target_fps = targets[b.camera_id]
+
+    def get_report(self) -> Dict:
+        """Taxa alvo vs alcançada por câmera"""
+        now = time.time()
+        with self._lock:
+            cameras = list(self.cameras.values())
+        return {
+            "budget_fps": round(self.budget_fps, 2),
+            "mode": "fixed" if settings.analysis_budget_fps > 0 else "auto",
+            "floor_fps": settings.analysis_floor_fps,
+            "max_fps": settings.analysis_max_fps,
+            "cameras": {
+                b.camera_id: {
+                    "target_fps": round(b.target_fps, 2),
+                    "achieved_fps": round(b.achieved_fps(now), 2),
+                    "weight": b.weight(now),
+                    "priority": b.priority_reasons(now),
+                    "rate_factor": b.rate_factor,
+                    "stage_costs_ms": {stage: round(cost * 1000, 2) for stage, cost in b.stage_costs.items()},
+                }
+                for b in cameras
+            },
+        }
+
+    def get_camera_report(self, camera_id: int) -> Optional[Dict]:
+        return self.get_report()["cameras"].get(camera_id)
+
+
+# Instância global do orçamento
+analysis_budget = AnalysisBudget()
@@ -0,0 +1,149 @@
+"""
+Agendas de armação da detecção
+
+Cada câmera pode ter uma agenda semanal de janelas armadas (ex.: seg-sex
+18:00-07:00, virando a meia-noite) e exceções por data (feriados), que armam ou
+desarmam o dia inteiro. Sem agenda, a câmera fica sempre armada.
+
+O monitor não avalia a agenda a cada frame: calcula o estado atual e o instante
+da próxima transição, e só reavalia quando esse instante chega.
+"""
+from datetime import date, datetime, time as dtime, timedelta, tzinfo
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Modos para câmeras desarmadas
+DISARMED_CAPTURE = "capture"   # mantém a captura, sem inferência
+DISARMED_RELEASE = "release"   # libera o stream até a próxima janela armada
+DISARMED_MODES = (DISARMED_CAPTURE, DISARMED_RELEASE)
+
+# Horizonte de busca da próxima transição (uma semana + margem para exceções)
+SEARCH_DAYS = 8
+
+
+def _parse_time(value: str) -> dtime:
+    try:
+        hours, minutes = value.split(":")[:2]
+        hours, minutes = int(hours), int(minutes)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Horário inválido: {value!r} (use HH:MM)")
+    if hours == 24 and minutes == 0:
+        return dtime.max
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Horário inválido: {value!r} (use HH:MM)")
+    return dtime(hours, minutes)
+
+
+class ArmingSchedule:
+    """Agenda semanal de armação com exceções por data"""
+
+    def __init__(self, windows: Optional[List[Dict]] = None, overrides: Optional[List[Dict]] = None,
+                 timezone: Optional[str] = None):
+        self.timezone = timezone
+        self.tz: Optional[tzinfo] = None
+        if timezone:
+            try:
+                self.tz = ZoneInfo(timezone)
+            except (ZoneInfoNotFoundError, ValueError):
+                raise ValueError(f"Fuso horário inválido: {timezone!r}")
+
+        # Janelas normalizadas: (dia da semana 0=segunda, início, fim); fim <= início vira a meia-noite
+        self.windows: List[Tuple[int, dtime, dtime]] = []
+        for window in windows or []:
+            days = window.get("days", list(range(7)))
+            start = _parse_time(window.get("start", "00:00"))
+            end = _parse_time(window.get("end", "24:00"))
+            for day in days:
+                if not isinstance(day, int) or not 0 <= day <= 6:
+                    raise ValueError(f"Dia da semana inválido: {day!r} (0=segunda ... 6=domingo)")
+                self.windows.append((day, start, end))
+
+        # Exceções por data: True = armada o dia todo, False = desarmada o dia todo
+        self.overrides: Dict[date, bool] = {}
+        for override in overrides or []:
+            try:
+                day = date.fromisoformat(override["date"])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"Data de exceção inválida: {override!r} (use YYYY-MM-DD)")
+            self.overrides[day] = bool(override.get("armed", False))
+
+    @classmethod
+    def from_camera(cls, camera) -> Optional["ArmingSchedule"]:
+        """Criar agenda a partir das colunas da câmera (None = sempre armada)"""
+        config = camera.arming_schedule or {}
+        overrides = camera.arming_overrides or []
+        if not config.get("windows") and not overrides:
+            return None
+        return cls(config.get("windows"), overrides, config.get("timezone"))
+
+    def _now(self) -> datetime:
+        return datetime.now(self.tz) if self.tz else datetime.now()
+
+    def _localize(self, at: Optional[datetime]) -> datetime:
+        if at is None:
+            return self._now()
+        if self.tz and at.tzinfo is not None:
+            return at.astimezone(self.tz)
+        return at
+
+    def _weekly_armed(self, at: datetime) -> bool:
+        weekday = at.weekday()
+        previous_day = (weekday - 1) % 7
+        moment = at.time()
+        for day, start, end in self.windows:
+            if start < end:
+                if day == weekday and start <= moment < end:
+                    return True
+            else:
+                # Janela que vira a meia-noite: parte no próprio dia e parte no dia seguinte
+                if day == weekday and moment >= start:
+                    return True
+                if day == previous_day and moment < end:
+                    return True
+        return False
+
+    def is_armed(self, at: Optional[datetime] = None) -> bool:
+        at = self._localize(at)
+        override = self.overrides.get(at.date())
+        if override is not None:
+            return override
+        if not self.windows:
+            # Apenas exceções configuradas: armada fora delas
+            return True
+        return self._weekly_armed(at)
+
+    def _boundaries(self, start: datetime) -> List[datetime]:
+        """Instantes candidatos a transição a partir de `start`"""
+        # Todos os horários de início/fim em todos os dias: cobre janelas que viram a
+        # meia-noite; o estado real é conferido em next_transition
+        moments = {moment for _, window_start, window_end in self.windows
+                   for moment in (window_start, window_end) if moment != dtime.max}
+        candidates = []
+        base = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        for offset in range(SEARCH_DAYS + 1):
+            day = base + timedelta(days=offset)
+            candidates.append(day)  # meia-noite (exceções por data e fim 24:00)
+            candidates.extend(day.replace(hour=m.hour, minute=m.minute) for m in moments)
+        return sorted(c for c in candidates if c > start)
+
+    def next_transition(self, at: Optional[datetime] = None) -> Optional[datetime]:
+        """Próximo instante em que o estado armado/desarmado muda (None se nunca muda no horizonte)"""
+        at = self._localize(at)
+        current = self.is_armed(at)
+        for boundary in self._boundaries(at):
+            if self.is_armed(boundary) != current:
+                return boundary
+        return None
+
+    def state(self, at: Optional[datetime] = None) -> Tuple[bool, Optional[datetime]]:
+        """Estado atual e próxima transição"""
+        at = self._localize(at)
+        return self.is_armed(at), self.next_transition(at)
+
+
+def seconds_until(moment: Optional[datetime]) -> Optional[float]:
+    """Segundos até um instante da agenda (mesma referência de fuso)"""
+    if moment is None:
+        return None
+    now = datetime.now(moment.tzinfo) if moment.tzinfo else datetime.now()
+    return max(0.0, (moment - now).total_seconds())
@@ -0,0 +1,272 @@
+"""
+Escalonador cooperativo M:N de câmeras
+
+Um pool fixo de K threads atende M tarefas de câmera. Cada tarefa executa um
+passo curto (capturar/analisar um frame) e informa em quanto tempo quer rodar de
+novo; as tarefas ficam numa fila de prioridade ordenada pelo próximo horário
+devido (a mais atrasada roda primeiro, empates em ordem de chegada). Atrasos
+acima da tolerância são contabilizados como perdas de prazo para planejamento
+de capacidade.
+"""
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledTask:
+    """Tarefa cooperativa: `step()` devolve o atraso até a próxima execução ou None para encerrar"""
+
+    def __init__(self, name: str, step: Callable[[], Optional[float]],
+                 on_stop: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.step = step
+        self.on_stop = on_stop
+        self.next_due = time.monotonic()
+        self.cancelled = False
+        self.running = False
+        self.done = threading.Event()
+
+        # Métricas
+        self.runs = 0
+        self.deadline_misses = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.total_run_time = 0.0
+        self.created_at = time.monotonic()
+
+    def is_alive(self) -> bool:
+        return not self.done.is_set()
+
+    def get_stats(self) -> Dict:
+        runs = max(1, self.runs)
+        elapsed = max(1e-6, time.monotonic() - self.created_at)
+        return {
+            "name": self.name,
+            "runs": self.runs,
+            "deadline_misses": self.deadline_misses,
+            "miss_rate": round(self.deadline_misses / runs, 4),
+            "avg_lag_ms": round(self.total_lag / runs * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "avg_step_ms": round(self.total_run_time / runs * 1000, 2),
+            # Fração de uma thread de trabalho consumida por esta tarefa
+            "utilization": round(self.total_run_time / elapsed, 4),
+        }
+
+
+class CameraScheduler:
+    """Pool fixo de threads que executa tarefas de câmera de forma cooperativa"""
+
+    def __init__(self, workers: Optional[int] = None):
+        self.worker_count = workers or settings.scheduler_workers or os.cpu_count() or 4
+        self.tolerance = settings.scheduler_deadline_tolerance_ms / 1000.0
+        self._queue: List = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._tasks: Dict[str, ScheduledTask] = {}
+        self._workers: List[threading.Thread] = []
+        self._busy = 0
+        self._running = False
+        self._worker_init: List[Callable[[int], None]] = []
+
+    def start(self):
+        """Iniciar threads de trabalho (idempotente)"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._spawn_workers()
+        logger.info(f"Escalonador de câmeras iniciado com {self.worker_count} thread(s)")
+
+    def _spawn_workers(self):
+        """Criar threads até worker_count (chamar com o lock)"""
+        self._workers = [w for w in self._workers if w.is_alive()]
+        alive = {int(w.name.rsplit("-", 1)[1]) for w in self._workers}
+        for i in range(self.worker_count):
+            if i in alive:
+                continue
+            worker = threading.Thread(target=self._worker_loop, args=(i,),
+                                      name=f"camera-worker-{i}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def resize(self, workers: int):
+        """Alterar o número de threads de trabalho (as excedentes saem após o passo atual)"""
+        workers = max(1, workers)
+        with self._cond:
+            self.worker_count = workers
+            if self._running:
+                self._spawn_workers()
+            self._cond.notify_all()
+        logger.info(f"Escalonador de câmeras ajustado para {workers} thread(s)")
+
+    def add_worker_initializer(self, initializer: Callable[[int], None]):
+        """Registrar função executada por cada thread de trabalho ao iniciar (ex.: afinidade de CPU)"""
+        self._worker_init.append(initializer)
+
+    def submit(self, name: str, step: Callable[[], Optional[float]],
+               on_stop: Optional[Callable[[], None]] = None, delay: float = 0.0) -> ScheduledTask:
+        """Agendar nova tarefa"""
+        if not self._running:
+            self.start()
+        task = ScheduledTask(name, step, on_stop)
+        task.next_due = time.monotonic() + delay
+        with self._cond:
+            previous = self._tasks.get(name)
+            if previous is not None and previous.is_alive():
+                logger.warning(f"Tarefa {name} já existe; substituindo")
+            self._tasks[name] = task
+            heapq.heappush(self._queue, (task.next_due, next(self._counter), task))
+            self._cond.notify()
+        return task
+
+    def wake(self, task: ScheduledTask):
+        """Antecipar a próxima execução de uma tarefa para agora"""
+        with self._cond:
+            if task.running or task.cancelled or task.done.is_set():
+                return
+            entries = [entry for entry in self._queue if entry[2] is not task]
+            if len(entries) == len(self._queue):
+                return
+            task.next_due = time.monotonic()
+            entries.append((task.next_due, next(self._counter), task))
+            heapq.heapify(entries)
+            self._queue = entries
+            self._cond.notify()
+
+    def cancel(self, task: ScheduledTask, timeout: Optional[float] = None) -> bool:
+        """Cancelar tarefa; se não estiver em execução, é finalizada imediatamente"""
+        finalize_now = False
+        with self._cond:
+            task.cancelled = True
+            if not task.running and not task.done.is_set():
+                self._queue = [entry for entry in self._queue if entry[2] is not task]
+                heapq.heapify(self._queue)
+                finalize_now = True
+            self._cond.notify_all()
+        if finalize_now:
+            self._finalize(task)
+        if timeout:
+            return task.done.wait(timeout)
+        return task.done.is_set()
+
+    def _finalize(self, task: ScheduledTask):
+        if task.done.is_set():
+            return
+        try:
+            if task.on_stop:
+                task.on_stop()
+        except Exception as e:
+            logger.error(f"Erro ao finalizar tarefa {task.name}: {e}", exc_info=True)
+        finally:
+            with self._cond:
+                if self._tasks.get(task.name) is task:
+                    del self._tasks[task.name]
+            task.done.set()
+
+    def _next_task(self, worker_index: int) -> Optional[ScheduledTask]:
+        """Retirar da fila a próxima tarefa devida (bloqueia até haver uma)"""
+        with self._cond:
+            while self._running and worker_index < self.worker_count:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                due, _, task = self._queue[0]
+                now = time.monotonic()
+                if due > now:
+                    self._cond.wait(due - now)
+                    continue
+                heapq.heappop(self._queue)
+                if task.cancelled:
+                    # Será finalizada fora do lock pela thread de trabalho
+                    return task
+                task.running = True
+                self._busy += 1
+                return task
+            return None
+
+    def _worker_loop(self, worker_index: int):
+        for initializer in self._worker_init:
+            try:
+                initializer(worker_index)
+            except Exception as e:
+                logger.warning(f"Erro ao inicializar thread de trabalho {worker_index}: {e}")
+
+        while self._running:
+            task = self._next_task(worker_index)
+            if task is None:
+                break
+            if task.cancelled and not task.running:
+                self._finalize(task)
+                continue
+
+            started = time.monotonic()
+            lag = max(0.0, started - task.next_due)
+            delay = None
+            try:
+                delay = task.step()
+            except Exception as e:
+                logger.error(f"Erro na tarefa {task.name}: {e}", exc_info=True)
+                delay = None
+            finished = time.monotonic()
+
+            task.runs += 1
+            task.total_lag += lag
+            task.max_lag = max(task.max_lag, lag)
+            task.total_run_time += finished - started
+            if lag > self.tolerance:
+                task.deadline_misses += 1
+
+            with self._cond:
+                task.running = False
+                self._busy -= 1
+                if delay is not None and not task.cancelled:
+                    # Sem rajadas de recuperação: nunca agendar antes de agora
+                    task.next_due = max(task.next_due + delay, finished)
+                    heapq.heappush(self._queue, (task.next_due, next(self._counter), task))
+                    self._cond.notify()
+                    continue
+            self._finalize(task)
+
+    def get_stats(self) -> Dict:
+        """Métricas globais e por tarefa para planejamento de capacidade"""
+        now = time.monotonic()
+        with self._cond:
+            tasks = list(self._tasks.values())
+            overdue = sum(1 for due, _, _ in self._queue if due <= now)
+            busy = self._busy
+        task_stats = [t.get_stats() for t in tasks]
+        return {
+            "workers": self.worker_count,
+            "busy_workers": busy,
+            "tasks": len(tasks),
+            "overdue_tasks": overdue,
+            "deadline_misses": sum(t["deadline_misses"] for t in task_stats),
+            # Soma das utilizações: > workers indica que o nó está acima da capacidade
+            "load": round(sum(t["utilization"] for t in task_stats), 3),
+            "per_task": task_stats,
+        }
+
+    def shutdown(self, timeout: float = 5.0):
+        """Cancelar todas as tarefas e parar as threads"""
+        with self._cond:
+            tasks = list(self._tasks.values())
+        for task in tasks:
+            self.cancel(task)
+        deadline = time.monotonic() + timeout
+        for task in tasks:
+            task.done.wait(max(0.0, deadline - time.monotonic()))
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+
+# Instância global do escalonador
+camera_scheduler = CameraScheduler()
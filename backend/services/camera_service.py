@@ -1,19 +1,23 @@
 """
 Serviço de gerenciamento de câmeras
 """
-import os
 import logging
 import traceback
 from typing import List, Optional
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 
 from models.camera import Camera
 from models.event import Event
+from models.event_detection import EventDetection
 from schemas.camera import CameraCreate, CameraUpdate
 from services.detection_service import detection_service
-from config import settings
+from services.event_rollup_service import EventRollupService
+from services.recent_events_cache import recent_events_cache
+from services.retention_service import retention_service
+from services.stats_cache import stats_cache
 
 logger = logging.getLogger(__name__)
 
@@ -94,11 +98,13 @@ class CameraService:
         return db.query(Camera).offset(skip).limit(limit).all()
 
     @staticmethod
-    def update_camera(db: Session, camera_id: int, camera_update: CameraUpdate) -> Optional[Camera]:
+    def update_camera(db: Session, camera_id: int, camera_update: CameraUpdate,
+                      user_email: Optional[str] = None) -> Optional[Camera]:
         """Atualizar câmera"""
         db_camera = db.query(Camera).filter(Camera.id == camera_id).first()
         if not db_camera:
             return None
+        previous_url = db_camera.stream_url
 
         # Atualizar campos
         update_data = camera_update.dict(exclude_unset=True)
@@ -108,12 +114,16 @@ class CameraService:
         db.commit()
         db.refresh(db_camera)
 
-        # Reiniciar monitoramento se necessário
-        if "detection_enabled" in update_data or "stream_url" in update_data:
-            if db_camera.detection_enabled:
-                detection_service.start_monitoring(db_camera.id, db_camera.stream_url)
-            else:
-                detection_service.stop_monitoring(db_camera.id)
+        # Reiniciar monitoramento só quando necessário (stream alterado ou detecção recém-habilitada);
+        # demais alterações são aplicadas pelo monitor em execução via versão de configuração
+        if not db_camera.detection_enabled:
+            detection_service.stop_monitoring(db_camera.id)
+        elif db_camera.stream_url != previous_url or not detection_service.is_monitoring_active(db_camera.id):
+            detection_service.start_monitoring(db_camera.id, db_camera.stream_url, user_email)
+        else:
+            if user_email:
+                detection_service.camera_user_emails[db_camera.id] = user_email
+            detection_service.bump_config_version(db_camera.id)
 
         return db_camera
 
@@ -134,56 +144,20 @@ class CameraService:
             except Exception as e:
                 logger.warning(f"Erro ao parar monitoramento da câmera {camera_id}: {e}")
 
-            # Deletar eventos relacionados primeiro (para evitar erro de Foreign Key)
-            # Primeiro, buscar eventos para remover arquivos associados
-            events = db.query(Event).filter(Event.camera_id == camera_id).all()
-            logger.info(f"Encontrados {len(events)} eventos para deletar da câmera {camera_id}")
-            
-            # Remover arquivos dos eventos antes de deletar do banco
-            for event in events:
-                # Remover arquivos associados aos eventos
-                # Tratar caminhos relativos (/uploads/...) e absolutos
-                if event.image_path:
-                    image_path = event.image_path
-                    try:
-                        # Se for caminho relativo começando com /uploads/
-                        if image_path.startswith("/uploads/"):
-                            rel_path = image_path[len("/uploads/"):]
-                            # Normalizar separadores de caminho para Windows
-                            if os.path.sep != '/':
-                                rel_path = rel_path.replace('/', os.path.sep)
-                            image_path = os.path.join(settings.upload_dir, rel_path)
-                        elif not os.path.isabs(image_path):
-                            # Caminho relativo sem /uploads/
-                            image_path = os.path.join(settings.upload_dir, image_path)
-                        
-                        if os.path.exists(image_path):
-                            os.remove(image_path)
-                            logger.debug(f"Imagem removida: {image_path}")
-                    except Exception as e:
-                        logger.warning(f"Erro ao remover imagem do evento {event.id} ({image_path}): {e}")
-                
-                if event.video_path:
-                    video_path = event.video_path
-                    try:
-                        # Se for caminho relativo começando com /uploads/
-                        if video_path.startswith("/uploads/"):
-                            rel_path = video_path[len("/uploads/"):]
-                            # Normalizar separadores de caminho para Windows
-                            if os.path.sep != '/':
-                                rel_path = rel_path.replace('/', os.path.sep)
-                            video_path = os.path.join(settings.upload_dir, rel_path)
-                        elif not os.path.isabs(video_path):
-                            # Caminho relativo sem /uploads/
-                            video_path = os.path.join(settings.upload_dir, video_path)
-                        
-                        if os.path.exists(video_path):
-                            os.remove(video_path)
-                            logger.debug(f"Vídeo removido: {video_path}")
-                    except Exception as e:
-                        logger.warning(f"Erro ao remover vídeo do evento {event.id} ({video_path}): {e}")
-            
-            # Deletar eventos do banco usando delete direto (mais eficiente)
+            # Arquivos dos eventos são removidos depois, numa tarefa em segundo plano;
+            # aqui só os caminhos são lidos
+            paths = [
+                path
+                for image_path, video_path in db.query(Event.image_path, Event.video_path).filter(
+                    Event.camera_id == camera_id
+                )
+                for path in (image_path, video_path) if path
+            ]
+
+            # Deletar eventos do banco usando delete direto (mais eficiente);
+            # o delete em massa não passa pelo ORM, então agregação horária e detecções são ajustadas antes
+            EventRollupService.subtract_events(db, Event.camera_id == camera_id)
+            db.query(EventDetection).filter(EventDetection.camera_id == camera_id).delete()
             deleted_count = db.query(Event).filter(Event.camera_id == camera_id).delete()
             logger.info(f"{deleted_count} eventos deletados do banco de dados")
             
@@ -195,7 +169,12 @@ class CameraService:
             # Deletar câmera
             db.delete(db_camera)
             db.commit()
+            recent_events_cache.drop_camera(camera_id)
             logger.info(f"Câmera {camera_id} deletada com sucesso")
+
+            if paths:
+                job = retention_service.submit_file_removal(paths, params={"camera_id": camera_id})
+                logger.info(f"{len(paths)} arquivo(s) da câmera {camera_id} serão removidos pela tarefa {job.id}")
             return True
             
         except HTTPException:
@@ -242,6 +221,8 @@ class CameraService:
         db_camera.detection_line = detection_line
         db.commit()
         db.refresh(db_camera)
+        # Monitor em execução aplica a alteração entre frames, sem reiniciar
+        detection_service.bump_config_version(camera_id)
         return db_camera
 
     @staticmethod
@@ -259,18 +240,65 @@ class CameraService:
             # Formato antigo: zona única (compatibilidade)
             db_camera.detection_zone = detection_zone
         
+        db.commit()
+        db.refresh(db_camera)
+        # Monitor em execução aplica a alteração entre frames, sem reiniciar
+        detection_service.bump_config_version(camera_id)
+        return db_camera
+
+    @staticmethod
+    def configure_arming_schedule(db: Session, camera_id: int, schedule: dict) -> Optional[Camera]:
+        """Configurar agenda de armação (janelas semanais, exceções e modo desarmado)"""
+        db_camera = db.query(Camera).filter(Camera.id == camera_id).first()
+        if not db_camera:
+            return None
+
+        windows = schedule.get('windows') or []
+        overrides = schedule.get('overrides') or []
+        # Fuso horário vale também para as datas das exceções (agenda só com exceções)
+        db_camera.arming_schedule = (
+            {'timezone': schedule.get('timezone'), 'windows': windows} if windows or overrides else None
+        )
+        db_camera.arming_overrides = overrides or None
+        db_camera.disarmed_mode = schedule.get('disarmed_mode') or 'capture'
+
+        db.commit()
+        db.refresh(db_camera)
+        # Monitor em execução aplica a alteração entre frames, sem reiniciar
+        detection_service.bump_config_version(camera_id)
+        return db_camera
+
+    @staticmethod
+    def configure_retention(db: Session, camera_id: int, policy: dict) -> Optional[Camera]:
+        """Configurar retenção de eventos (None = padrão global, 0 = sem limite)"""
+        db_camera = db.query(Camera).filter(Camera.id == camera_id).first()
+        if not db_camera:
+            return None
+
+        db_camera.retention_days = policy.get('retention_days')
+        db_camera.retention_max_mb = policy.get('retention_max_mb')
+
         db.commit()
         db.refresh(db_camera)
         return db_camera
 
     @staticmethod
     def get_camera_stats(db: Session) -> dict:
-        """Obter estatísticas das câmeras"""
-        total_cameras = db.query(Camera).count()
-        online_cameras = db.query(Camera).filter(Camera.status == "online").count()
-        offline_cameras = db.query(Camera).filter(Camera.status == "offline").count()
-        maintenance_cameras = db.query(Camera).filter(Camera.status == "maintenance").count()
-        detection_enabled = db.query(Camera).filter(Camera.detection_enabled == True).count()
+        """Obter estatísticas das câmeras (uma agregação condicional, com cache curto)"""
+        return stats_cache.get_or_compute("cameras:stats", lambda: CameraService._compute_camera_stats(db))
+
+    @staticmethod
+    def _compute_camera_stats(db: Session) -> dict:
+        def count_where(condition):
+            return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+        total_cameras, online_cameras, offline_cameras, maintenance_cameras, detection_enabled = db.query(
+            func.count(Camera.id),
+            count_where(Camera.status == "online"),
+            count_where(Camera.status == "offline"),
+            count_where(Camera.status == "maintenance"),
+            count_where(Camera.detection_enabled == True),  # noqa: E712
+        ).one()
 
         return {
             "total_cameras": total_cameras,
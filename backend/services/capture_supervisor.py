@@ -0,0 +1,320 @@
+"""
+Supervisor de conexões de câmera
+
+Controla o ciclo de vida das capturas (VideoCapture) com backoff exponencial
+com jitter, limite global de aberturas simultâneas e uma máquina de estados por
+câmera (connecting/live/degraded/offline) que mantém `Camera.status` atualizado
+a partir da conectividade real.
+"""
+import enum
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import settings
+from database import SessionLocal
+from models.camera import Camera, CameraStatus
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionState(str, enum.Enum):
+    """Estado da conexão com a câmera"""
+    CONNECTING = "connecting"
+    LIVE = "live"
+    DEGRADED = "degraded"
+    OFFLINE = "offline"
+
+
+# Ordem de preferência ao consolidar o estado de vários consumidores da mesma câmera
+STATE_PRIORITY = {
+    ConnectionState.LIVE: 3,
+    ConnectionState.DEGRADED: 2,
+    ConnectionState.CONNECTING: 1,
+    ConnectionState.OFFLINE: 0,
+}
+
+
+def open_video_capture(stream_url: str) -> cv2.VideoCapture:
+    """Abrir VideoCapture para URL de stream ou webcam://<índice>"""
+    if stream_url.startswith("webcam://"):
+        token = stream_url.split("://")[1]
+        camera_index = int(token) if token.isdigit() else 0
+        # Windows: tentar DirectShow antes de MSMF; demais sistemas usam o backend padrão
+        cap = None
+        for backend in (cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY):
+            cap = cv2.VideoCapture(camera_index, backend)
+            if cap.isOpened():
+                return cap
+            cap.release()
+        return cap
+    return cv2.VideoCapture(stream_url)
+
+
+class SupervisedCapture:
+    """Captura de uma câmera para um consumidor (detecção, stream...) com reconexão automática"""
+
+    def __init__(self, supervisor: "CaptureSupervisor", camera_id: int, stream_url: str,
+                 consumer: str, fps: Optional[int] = None):
+        self.supervisor = supervisor
+        self.camera_id = camera_id
+        self.stream_url = stream_url
+        self.consumer = consumer
+        self.fps = fps
+        self.state = ConnectionState.CONNECTING
+        self.cap: Optional[cv2.VideoCapture] = None
+        self.connect_attempts = 0
+        self.consecutive_failures = 0
+        self.next_attempt_at = 0.0
+        self.last_frame: Optional[np.ndarray] = None
+        self.last_frame_time = 0.0
+        self.closed = False
+
+    def _backoff_delay(self) -> float:
+        """Backoff exponencial com jitter (metade fixa + metade aleatória)"""
+        delay = min(settings.capture_backoff_max,
+                    settings.capture_backoff_base * (2 ** max(0, self.connect_attempts - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _set_state(self, state: ConnectionState):
+        if state != self.state:
+            logger.info(f"Câmera {self.camera_id} ({self.consumer}): {self.state.value} -> {state.value}")
+            self.state = state
+            self.supervisor._on_state_change(self.camera_id)
+
+    def ensure_connected(self, timeout: Optional[float] = None) -> bool:
+        """Conectar se desconectado e se o backoff já expirou"""
+        if self.cap is not None:
+            return True
+        if self.closed or time.time() < self.next_attempt_at:
+            return False
+
+        # Limitar aberturas simultâneas; sem vaga, tentar novamente em breve
+        if not self.supervisor._open_slots.acquire(timeout=timeout if timeout is not None else 1.0):
+            self.next_attempt_at = time.time() + random.uniform(0.2, 1.0)
+            return False
+        try:
+            # Câmera offline permanece offline até conseguir reconectar
+            if self.state != ConnectionState.OFFLINE:
+                self._set_state(ConnectionState.CONNECTING)
+            self.connect_attempts += 1
+            cap = open_video_capture(self.stream_url)
+        finally:
+            self.supervisor._open_slots.release()
+
+        if cap is None or not cap.isOpened():
+            if cap is not None:
+                cap.release()
+            delay = self._backoff_delay()
+            self.next_attempt_at = time.time() + delay
+            if self.connect_attempts >= settings.capture_offline_after:
+                self._set_state(ConnectionState.OFFLINE)
+            logger.warning(f"Falha ao conectar à câmera {self.camera_id} ({self.consumer}), "
+                           f"tentativa {self.connect_attempts}; nova tentativa em {delay:.1f}s")
+            return False
+
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if self.fps:
+            cap.set(cv2.CAP_PROP_FPS, self.fps)
+        if self.closed:
+            cap.release()
+            return False
+        self.cap = cap
+        self.consecutive_failures = 0
+        logger.info(f"Conectado à câmera {self.camera_id} ({self.consumer}) - URL: {self.stream_url}")
+        return True
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """Ler frame; reconecta automaticamente respeitando o backoff"""
+        if not self.ensure_connected():
+            return False, None
+
+        ret, frame = self.cap.read()
+        if ret and frame is not None:
+            self.consecutive_failures = 0
+            self.connect_attempts = 0
+            self.last_frame = frame
+            self.last_frame_time = time.time()
+            self._set_state(ConnectionState.LIVE)
+            return True, frame
+
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= settings.capture_reconnect_after:
+            logger.warning(f"Câmera {self.camera_id} ({self.consumer}): {self.consecutive_failures} "
+                           f"falhas de leitura seguidas, reconectando")
+            self._release_capture()
+            self.consecutive_failures = 0
+            self.next_attempt_at = time.time() + self._backoff_delay()
+            self._set_state(ConnectionState.CONNECTING)
+        elif self.consecutive_failures >= settings.capture_degraded_after:
+            self._set_state(ConnectionState.DEGRADED)
+        return False, None
+
+    def wait_time(self) -> float:
+        """Segundos até a próxima tentativa de conexão (0 se conectado)"""
+        if self.cap is not None:
+            return 0.0
+        return max(0.0, self.next_attempt_at - time.time())
+
+    def get(self, prop: int) -> float:
+        """Ler propriedade da captura (0 se desconectado)"""
+        return self.cap.get(prop) if self.cap is not None else 0.0
+
+    def is_connected(self) -> bool:
+        return self.cap is not None
+
+    def _release_capture(self):
+        if self.cap is not None:
+            try:
+                self.cap.release()
+            except Exception as e:
+                logger.debug(f"Erro ao liberar captura da câmera {self.camera_id}: {e}")
+            self.cap = None
+
+    def release(self):
+        """Liberar captura e remover do supervisor"""
+        self.closed = True
+        self._release_capture()
+        self.supervisor._unregister(self)
+
+    def get_status(self) -> Dict:
+        return {
+            "consumer": self.consumer,
+            "state": self.state.value,
+            "connected": self.cap is not None,
+            "connect_attempts": self.connect_attempts,
+            "consecutive_failures": self.consecutive_failures,
+            "next_retry_in": round(self.wait_time(), 1),
+            "last_frame_age": round(time.time() - self.last_frame_time, 1) if self.last_frame_time else None,
+        }
+
+
+class CaptureSupervisor:
+    """Supervisor global das capturas de câmera"""
+
+    def __init__(self):
+        self._captures: Dict[int, List[SupervisedCapture]] = {}
+        self._camera_states: Dict[int, ConnectionState] = {}
+        self._lock = threading.Lock()
+        self._open_slots = threading.BoundedSemaphore(max(1, settings.capture_max_concurrent_opens))
+
+    def open(self, camera_id: int, stream_url: str, consumer: str, fps: Optional[int] = None) -> SupervisedCapture:
+        """Registrar captura supervisionada (a conexão é feita de forma preguiçosa)"""
+        capture = SupervisedCapture(self, camera_id, stream_url, consumer, fps)
+        with self._lock:
+            self._captures.setdefault(camera_id, []).append(capture)
+        return capture
+
+    @contextmanager
+    def open_slot(self, timeout: float = 1.0) -> Iterator[bool]:
+        """Vaga de abertura de conexão para capturas avulsas (False se esgotou o tempo)
+
+        Aberturas fora das capturas supervisionadas (ex.: teste de detecção)
+        respeitam o mesmo limite `capture_max_concurrent_opens`.
+        """
+        acquired = self._open_slots.acquire(timeout=timeout)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._open_slots.release()
+
+    def _unregister(self, capture: SupervisedCapture):
+        with self._lock:
+            captures = self._captures.get(capture.camera_id, [])
+            if capture in captures:
+                captures.remove(capture)
+            if not captures:
+                self._captures.pop(capture.camera_id, None)
+                self._camera_states.pop(capture.camera_id, None)
+
+    def get_camera_state(self, camera_id: int) -> Optional[ConnectionState]:
+        """Estado consolidado da câmera (melhor estado entre os consumidores)"""
+        with self._lock:
+            captures = list(self._captures.get(camera_id, []))
+        if not captures:
+            return None
+        return max((c.state for c in captures), key=lambda s: STATE_PRIORITY[s])
+
+    def get_capture(self, camera_id: int, consumer: Optional[str] = None) -> Optional[SupervisedCapture]:
+        """Obter captura ativa de uma câmera (opcionalmente de um consumidor específico)"""
+        with self._lock:
+            captures = list(self._captures.get(camera_id, []))
+        for capture in captures:
+            if consumer is None or capture.consumer == consumer:
+                return capture
+        return None
+
+    def get_latest_frame(self, camera_id: int, max_age: Optional[float] = None) -> Tuple[Optional[np.ndarray], float]:
+        """Frame mais recente lido por qualquer consumidor da câmera e seu horário (sem nova leitura)"""
+        with self._lock:
+            captures = list(self._captures.get(camera_id, []))
+        latest = max(captures, key=lambda c: c.last_frame_time, default=None)
+        if latest is None or latest.last_frame is None:
+            return None, 0.0
+        if max_age is not None and time.time() - latest.last_frame_time > max_age:
+            return None, latest.last_frame_time
+        return latest.last_frame, latest.last_frame_time
+
+    def get_claimed_webcams(self) -> Dict[int, List[SupervisedCapture]]:
+        """Webcams locais (webcam://<índice>) atualmente em uso por capturas supervisionadas"""
+        with self._lock:
+            captures = [c for group in self._captures.values() for c in group]
+        claimed: Dict[int, List[SupervisedCapture]] = {}
+        for capture in captures:
+            if capture.stream_url.startswith("webcam://"):
+                token = capture.stream_url.split("://")[1]
+                index = int(token) if token.isdigit() else 0
+                claimed.setdefault(index, []).append(capture)
+        return claimed
+
+    def _on_state_change(self, camera_id: int):
+        state = self.get_camera_state(camera_id)
+        if state is None or state == ConnectionState.CONNECTING:
+            return
+        with self._lock:
+            previous = self._camera_states.get(camera_id)
+            self._camera_states[camera_id] = state
+        db_status = CameraStatus.OFFLINE if state == ConnectionState.OFFLINE else CameraStatus.ONLINE
+        previous_status = None
+        if previous is not None:
+            previous_status = CameraStatus.OFFLINE if previous == ConnectionState.OFFLINE else CameraStatus.ONLINE
+        if db_status != previous_status:
+            self._update_camera_status(camera_id, db_status)
+
+    def _update_camera_status(self, camera_id: int, new_status: CameraStatus):
+        """Refletir a conectividade em Camera.status (sem sobrescrever manutenção)"""
+        db = SessionLocal()
+        try:
+            camera = db.query(Camera).filter(Camera.id == camera_id).first()
+            if camera and camera.status != CameraStatus.MAINTENANCE.value and camera.status != new_status.value:
+                camera.status = new_status.value
+                db.commit()
+                logger.info(f"Status da câmera {camera_id} atualizado para {new_status.value}")
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Erro ao atualizar status da câmera {camera_id}: {e}")
+        finally:
+            db.close()
+
+    def get_status(self) -> Dict[int, Dict]:
+        """Estado de todas as conexões supervisionadas"""
+        with self._lock:
+            snapshot = {camera_id: list(captures) for camera_id, captures in self._captures.items()}
+        return {
+            camera_id: {
+                "state": max((c.state for c in captures), key=lambda s: STATE_PRIORITY[s]).value,
+                "consumers": [c.get_status() for c in captures],
+            }
+            for camera_id, captures in snapshot.items() if captures
+        }
+
+
+# Instância global do supervisor
+capture_supervisor = CaptureSupervisor()
@@ -0,0 +1,213 @@
+"""
+Topologia de CPU para inferência e captura
+
+Torch e OpenCV usam por padrão todos os núcleos em cada chamada; com várias
+câmeras isso multiplica as threads e derruba a vazão. O plano de topologia
+reserva núcleos para a API/codificação, define quantos núcleos cada thread de
+trabalho do escalonador usa (threads intra-op de torch/OpenCV) e, opcionalmente,
+fixa cada thread de trabalho em seu conjunto de núcleos.
+
+O modo benchmark mede a vazão de cada divisão possível e indica a melhor.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from config import settings
+from services.camera_scheduler import camera_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+def _available_cores() -> List[int]:
+    """Núcleos que o processo pode usar"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class TopologyPlan:
+    """Divisão dos núcleos entre API/codificação e threads de inferência"""
+
+    def __init__(self, cores: List[int], reserved_cores: int, threads_per_worker: int):
+        self.cores = cores
+        # Sempre sobra ao menos um núcleo para inferência
+        self.reserved_cores = max(0, min(reserved_cores, len(cores) - 1))
+        self.reserved = cores[:self.reserved_cores]
+        self.inference_cores = cores[self.reserved_cores:]
+        self.threads_per_worker = max(1, min(threads_per_worker, len(self.inference_cores)))
+        self.workers = max(1, len(self.inference_cores) // self.threads_per_worker)
+
+    @classmethod
+    def from_settings(cls, threads_per_worker: Optional[int] = None) -> "TopologyPlan":
+        return cls(_available_cores(), settings.cpu_reserved_cores,
+                   threads_per_worker or settings.cpu_threads_per_worker)
+
+    def worker_cores(self, worker_index: int) -> List[int]:
+        """Núcleos atribuídos a uma thread de trabalho"""
+        start = (worker_index % self.workers) * self.threads_per_worker
+        return self.inference_cores[start:start + self.threads_per_worker]
+
+    def to_dict(self) -> Dict:
+        return {
+            "total_cores": len(self.cores),
+            "reserved_cores": self.reserved,
+            "inference_cores": self.inference_cores,
+            "threads_per_worker": self.threads_per_worker,
+            "workers": self.workers,
+        }
+
+
+class CPUTopologyManager:
+    """Aplica o plano de topologia a torch, OpenCV e ao escalonador de câmeras"""
+
+    def __init__(self):
+        self.plan = TopologyPlan.from_settings()
+        self.applied = False
+        self.last_benchmark: Optional[Dict] = None
+        self._benchmark_lock = threading.Lock()
+        camera_scheduler.add_worker_initializer(self._init_worker)
+
+    def _set_thread_counts(self, threads: int):
+        """Threads intra-op de OpenCV e torch (configuração global do processo)
+
+        torch só é ajustado se já foi importado (pelo carregamento do modelo), para
+        não trazer o import pesado para a inicialização da API.
+        """
+        cv2.setNumThreads(threads)
+        torch = sys.modules.get("torch")
+        if torch is None:
+            return
+        try:
+            torch.set_num_threads(threads)
+        except Exception as e:
+            logger.debug(f"Não foi possível ajustar threads do torch: {e}")
+
+    def apply_thread_counts(self):
+        """Reaplicar threads intra-op do plano (ex.: após importar torch)"""
+        self._set_thread_counts(self.plan.threads_per_worker)
+
+    def apply(self, plan: Optional[TopologyPlan] = None):
+        """Aplicar plano: threads intra-op e número de threads do escalonador"""
+        if plan is not None:
+            self.plan = plan
+        self._set_thread_counts(self.plan.threads_per_worker)
+        # SCHEDULER_WORKERS explícito tem precedência sobre o plano
+        if not settings.scheduler_workers:
+            camera_scheduler.resize(self.plan.workers)
+        self.applied = True
+        logger.info(f"Topologia de CPU aplicada: {self.plan.workers} thread(s) de trabalho x "
+                    f"{self.plan.threads_per_worker} núcleo(s), {self.plan.reserved_cores} reservado(s) para API")
+
+    def _init_worker(self, worker_index: int):
+        """Afinidade da thread de trabalho (Linux), quando habilitada"""
+        if not settings.cpu_affinity_enabled or not hasattr(os, "sched_setaffinity"):
+            return
+        cores = self.plan.worker_cores(worker_index)
+        if cores:
+            os.sched_setaffinity(threading.get_native_id(), cores)
+            logger.debug(f"Thread de trabalho {worker_index} fixada nos núcleos {cores}")
+
+    def _workload(self, model) -> Callable[[np.ndarray], None]:
+        """Carga de referência: inferência YOLO se disponível, senão pré-processamento OpenCV"""
+        if model is not None:
+            return lambda frame: model(frame, verbose=False)
+
+        def opencv_workload(frame: np.ndarray):
+            blurred = cv2.GaussianBlur(frame, (5, 5), 0)
+            gray = cv2.cvtColor(blurred, cv2.COLOR_BGR2GRAY)
+            cv2.resize(gray, (320, 240))
+            cv2.Canny(gray, 50, 150)
+        return opencv_workload
+
+    def _measure(self, plan: TopologyPlan, workload: Callable, frame: np.ndarray, duration: float) -> float:
+        """Vazão (frames/s) com `plan.workers` threads em paralelo"""
+        self._set_thread_counts(plan.threads_per_worker)
+        workload(frame)  # aquecimento
+        counts = [0] * plan.workers
+        deadline = time.time() + duration
+
+        def run(index: int):
+            if settings.cpu_affinity_enabled and hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(threading.get_native_id(), plan.worker_cores(index))
+            while time.time() < deadline:
+                workload(frame)
+                counts[index] += 1
+
+        threads = [threading.Thread(target=run, args=(i,), daemon=True) for i in range(plan.workers)]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(counts) / max(1e-6, time.time() - started)
+
+    def benchmark(self, model=None, duration: float = 3.0, apply: bool = False,
+                  busy: Optional[Callable[[], Optional[str]]] = None) -> Dict:
+        """Medir vazão de cada divisão núcleos/thread e escolher a melhor
+
+        Cada candidato roda por `duration` segundos. O modelo e os limites de
+        threads do torch/OpenCV são os mesmos dos monitores: `busy()` devolve o
+        motivo para não medir (ex.: monitores ativos) e é conferido antes de
+        cada candidato; RuntimeError nesses casos.
+        """
+        if not self._benchmark_lock.acquire(blocking=False):
+            raise RuntimeError("Benchmark de topologia já em execução")
+        try:
+            reason = busy() if busy else None
+            if reason:
+                raise RuntimeError(reason)
+            frame = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+            workload = self._workload(model)
+            inference_cores = max(1, len(self.plan.cores) - settings.cpu_reserved_cores)
+            candidates = sorted({t for t in (1, 2, 4, 8, 16) if t <= inference_cores} | {inference_cores})
+
+            results = []
+            for threads_per_worker in candidates:
+                reason = busy() if busy else None
+                if reason:
+                    # Restaurar threads do plano em uso antes de abortar
+                    self.apply_thread_counts()
+                    raise RuntimeError(reason)
+                plan = TopologyPlan.from_settings(threads_per_worker)
+                fps = self._measure(plan, workload, frame, duration)
+                results.append({**plan.to_dict(), "throughput_fps": round(fps, 2)})
+                logger.info(f"Benchmark de topologia: {plan.workers}x{plan.threads_per_worker} -> {fps:.1f} fps")
+
+            best = max(results, key=lambda r: r["throughput_fps"])
+            self.last_benchmark = {
+                "workload": "yolo" if model is not None else "opencv",
+                "duration_per_candidate": duration,
+                "results": results,
+                "best": best,
+                "applied": apply,
+                "timestamp": time.time(),
+            }
+            if apply:
+                self.apply(TopologyPlan.from_settings(best["threads_per_worker"]))
+            else:
+                # Restaurar threads do plano em uso
+                self.apply_thread_counts()
+            return self.last_benchmark
+        finally:
+            self._benchmark_lock.release()
+
+    def get_status(self) -> Dict:
+        return {
+            "plan": self.plan.to_dict(),
+            "applied": self.applied,
+            "affinity_enabled": settings.cpu_affinity_enabled,
+            "scheduler_workers": camera_scheduler.worker_count,
+            "opencv_threads": cv2.getNumThreads(),
+            "last_benchmark": self.last_benchmark,
+        }
+
+
+# Instância global do gerenciador
+cpu_topology = CPUTopologyManager()
@@ -2,6 +2,7 @@
 Serviço de detecção de invasão avançado
 """
 import asyncio
+import copy
 import cv2
 import numpy as np
 import threading
@@ -13,24 +14,98 @@ from datetime import datetime
 import os
 from collections import deque
 
-from ultralytics import YOLO
 from sqlalchemy.orm import Session
 
 from models.camera import Camera
 from models.event import Event, EventType
+from models.event_detection import EventDetection, detection_rows
 from config import settings
 from database import SessionLocal
+from services.analysis_budget import analysis_budget
+from services.arming_schedule import ArmingSchedule, DISARMED_CAPTURE, DISARMED_RELEASE, seconds_until
+from services.camera_scheduler import ScheduledTask, camera_scheduler
+from services.overload_controller import DegradationLevel, overload_controller
+from services.capture_supervisor import SupervisedCapture, capture_supervisor
+from services.cpu_topology import cpu_topology
+from services.inference_service import inference_batcher, objects_from_result
+from services.recent_events_cache import recent_events_cache
 from websocket_manager import manager
 
 logger = logging.getLogger(__name__)
 
 
+class DetectionConfig:
+    """Configuração de detecção compilada de uma câmera (imutável após criada)"""
+
+    def __init__(self, camera: Camera, version: int):
+        self.version = version
+        self.detection_enabled = bool(camera.detection_enabled)
+        # Sensibilidade em faixa segura
+        self.sensitivity = max(0.25, min(0.7, (camera.sensitivity or 50) / 100.0))
+        # Linha e zona já convertidas para dict (evita parse de JSON a cada frame)
+        self.detection_line = self._parse(camera.detection_line)
+        self.detection_zone = self._parse(camera.detection_zone)
+        try:
+            self.schedule = ArmingSchedule.from_camera(camera)
+        except ValueError as e:
+            logger.error(f"Agenda de armação inválida na câmera {camera.id}, mantendo armada: {e}")
+            self.schedule = None
+        self.disarmed_mode = camera.disarmed_mode or DISARMED_CAPTURE
+
+    @staticmethod
+    def _parse(config) -> Optional[Dict]:
+        if isinstance(config, str):
+            try:
+                return json.loads(config)
+            except json.JSONDecodeError as e:
+                logger.error(f"Erro ao fazer parse de configuração JSON: {e}")
+                return None
+        return config or None
+
+    @property
+    def has_line_or_zone(self) -> bool:
+        return bool(self.detection_line or self.detection_zone)
+
+
+class CameraMonitor:
+    """Estado do monitoramento de uma câmera entre passos do escalonador"""
+
+    def __init__(self, camera_id: int, stream_url: str):
+        self.camera_id = camera_id
+        self.stream_url = stream_url
+        self.task: Optional[ScheduledTask] = None
+        self.capture: Optional[SupervisedCapture] = None
+        self.db: Optional[Session] = None
+        self.ready = False
+        self.frame_count = 0
+        # Configuração compilada; trocada por inteiro entre frames quando a versão muda
+        self.config: Optional[DetectionConfig] = None
+        self.bg_subtractor = None
+        self.kernel = None
+        # Estado de armação, reavaliado só em arming_check_at
+        self.armed: Optional[bool] = None
+        self.next_transition: Optional[datetime] = None
+        self.arming_check_at = 0.0
+
+
+class ModelState:
+    """Estados do carregamento do modelo YOLO"""
+    IDLE = "idle"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+
 class DetectionService:
     """Serviço de detecção de invasão com IA"""
 
     def __init__(self):
         self.active_monitors: Dict[int, bool] = {}
-        self.camera_threads: Dict[int, threading.Thread] = {}
+        self.monitor_tasks: Dict[int, ScheduledTask] = {}
+        self.monitors: Dict[int, CameraMonitor] = {}
+        # Canal de versão da configuração por câmera
+        self.config_versions: Dict[int, int] = {}
+        self._config_lock = threading.Lock()
         self.model = None
         
         # Sistema de rastreamento avançado
@@ -53,8 +128,63 @@ class DetectionService:
         
         # Armazenar email do usuário logado por câmera
         self.camera_user_emails: Dict[int, str] = {}
-        
-        self.load_model()
+
+        # Threads de torch/OpenCV e do escalonador conforme a topologia de CPU
+        self.cpu_topology = cpu_topology
+        self.cpu_topology.apply()
+
+        # Modelo carregado em segundo plano (start_model_warmup), fora do caminho de import da API
+        self.model_state = ModelState.IDLE
+        self.model_error: Optional[str] = None
+        self.model_load_seconds: Optional[float] = None
+        self._model_lock = threading.Lock()
+        self._model_done = threading.Event()
+
+    def start_model_warmup(self):
+        """Carregar o modelo e executar uma inferência de aquecimento em segundo plano"""
+        with self._model_lock:
+            if self.model_state in (ModelState.LOADING, ModelState.READY):
+                return
+            self.model_state = ModelState.LOADING
+            self.model_error = None
+            self._model_done.clear()
+        threading.Thread(target=self._warmup_model, name="model-warmup", daemon=True).start()
+
+    def _warmup_model(self):
+        started = time.time()
+        try:
+            self.load_model()
+            if self.model is None:
+                self.model_error = "Modelo YOLO não pôde ser carregado"
+                self.model_state = ModelState.FAILED
+                return
+            # torch já importado: aplicar threads intra-op do plano de topologia
+            self.cpu_topology.apply_thread_counts()
+            # Inferência de aquecimento: inicializa kernels e alocações antes do primeiro frame real
+            try:
+                self.model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+            except Exception as e:
+                logger.warning(f"Inferência de aquecimento falhou (modelo carregado): {e}")
+            self.model_state = ModelState.READY
+            logger.info(f"✅ Modelo YOLO pronto em {time.time() - started:.1f}s")
+        finally:
+            self.model_load_seconds = round(time.time() - started, 2)
+            self._model_done.set()
+
+    def ensure_model(self, timeout: Optional[float] = None) -> bool:
+        """Iniciar o carregamento se necessário e aguardar até `timeout` segundos"""
+        if self.model_state == ModelState.IDLE:
+            self.start_model_warmup()
+        self._model_done.wait(timeout)
+        return self.is_model_loaded()
+
+    def get_model_status(self) -> Dict:
+        return {
+            "state": self.model_state,
+            "model_loaded": self.is_model_loaded(),
+            "error": self.model_error,
+            "load_seconds": self.model_load_seconds,
+        }
 
     def load_model(self):
         """Carregar modelo YOLO com suporte para PyTorch 2.6+"""
@@ -126,6 +256,8 @@ class DetectionService:
         except Exception as e:
             logger.error(f"❌ Erro crítico ao carregar modelo YOLO: {e}", exc_info=True)
             self.model = None
+        finally:
+            inference_batcher.set_model(self.model)
     
     def _parse_config(self, config) -> Optional[Dict]:
         """Helper para parse seguro de configuração (aceita dict ou string JSON)"""
@@ -185,13 +317,15 @@ class DetectionService:
             history=500
         )
         
-        thread = threading.Thread(
-            target=self._monitor_camera,
-            args=(camera_id, stream_url),
-            daemon=True
+        # Cada câmera é uma tarefa cooperativa no pool fixo do escalonador
+        monitor = CameraMonitor(camera_id, stream_url)
+        monitor.task = camera_scheduler.submit(
+            f"detection:{camera_id}",
+            lambda: self._monitor_step(monitor),
+            on_stop=lambda: self._finish_monitor(monitor),
         )
-        self.camera_threads[camera_id] = thread
-        thread.start()
+        self.monitor_tasks[camera_id] = monitor.task
+        self.monitors[camera_id] = monitor
         logger.info(f"✅ Monitoramento avançado INICIADO para câmera {camera_id} - URL: {stream_url}")
     
     def is_monitoring_active(self, camera_id: int) -> bool:
@@ -209,9 +343,10 @@ class DetectionService:
             del self.camera_user_emails[camera_id]
         if camera_id in self.active_monitors:
             self.active_monitors[camera_id] = False
-            if camera_id in self.camera_threads:
-                self.camera_threads[camera_id].join(timeout=5)
-                del self.camera_threads[camera_id]
+            self.monitors.pop(camera_id, None)
+            task = self.monitor_tasks.pop(camera_id, None)
+            if task:
+                camera_scheduler.cancel(task, timeout=5)
             
             # Limpar dados de rastreamento
             if camera_id in self.tracking_data:
@@ -225,135 +360,261 @@ class DetectionService:
                 
             logger.info(f"Monitoramento parado para câmera {camera_id}")
 
-    def _monitor_camera(self, camera_id: int, stream_url: str):
-        """Monitorar câmera em thread separada com detecção avançada"""
-        cap = None
-        db = None
-        try:
-            # Conectar à câmera (Windows: tentar DirectShow antes de MSMF)
-            if stream_url.startswith("webcam://"):
-                token = stream_url.split("://")[1]
-                camera_index = int(token) if token.isdigit() else 0
-                cap = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
-                if not cap.isOpened():
-                    cap.release()
-                    cap = cv2.VideoCapture(camera_index, cv2.CAP_MSMF)
+    def _setup_monitor(self, monitor: "CameraMonitor") -> bool:
+        """Preparar monitoramento (primeiro passo da tarefa): captura e configurações"""
+        camera_id = monitor.camera_id
+
+        # Validar modelo YOLO (ainda carregando: _monitor_step tenta novamente)
+        if not self.is_model_loaded():
+            logger.error(f"Modelo YOLO não está carregado! Detecção não funcionará para câmera {camera_id}")
+            return False
+
+        # Obter configurações da câmera
+        monitor.db = SessionLocal()
+        version = self.get_config_version(camera_id)
+        camera = monitor.db.query(Camera).filter(Camera.id == camera_id).first()
+        if not camera:
+            logger.error(f"Câmera {camera_id} não encontrada no banco de dados")
+            return False
+
+        if not camera.detection_enabled:
+            logger.info(f"Detecção desabilitada para câmera {camera_id}")
+            return False
+
+        monitor.config = DetectionConfig(camera, version)
+        logger.info(f"Configurações da câmera {camera_id}: sensitivity={monitor.config.sensitivity:.2f}, "
+                   f"tem_linha={monitor.config.detection_line is not None}, "
+                   f"tem_zona={monitor.config.detection_zone is not None}")
+
+        monitor.bg_subtractor = self.bg_subtractors[camera_id]
+        # Kernel para operações morfológicas
+        monitor.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+        # Agenda de armação; a captura é aberta conforme o estado armado/desarmado
+        self._update_arming(monitor)
+
+        monitor.ready = True
+        return True
+
+    def get_config_version(self, camera_id: int) -> int:
+        """Versão atual da configuração de detecção de uma câmera"""
+        return self.config_versions.get(camera_id, 0)
+
+    def bump_config_version(self, camera_id: int) -> int:
+        """Sinalizar alteração de configuração (chamar após o commit no banco)
+
+        O monitor em execução recompila a configuração entre frames, mantendo a
+        captura e o modelo de fundo (MOG2).
+        """
+        with self._config_lock:
+            version = self.config_versions.get(camera_id, 0) + 1
+            self.config_versions[camera_id] = version
+        monitor = self.monitors.get(camera_id)
+        if monitor and monitor.task:
+            camera_scheduler.wake(monitor.task)
+        return version
+
+    def _reload_config(self, monitor: "CameraMonitor") -> bool:
+        """Recompilar a configuração e trocá-la de uma vez (False se a detecção foi desabilitada)"""
+        camera_id = monitor.camera_id
+        version = self.get_config_version(camera_id)
+        # Descartar cache da sessão longa do monitor para ler o estado atual
+        monitor.db.expire_all()
+        camera = monitor.db.query(Camera).filter(Camera.id == camera_id).first()
+        if not camera or not camera.detection_enabled:
+            logger.info(f"Detecção desabilitada para câmera {camera_id}; encerrando monitoramento")
+            self.active_monitors[camera_id] = False
+            return False
+
+        config = DetectionConfig(camera, version)
+        previous = monitor.config
+        monitor.config = config
+        analysis_budget.set_armed(camera_id, config.has_line_or_zone)
+        # Agenda pode ter mudado: reavaliar no mesmo passo
+        monitor.arming_check_at = 0.0
+        logger.info(f"Configuração da câmera {camera_id} recarregada (versão {previous.version if previous else 0} -> "
+                    f"{version}): sensitivity={config.sensitivity:.2f}, tem_linha={config.detection_line is not None}, "
+                    f"tem_zona={config.detection_zone is not None}")
+        return True
+
+    def _update_arming(self, monitor: "CameraMonitor"):
+        """Reavaliar a agenda e aplicar o estado (chamado só na próxima transição prevista)"""
+        camera_id = monitor.camera_id
+        config = monitor.config
+        if config.schedule:
+            armed, monitor.next_transition = config.schedule.state()
+        else:
+            armed, monitor.next_transition = True, None
+        wait = seconds_until(monitor.next_transition)
+        if wait is None:
+            # Sem transição no horizonte da agenda: reavaliar diariamente (exceções futuras)
+            wait = 86400.0 if config.schedule else float("inf")
+        monitor.arming_check_at = time.time() + wait
+
+        if armed != monitor.armed:
+            if monitor.armed is not None:
+                logger.info(f"Câmera {camera_id}: {'ARMADA' if armed else 'DESARMADA'} pela agenda "
+                            f"(próxima transição: {monitor.next_transition})")
+            monitor.armed = armed
+            if armed:
+                # Zona ou linha configurada dá prioridade no orçamento de análise
+                analysis_budget.register(camera_id, armed=config.has_line_or_zone)
+                overload_controller.register(camera_id)
             else:
-                cap = cv2.VideoCapture(stream_url)
-                
-            if not cap.isOpened():
-                logger.error(f"Erro ao conectar à câmera {camera_id} - URL: {stream_url}")
-                return
+                # Desarmada não consome orçamento de inferência
+                analysis_budget.unregister(camera_id)
+                overload_controller.unregister(camera_id)
 
-            # Configurar propriedades da câmera
-            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-            cap.set(cv2.CAP_PROP_FPS, 15)
-            
-            logger.info(f"Conectado à câmera {camera_id} - URL: {stream_url}")
-            
-            # Validar modelo YOLO
-            if not self.is_model_loaded():
-                logger.error(f"Modelo YOLO não está carregado! Detecção não funcionará para câmera {camera_id}")
-                return
-            
-            # Obter configurações da câmera
-            db = SessionLocal()
-            camera = db.query(Camera).filter(Camera.id == camera_id).first()
-            if not camera:
-                logger.error(f"Câmera {camera_id} não encontrada no banco de dados")
-                db.close()
-                return
-            
-            if not camera.detection_enabled:
-                logger.info(f"Detecção desabilitada para câmera {camera_id}")
-                db.close()
-                return
+        needs_capture = armed or config.disarmed_mode != DISARMED_RELEASE
+        if needs_capture and monitor.capture is None:
+            # Conexão, reconexão e backoff ficam a cargo do supervisor de capturas
+            monitor.capture = capture_supervisor.open(camera_id, monitor.stream_url, "detection", fps=15)
+        elif not needs_capture and monitor.capture is not None:
+            logger.info(f"Câmera {camera_id}: liberando stream enquanto desarmada")
+            monitor.capture.release()
+            monitor.capture = None
 
-            # Configurações de detecção
-            # Sensibilidade em faixa segura
-            sensitivity = max(0.25, min(0.7, (camera.sensitivity or 50) / 100.0))
-            detection_line = camera.detection_line
-            detection_zone = camera.detection_zone
-            
-            logger.info(f"Configurações da câmera {camera_id}: sensitivity={sensitivity:.2f}, "
-                       f"tem_linha={detection_line is not None}, tem_zona={detection_zone is not None}")
-            
-            frame_count = 0
-            bg_subtractor = self.bg_subtractors[camera_id]
-            tracking_data = self.tracking_data[camera_id]
-            
-            # Kernel para operações morfológicas
-            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-            
-            fail_reads = 0
-            while self.active_monitors.get(camera_id, False):
-                ret, frame = cap.read()
-                if not ret or frame is None:
-                    fail_reads += 1
-                    logger.warning(f"Erro ao ler frame da câmera {camera_id}")
-                    if fail_reads >= 50:
-                        logger.error(f"Encerrando monitor da câmera {camera_id} por falha contínua de leitura")
-                        break
-                    time.sleep(0.1)
-                    continue
-                else:
-                    fail_reads = 0
+    def get_arming_state(self, camera_id: int) -> Optional[Dict]:
+        """Estado de armação de um monitoramento ativo"""
+        monitor = self.monitors.get(camera_id)
+        if not monitor or monitor.armed is None:
+            return None
+        return {
+            "armed": monitor.armed,
+            "next_transition": monitor.next_transition.isoformat() if monitor.next_transition else None,
+            "disarmed_mode": monitor.config.disarmed_mode,
+            "capture_open": monitor.capture is not None,
+        }
 
-                frame_count += 1
-                current_time = time.time()
-                
-                # Processar frame a cada 3 frames para melhor performance
-                if frame_count % 3 == 0:
-                    # Verificar cooldown
-                    time_since_last = current_time - self.last_detection_time.get(camera_id, 0)
-                    if time_since_last < self.detection_cooldown:
-                        if frame_count % 30 == 0:
-                            logger.debug(f"Câmera {camera_id}: Em cooldown ({self.detection_cooldown - time_since_last:.1f}s restantes)")
-                        continue
-                    
-                    # Log periódico para debug
-                    if frame_count % 30 == 0:
-                        logger.info(f"📹 Câmera {camera_id}: Processando frame {frame_count} (zona={'✅' if detection_zone else '❌'}, linha={'✅' if detection_line else '❌'})")
-                    
-                    # Detecção avançada
-                    intrusion_detected = self._advanced_detection(
-                        frame, camera_id, sensitivity, detection_line, detection_zone, bg_subtractor, kernel
-                    )
-                    
-                    if intrusion_detected:
-                        logger.warning(f"🚨🚨🚨 INTRUSÃO DETECTADA na câmera {camera_id} 🚨🚨🚨")
-                        self.last_detection_time[camera_id] = current_time
-                        self._handle_intrusion_advanced(
-                            db, camera_id, frame, current_time
-                        )
+    def _monitor_step(self, monitor: "CameraMonitor") -> Optional[float]:
+        """Executar um passo do monitoramento (um frame)
+
+        Returns:
+            Segundos até o próximo passo, ou None para encerrar a tarefa
+        """
+        camera_id = monitor.camera_id
+        if not self.active_monitors.get(camera_id, False):
+            return None
+        if not monitor.ready:
+            if self.model_state in (ModelState.IDLE, ModelState.LOADING):
+                # Aguardar o aquecimento do modelo antes de abrir a captura
+                self.start_model_warmup()
+                return 0.5
+            if not self._setup_monitor(monitor):
+                return None
 
-                # Controle de FPS
-                time.sleep(1.0 / 15)  # 15 FPS
+        # Canal de versão: nova configuração é aplicada entre frames
+        if monitor.config.version != self.get_config_version(camera_id):
+            if not self._reload_config(monitor):
+                return None
 
-        except Exception as e:
-            logger.error(f"Erro no monitoramento da câmera {camera_id}: {e}")
-        finally:
-            if cap:
-                cap.release()
-            if db:
-                db.close()
+        if time.time() >= monitor.arming_check_at:
+            self._update_arming(monitor)
+        if not monitor.armed:
+            return self._disarmed_step(monitor)
+
+        capture = monitor.capture
+        read_started = time.time()
+        ret, frame = capture.read()
+        if not ret or frame is None:
+            # Aguardar o backoff de reconexão (em fatias curtas para responder ao stop)
+            return min(max(capture.wait_time(), 0.1), 1.0)
+        analysis_budget.record_stage(camera_id, "capture", time.time() - read_started)
+
+        monitor.frame_count += 1
+        frame_count = monitor.frame_count
+        current_time = time.time()
+
+        # Taxa de análise definida pelo orçamento global (prioriza câmeras ativas/armadas)
+        if analysis_budget.should_analyze(camera_id):
+            # Referência única à configuração durante todo o frame
+            config = monitor.config
+            # Verificar cooldown
+            time_since_last = current_time - self.last_detection_time.get(camera_id, 0)
+            if time_since_last < self.detection_cooldown:
+                if frame_count % 30 == 0:
+                    logger.debug(f"Câmera {camera_id}: Em cooldown ({self.detection_cooldown - time_since_last:.1f}s restantes)")
+                return self._next_frame_delay(camera_id)
+
+            # Log periódico para debug
+            if frame_count % 30 == 0:
+                logger.info(f"📹 Câmera {camera_id}: Processando frame {frame_count} (zona={'✅' if config.detection_zone else '❌'}, linha={'✅' if config.detection_line else '❌'})")
+
+            # Detecção avançada
+            analysis_started = time.time()
+            frame_objects: List[Dict] = []
+            intrusion_detected = self._advanced_detection(
+                frame, camera_id, config.sensitivity, config.detection_line, config.detection_zone,
+                monitor.bg_subtractor, monitor.kernel, objects_out=frame_objects
+            )
+            analysis_budget.record_stage(camera_id, "analysis", time.time() - analysis_started)
+            overload_controller.record_latency(camera_id, time.time() - read_started)
+
+            if intrusion_detected:
+                logger.warning(f"🚨🚨🚨 INTRUSÃO DETECTADA na câmera {camera_id} 🚨🚨🚨")
+                self.last_detection_time[camera_id] = current_time
+                analysis_budget.mark_activity(camera_id, "intrusion")
+                self._handle_intrusion_advanced(
+                    monitor.db, camera_id, frame, current_time, frame_objects
+                )
+
+        return self._next_frame_delay(camera_id)
+
+    def _disarmed_step(self, monitor: "CameraMonitor") -> float:
+        """Câmera desarmada: apenas mantém a captura (ou aguarda, se liberada)"""
+        if monitor.capture is None:
+            # Stream liberado: acordar na próxima transição (no máximo a cada 60s)
+            return min(max(monitor.arming_check_at - time.time(), 1.0), 60.0)
+        ret, _ = monitor.capture.read()
+        if not ret:
+            return min(max(monitor.capture.wait_time(), 0.1), 1.0)
+        return 1.0 / max(0.1, settings.capture_min_fps)
+
+    def _next_frame_delay(self, camera_id: int) -> float:
+        """Intervalo até a próxima leitura: acompanha a taxa de análise, entre capture_min_fps e capture_fps"""
+        min_delay = 1.0 / max(1, settings.capture_fps)
+        max_delay = 1.0 / max(0.1, settings.capture_min_fps)
+        return min(max(analysis_budget.time_until_next(camera_id), min_delay), max_delay)
+
+    def _finish_monitor(self, monitor: "CameraMonitor"):
+        """Liberar recursos da tarefa de monitoramento"""
+        analysis_budget.unregister(monitor.camera_id)
+        overload_controller.unregister(monitor.camera_id)
+        if monitor.capture:
+            monitor.capture.release()
+        if monitor.db:
+            monitor.db.close()
 
     def _advanced_detection(self, frame: np.ndarray, camera_id: int, sensitivity: float, 
                            detection_line: Optional[str], detection_zone: Optional[str], 
-                           bg_subtractor, kernel) -> bool:
-        """Detecção avançada combinando YOLO e análise de movimento"""
+                           bg_subtractor, kernel, objects_out: Optional[List[Dict]] = None) -> bool:
+        """Detecção avançada combinando YOLO e análise de movimento
+
+        Se `objects_out` for informado, recebe os objetos YOLO do frame.
+        """
         try:
             # Parse das configurações uma vez
             line_config = self._parse_config(detection_line)
             zone_config = self._parse_config(detection_zone)
             
             # 1. Detecção de movimento com background subtraction
+            stage_started = time.time()
             motion_detected = self._detect_motion(frame, bg_subtractor, kernel)
+            analysis_budget.record_stage(camera_id, "motion", time.time() - stage_started)
             if motion_detected:
                 logger.debug(f"Movimento detectado na câmera {camera_id}")
-            
-            # 2. Detecção de objetos com YOLO (se disponível)
-            objects = self._detect_objects_yolo(frame, sensitivity) if self.model else []
+                analysis_budget.mark_activity(camera_id, "motion")
+            
+            # 2. Detecção de objetos com YOLO (se disponível e se a câmera não estiver degradada)
+            level = overload_controller.get_level(camera_id)
+            objects = []
+            if self.model and level < DegradationLevel.MOTION_ONLY:
+                imgsz = settings.overload_reduced_imgsz if level == DegradationLevel.REDUCED_INPUT else None
+                stage_started = time.time()
+                objects = self._detect_objects_yolo(frame, sensitivity, imgsz=imgsz)
+                analysis_budget.record_stage(camera_id, "yolo", time.time() - stage_started)
+            if objects_out is not None:
+                objects_out.extend(objects)
             if objects:
                 logger.info(f"🔍 YOLO detectou {len(objects)} objeto(s) na câmera {camera_id}: {[obj['class'] for obj in objects]}")
                 # Log detalhado dos objetos
@@ -461,8 +722,9 @@ class DetectionService:
             logger.error(f"Erro na detecção de movimento: {e}")
             return False
 
-    def _detect_objects_yolo(self, frame: np.ndarray, sensitivity: float) -> List[Dict]:
-        """Detectar objetos usando YOLO"""
+    def _detect_objects_yolo(self, frame: np.ndarray, sensitivity: float,
+                             imgsz: Optional[int] = None) -> List[Dict]:
+        """Detectar objetos usando YOLO (imgsz reduz a entrada sob sobrecarga)"""
         objects = []
         
         try:
@@ -470,38 +732,27 @@ class DetectionService:
                 logger.warning("Modelo YOLO não disponível - detecção não funcionará")
                 return objects
             
-            # Executar detecção YOLO
-            results = self.model(frame, conf=sensitivity, verbose=False)
-            
+            # Executar detecção YOLO (em lote com os demais monitores e clientes da API)
+            if settings.inference_batching_enabled:
+                return inference_batcher.infer(frame, sensitivity, imgsz=imgsz)
+            if imgsz:
+                results = self.model(frame, conf=sensitivity, imgsz=imgsz, verbose=False)
+            else:
+                results = self.model(frame, conf=sensitivity, verbose=False)
             for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        # Obter coordenadas e confiança
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        confidence = box.conf[0].cpu().numpy()
-                        class_id = int(box.cls[0].cpu().numpy())
-                        class_name = self.model.names[class_id]
-                        
-                        # Filtrar apenas objetos relevantes
-                        if class_name in ['person', 'car', 'truck', 'bus', 'motorcycle', 'bicycle']:
-                            objects.append({
-                                'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                                'confidence': float(confidence),
-                                'class': class_name,
-                                'center': [int((x1 + x2) / 2), int((y1 + y2) / 2)],
-                                'area': int((x2 - x1) * (y2 - y1))
-                            })
+                objects.extend(objects_from_result(result, self.model.names, sensitivity))
             
         except Exception as e:
             logger.error(f"Erro na detecção YOLO: {e}", exc_info=True)
         
         return objects
 
-    def _track_objects(self, frame: np.ndarray, camera_id: int, objects: List[Dict]) -> List[Dict]:
-        """Rastrear objetos entre frames"""
+    def _track_objects(self, frame: np.ndarray, camera_id: int, objects: List[Dict],
+                       tracking_data: Optional[Dict] = None) -> List[Dict]:
+        """Rastrear objetos entre frames (tracking_data substitui o estado da câmera)"""
         tracked = []
-        tracking_data = self.tracking_data[camera_id]
+        if tracking_data is None:
+            tracking_data = self.tracking_data[camera_id]
         
         try:
             current_objects = {}
@@ -660,6 +911,10 @@ class DetectionService:
 
     def _check_zone_intrusion(self, point: List[int], zone_config: Dict, frame_shape: Optional[Tuple[int,int,int]] = None) -> bool:
         """Verificar se ponto está em alguma das zonas (suporta múltiplas zonas)"""
+        return self._zone_index(point, zone_config, frame_shape) is not None
+
+    def _zone_index(self, point: List[int], zone_config: Dict, frame_shape: Optional[Tuple[int,int,int]] = None) -> Optional[int]:
+        """Índice da primeira zona que contém o ponto (None se nenhuma)"""
         try:
             px, py = point
             
@@ -673,16 +928,16 @@ class DetectionService:
                 zones_to_check = [zone_config]
             else:
                 logger.warning(f"Formato de zona inválido: {zone_config}")
-                return False
+                return None
             
             if not zones_to_check:
-                return False
+                return None
             
             ref_w = zone_config.get('ref_w')
             ref_h = zone_config.get('ref_h')
             
             # Verificar se ponto está em alguma das zonas
-            for zone in zones_to_check:
+            for index, zone in enumerate(zones_to_check):
                 points = zone.get('points', [])
                 
                 if len(points) < 3:
@@ -703,14 +958,14 @@ class DetectionService:
                 
                 if inside >= 0:
                     logger.info(f"✅ Ponto ({px}, {py}) está DENTRO da zona '{zone.get('name', 'zona')}' (distância: {inside:.1f})")
-                    return True  # Encontrou em uma zona, retornar True
+                    return index  # Encontrou em uma zona
             
             logger.debug(f"❌ Ponto ({px}, {py}) está FORA de todas as zonas")
-            return False
+            return None
             
         except Exception as e:
             logger.error(f"Erro na verificação de zona: {e}", exc_info=True)
-            return False
+            return None
     
     def _get_motion_center(self, frame: np.ndarray, bg_subtractor, kernel) -> Optional[List[int]]:
         """Obter centro do movimento detectado"""
@@ -785,8 +1040,9 @@ class DetectionService:
             logger.error(f"Erro no cálculo de distância: {e}")
             return float('inf')
 
-    def _handle_intrusion_advanced(self, db: Session, camera_id: int, frame: np.ndarray, timestamp: float):
-        """Processar evento de intrusão avançado"""
+    def _handle_intrusion_advanced(self, db: Session, camera_id: int, frame: np.ndarray, timestamp: float,
+                                   objects: Optional[List[Dict]] = None):
+        """Processar evento de intrusão avançado (objects: objetos YOLO do frame)"""
         try:
             # Obter informações da câmera para melhorar descrição
             camera = db.query(Camera).filter(Camera.id == camera_id).first()
@@ -824,6 +1080,12 @@ class DetectionService:
             else:
                 logger.info(f"Screenshot salvo com sucesso: {filepath}")
             
+            # Zona de cada objeto (índice da zona que contém o centro)
+            objects = objects or []
+            zone_config = self._parse_config(camera.detection_zone) if has_zone else None
+            for obj in objects:
+                obj['zone_index'] = self._zone_index(obj['center'], zone_config, frame.shape) if zone_config else None
+
             # Criar evento com EventType correto
             event = Event(
                 camera_id=camera_id,
@@ -831,14 +1093,30 @@ class DetectionService:
                 confidence=0.9,  # Alta confiança para detecção avançada
                 description=description,
                 image_path=public_url if public_url else None,
+                file_bytes=os.path.getsize(filepath) if filepath else 0,
                 timestamp=datetime.fromtimestamp(timestamp),
+                detected_objects=[
+                    {'class': obj['class'], 'confidence': round(obj['confidence'], 4), 'zone_index': obj['zone_index']}
+                    for obj in objects
+                ] or None,
+                bounding_boxes=[
+                    dict(zip(('x1', 'y1', 'x2', 'y2'), obj['bbox']), **{'class': obj['class']})
+                    for obj in objects
+                ] or None,
                 is_processed=True,
                 is_notified=False
             )
             
             db.add(event)
+            if objects:
+                # Detecções normalizadas na mesma transação do evento (inserção em lote)
+                db.flush()
+                rows = detection_rows(event, objects, frame.shape)
+                if rows:
+                    db.execute(EventDetection.__table__.insert(), rows)
             db.commit()
             db.refresh(event)
+            recent_events_cache.add(event)
             
             logger.info(f"✅ Evento de intrusão registrado: ID={event.id}, Câmera={camera_id}, "
                           f"Timestamp={timestamp_str}, Imagem={'OK' if filepath else 'FALHOU'}, "
@@ -958,6 +1236,7 @@ class DetectionService:
                             try:
                                 event.is_notified = True
                                 db.commit()
+                                recent_events_cache.update(event)
                             except Exception as e:
                                 logger.warning(f"Erro ao marcar evento como notificado: {e}")
                         
@@ -988,9 +1267,22 @@ class DetectionService:
     def test_tracking(self, frame: np.ndarray, camera_id: int, objects: List[Dict]) -> List[Dict]:
         """
         Método público para testar rastreamento de objetos.
-        Usado pela API para testes de detecção.
+        Usado pela API para testes de detecção: roda sobre uma cópia descartável
+        do rastreador da câmera, sem alterar o estado do monitor em execução.
         """
-        return self._track_objects(frame, camera_id, objects)
+        return self._track_objects(frame, camera_id, objects, self._copy_tracking_data(camera_id))
+
+    def _copy_tracking_data(self, camera_id: int) -> Dict:
+        """Cópia do estado de rastreamento (vazio se a câmera não está sendo monitorada)"""
+        fresh = {'objects': {}, 'next_id': 0, 'frame_count': 0}
+        live = self.tracking_data.get(camera_id)
+        if not live:
+            return fresh
+        try:
+            return copy.deepcopy(live)
+        except RuntimeError:
+            # Monitor alterou o dicionário durante a cópia
+            return fresh
 
     def test_intrusion_check(self, frame: np.ndarray, objects: List[Dict], 
                             detection_line: Optional[str], detection_zone: Optional[str]) -> bool:
@@ -1001,6 +1293,20 @@ class DetectionService:
         return self._check_advanced_intrusion(frame, objects, detection_line, detection_zone)
 
 
+    def evaluate_zone_hits(self, objects: List[Dict], frame_shape: Tuple[int, ...],
+                           detection_line=None, detection_zone=None) -> List[Dict]:
+        """
+        Marcar objetos dentro da zona ou próximos da linha (sem rastreamento).
+        Usado por /detection/infer para clientes que enviam frames avulsos.
+        """
+        line_config = self._parse_config(detection_line)
+        zone_config = self._parse_config(detection_zone)
+        for obj in objects:
+            obj['in_zone'] = bool(zone_config) and self._check_zone_intrusion(obj['center'], zone_config, frame_shape)
+            obj['near_line'] = bool(line_config) and self._check_line_crossing(obj['center'], line_config)
+        return objects
+
+
 # Instância global do serviço
 detection_service = DetectionService()
 
@@ -0,0 +1,176 @@
+"""
+Registro de webcams locais
+
+Sonda os índices de webcam em paralelo (com timeout por sonda) e mantém o
+resultado em cache com TTL. A sondagem só acontece sob demanda: a primeira
+listagem sonda na hora e listagens com o cache expirado revalidam em segundo
+plano. Cada sonda ocupa uma vaga de `capture_max_concurrent_opens`; webcams já
+em uso por capturas supervisionadas não são reabertas e são reportadas a partir
+do registro. Enquanto sondas travadas de uma atualização anterior não
+terminarem, novas atualizações são adiadas (o cache atual continua valendo).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Set
+
+import cv2
+
+from config import settings
+from services.capture_supervisor import capture_supervisor, open_video_capture
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceRegistry:
+    """Cache de dispositivos de webcam com sondagem paralela"""
+
+    def __init__(self):
+        self.devices: Dict[int, Dict] = {}
+        self.last_refresh = 0.0
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+        # Sondas que excederam o timeout e ainda seguram o driver
+        self._abandoned: Set[Future] = set()
+
+    def _probe(self, index: int, slot_deadline: float) -> Optional[Dict]:
+        """Sondar a webcam dentro de uma vaga de abertura de conexão"""
+        with capture_supervisor.open_slot(timeout=max(0.0, slot_deadline - time.monotonic())) as acquired:
+            # Sem vaga a tempo, ou reivindicada por uma captura enquanto aguardava: não abrir
+            if not acquired or index in capture_supervisor.get_claimed_webcams():
+                return None
+            return self._read_properties(index)
+
+    @staticmethod
+    def _read_properties(index: int) -> Optional[Dict]:
+        """Abrir a webcam, ler um frame e coletar propriedades"""
+        cap = open_video_capture(f"webcam://{index}")
+        try:
+            if cap is None or not cap.isOpened():
+                return None
+            ret, _ = cap.read()
+            if not ret:
+                return None
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            return {
+                "index": index,
+                "name": f"Câmera {index}",
+                "resolution": f"{width}x{height}",
+                "fps": cap.get(cv2.CAP_PROP_FPS),
+                "stream_url": f"webcam://{index}",
+            }
+        finally:
+            if cap is not None:
+                cap.release()
+
+    def _claimed_entry(self, index: int, captures: List) -> Dict:
+        """Entrada para webcam em uso, sem reabrir o dispositivo"""
+        entry = dict(self.devices.get(index) or {
+            "index": index,
+            "name": f"Câmera {index}",
+            "resolution": None,
+            "fps": None,
+            "stream_url": f"webcam://{index}",
+        })
+        for capture in captures:
+            if capture.last_frame is not None:
+                height, width = capture.last_frame.shape[:2]
+                entry["resolution"] = f"{width}x{height}"
+                break
+        entry["in_use"] = True
+        entry["claimed_by"] = [
+            {"camera_id": c.camera_id, "consumer": c.consumer, "state": c.state.value}
+            for c in captures
+        ]
+        return entry
+
+    def refresh(self) -> Dict[int, Dict]:
+        """Sondar todos os índices livres em paralelo e atualizar o cache"""
+        with self._refresh_lock:
+            self._abandoned = {future for future in self._abandoned if not future.done()}
+            if self._abandoned:
+                logger.warning(f"{len(self._abandoned)} sonda(s) de webcam anterior(es) ainda travada(s); "
+                               f"atualização adiada")
+                return dict(self.devices)
+            self._refreshing = True
+            try:
+                claimed = capture_supervisor.get_claimed_webcams()
+                indexes = [i for i in range(settings.webcam_max_index) if i not in claimed]
+                devices: Dict[int, Dict] = {}
+
+                executor = ThreadPoolExecutor(max_workers=max(1, len(indexes)),
+                                              thread_name_prefix="webcam-probe")
+                # Metade do prazo para conseguir vaga, metade para a sonda em si
+                slot_deadline = time.monotonic() + settings.webcam_probe_timeout
+                futures = {executor.submit(self._probe, i, slot_deadline): i for i in indexes}
+                done, not_done = wait(futures, timeout=2 * settings.webcam_probe_timeout)
+                # Sondas travadas são abandonadas; o driver libera o dispositivo ao terminar
+                executor.shutdown(wait=False)
+                self._abandoned = set(not_done)
+                if not_done:
+                    logger.warning(f"Sonda de webcam excedeu {2 * settings.webcam_probe_timeout}s "
+                                   f"para índices {sorted(futures[f] for f in not_done)}")
+
+                for future in done:
+                    try:
+                        device = future.result()
+                    except Exception as e:
+                        logger.debug(f"Erro ao sondar webcam {futures[future]}: {e}")
+                        continue
+                    if device:
+                        device["in_use"] = False
+                        devices[device["index"]] = device
+
+                for index, captures in claimed.items():
+                    devices[index] = self._claimed_entry(index, captures)
+
+                self.devices = devices
+                self.last_refresh = time.time()
+                return devices
+            finally:
+                self._refreshing = False
+
+    def _refresh_async(self):
+        if self._refreshing:
+            return
+        threading.Thread(target=self._safe_refresh, daemon=True).start()
+
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Erro ao atualizar registro de webcams: {e}", exc_info=True)
+
+    def is_stale(self) -> bool:
+        return time.time() - self.last_refresh > settings.webcam_registry_ttl
+
+    def get_devices(self, force_refresh: bool = False) -> List[Dict]:
+        """Listar webcams (cache; revalida em segundo plano quando expirado)"""
+        if force_refresh or not self.last_refresh:
+            devices = self.refresh()
+        else:
+            if self.is_stale():
+                self._refresh_async()
+            devices = dict(self.devices)
+            # Uso atual das webcams vem do supervisor, não do cache
+            claimed = capture_supervisor.get_claimed_webcams()
+            for index, device in list(devices.items()):
+                if device.get("in_use") and index not in claimed:
+                    devices[index] = {k: v for k, v in device.items() if k != "claimed_by"}
+                    devices[index]["in_use"] = False
+            for index, captures in claimed.items():
+                devices[index] = self._claimed_entry(index, captures)
+        return [devices[i] for i in sorted(devices)]
+
+    def get_device(self, index: int) -> Optional[Dict]:
+        """Obter webcam do registro sem sondar"""
+        claimed = capture_supervisor.get_claimed_webcams()
+        if index in claimed:
+            return self._claimed_entry(index, claimed[index])
+        return self.devices.get(index)
+
+
+# Instância global do registro
+device_registry = DeviceRegistry()
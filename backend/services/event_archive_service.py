@@ -0,0 +1,252 @@
+"""
+Arquivamento mensal de eventos
+
+A tabela events guarda só os meses recentes: meses inteiros anteriores a
+`event_archive_after_days` dias são gravados num arquivo .ndjson.gz (um evento
+por linha, com suas detecções) e removidos do banco em lotes de
+`event_archive_batch_size`. Consultas, listagens e exclusões passam a tocar só
+os dados quentes; contagens e gráficos dos meses arquivados continuam
+disponíveis na agregação horária (event_rollups), que não é descontada.
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models.event import Event
+from models.event_archive import ARCHIVE_DELETING, ARCHIVE_DONE, EventArchive
+from models.event_detection import EventDetection
+from services.job_manager import Job, JobStatus, job_manager
+from services.recent_events_cache import recent_events_cache
+
+logger = logging.getLogger(__name__)
+
+EVENT_COLUMNS = [column for column in Event.__table__.columns]
+DETECTION_COLUMNS = [column for column in EventDetection.__table__.columns if column.name not in ("id", "event_id")]
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value: datetime) -> datetime:
+    return (value.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _serialize(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class EventArchiveService:
+    """Arquivamento de meses antigos da tabela de eventos"""
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._job: Optional[Job] = None
+        self._lock = threading.Lock()
+
+    @property
+    def archive_dir(self) -> Path:
+        return Path(settings.event_archive_dir)
+
+    def cutoff(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Início do primeiro mês mantido no banco (None se o arquivamento está desativado)"""
+        if settings.event_archive_after_days <= 0:
+            return None
+        return month_start((now or datetime.now()) - timedelta(days=settings.event_archive_after_days))
+
+    @staticmethod
+    def archived_until(db: Session) -> Optional[datetime]:
+        """Fim do último mês arquivado: eventos anteriores só existem nos arquivos"""
+        value = db.query(func.max(EventArchive.month_end)).scalar()
+        return value.replace(tzinfo=None) if value else None
+
+    def pending_months(self, db: Session, cutoff: datetime) -> List[datetime]:
+        """Meses anteriores ao corte que ainda têm eventos no banco"""
+        months = []
+        oldest = db.query(func.min(Event.timestamp)).filter(Event.timestamp < cutoff).scalar()
+        current = month_start(oldest.replace(tzinfo=None)) if oldest else cutoff
+        while current < cutoff:
+            following = next_month(current)
+            # Uma consulta por mês resolvida pelo índice de timestamp
+            if db.query(Event.id).filter(Event.timestamp >= current, Event.timestamp < following).first():
+                months.append(current)
+            current = following
+        return months
+
+    def submit(self, owner: Optional[str] = None) -> Job:
+        """Executar o arquivamento como tarefa (reaproveita a tarefa em andamento)"""
+        with self._lock:
+            if self._job and self._job.status not in JobStatus.FINISHED:
+                return self._job
+            self._job = job_manager.submit("event_archive", self._run, params={
+                "after_days": settings.event_archive_after_days,
+            }, owner=owner)
+            return self._job
+
+    def _run(self, job: Job) -> Dict:
+        cutoff = self.cutoff()
+        if cutoff is None:
+            job.update(1.0, "Arquivamento desativado (EVENT_ARCHIVE_AFTER_DAYS=0)")
+            return {"archives": []}
+
+        db = SessionLocal()
+        try:
+            # Arquivos gravados cujos eventos não terminaram de ser removidos
+            for archive in db.query(EventArchive).filter(EventArchive.status == ARCHIVE_DELETING).all():
+                logger.info(f"Retomando remoção dos eventos arquivados em {archive.path}")
+                self._delete_archived(db, archive, job)
+
+            months = self.pending_months(db, cutoff)
+            created = []
+            for index, start in enumerate(months):
+                job.update(index / max(1, len(months)), f"Arquivando {start:%Y-%m} ({index + 1}/{len(months)})")
+                archive = self.archive_month(db, start, job)
+                if archive:
+                    created.append({"id": archive.id, "month": f"{start:%Y-%m}", "events": archive.event_count,
+                                    "size_bytes": archive.size_bytes})
+            job.update(1.0, f"{len(created)} mês(es) arquivado(s)")
+            return {"cutoff": cutoff.isoformat(), "archives": created}
+        finally:
+            db.close()
+
+    def archive_month(self, db: Session, start: datetime, job: Optional[Job] = None) -> Optional[EventArchive]:
+        """Gravar os eventos do mês em .ndjson.gz e removê-los do banco"""
+        end = next_month(start)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        path = self.archive_dir / f"events_{start:%Y_%m}_{int(time.time())}.ndjson.gz"
+        partial = path.with_name(path.name + ".partial")
+
+        events = detections = 0
+        try:
+            with gzip.open(partial, "wt", encoding="utf-8") as output:
+                for batch in self._iter_month(db, start, end):
+                    for line in batch:
+                        output.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+                        detections += len(line["detections"])
+                    events += len(batch)
+                    if job:
+                        job.update(job.progress, f"Arquivando {start:%Y-%m}: {events} evento(s) gravado(s)")
+            if not events:
+                partial.unlink()
+                return None
+            os.replace(partial, path)
+        except BaseException:
+            if partial.exists():
+                partial.unlink()
+            raise
+
+        archive = EventArchive(month_start=start, month_end=end, path=str(path), status=ARCHIVE_DELETING,
+                               event_count=events, detection_count=detections, size_bytes=path.stat().st_size)
+        db.add(archive)
+        db.commit()
+        logger.info(f"Mês {start:%Y-%m} arquivado: {events} eventos em {path} ({archive.size_bytes} bytes)")
+        self._delete_archived(db, archive, job)
+        return archive
+
+    def _iter_month(self, db: Session, start: datetime, end: datetime) -> Iterator[List[Dict]]:
+        """Eventos do mês em lotes (paginação por id), com as detecções de cada lote"""
+        last_id = 0
+        batch_size = max(1, settings.event_archive_batch_size)
+        while True:
+            rows = db.execute(
+                select(*EVENT_COLUMNS).where(
+                    Event.timestamp >= start, Event.timestamp < end, Event.id > last_id
+                ).order_by(Event.id).limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                return
+            ids = [row["id"] for row in rows]
+            by_event: Dict[int, List[Dict]] = {}
+            for detection in db.execute(
+                select(EventDetection.event_id, *DETECTION_COLUMNS).where(EventDetection.event_id.in_(ids))
+            ).mappings():
+                by_event.setdefault(detection["event_id"], []).append(
+                    {column.name: _serialize(detection[column.name]) for column in DETECTION_COLUMNS}
+                )
+            batch = []
+            for row in rows:
+                line = {column.name: _serialize(row[column.name]) for column in EVENT_COLUMNS}
+                line["detections"] = by_event.get(row["id"], [])
+                batch.append(line)
+            yield batch
+            last_id = ids[-1]
+
+    def _delete_archived(self, db: Session, archive: EventArchive, job: Optional[Job] = None):
+        """Remover do banco, em lotes, os eventos gravados no arquivo
+
+        Exclusão em massa (sem eventos de mapper): a agregação horária mantém
+        as contagens dos meses arquivados.
+        """
+        batch_size = max(1, settings.event_archive_batch_size)
+        deleted = 0
+        for ids in self._archived_ids(Path(archive.path), batch_size):
+            db.query(EventDetection).filter(EventDetection.event_id.in_(ids)).delete(synchronize_session=False)
+            deleted += db.query(Event).filter(Event.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            recent_events_cache.remove(ids)
+            if job:
+                job.update(job.progress, f"Removendo eventos arquivados: {deleted}/{archive.event_count}")
+        archive.status = ARCHIVE_DONE
+        archive.completed_at = datetime.now()
+        db.commit()
+
+    @staticmethod
+    def _archived_ids(path: Path, batch_size: int) -> Iterator[List[int]]:
+        ids: List[int] = []
+        with gzip.open(path, "rt", encoding="utf-8") as archive_file:
+            for line in archive_file:
+                ids.append(json.loads(line)["id"])
+                if len(ids) >= batch_size:
+                    yield ids
+                    ids = []
+        if ids:
+            yield ids
+
+    def list_archives(self, db: Session) -> List[EventArchive]:
+        return db.query(EventArchive).order_by(EventArchive.month_start.desc(), EventArchive.id.desc()).all()
+
+    def resolve_archive(self, db: Session, archive_id: int) -> Optional[Path]:
+        """Caminho do arquivo concluído (None se inexistente)"""
+        archive = db.query(EventArchive).filter(EventArchive.id == archive_id).first()
+        if not archive or archive.status != ARCHIVE_DONE:
+            return None
+        path = Path(archive.path)
+        return path if path.is_file() else None
+
+    def start(self):
+        """Arquivamento periódico em segundo plano (se habilitado)"""
+        if self._running or settings.event_archive_after_days <= 0:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._background_loop, name="event-archive", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+
+    def _background_loop(self):
+        while self._running:
+            try:
+                self.submit(owner="system")
+            except Exception as e:
+                logger.error(f"Erro ao agendar arquivamento de eventos: {e}")
+            slept = 0.0
+            while self._running and slept < settings.event_archive_interval_hours * 3600:
+                time.sleep(1.0)
+                slept += 1.0
+
+
+# Instância global do serviço
+event_archive_service = EventArchiveService()
@@ -0,0 +1,137 @@
+"""
+Serviço da agregação horária de eventos (tabela event_rollups)
+
+INSERT/DELETE de eventos pelo ORM atualizam a tabela automaticamente (ver
+models/event_rollup.py); aqui ficam a reconstrução a partir dos eventos, o
+ajuste de exclusões em massa e as consultas de séries para os gráficos.
+"""
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.event import Event, EventType
+from models.event_rollup import EventRollup, apply_rollup_delta, hour_bucket, rollup_key
+
+logger = logging.getLogger(__name__)
+
+INTERVALS = ("hour", "day")
+
+
+class EventRollupService:
+    """Manutenção e consultas da agregação horária de eventos"""
+
+    @staticmethod
+    def _aggregate(db: Session, *criteria) -> Counter:
+        """Contar eventos por (câmera, tipo, hora) lendo só as colunas da chave"""
+        counts: Counter = Counter()
+        query = db.query(Event.camera_id, Event.event_type, Event.timestamp).filter(*criteria)
+        for camera_id, event_type, timestamp in query.yield_per(10000):
+            if timestamp is not None:
+                counts[rollup_key(camera_id, event_type, timestamp)] += 1
+        return counts
+
+    @staticmethod
+    def subtract_events(db: Session, *criteria) -> int:
+        """Descontar da agregação os eventos que serão removidos com `query.delete()`
+
+        Deve ser chamado na mesma transação e antes da exclusão em massa, com os
+        mesmos filtros.
+        """
+        counts = EventRollupService._aggregate(db, *criteria)
+        connection = db.connection()
+        for key, count in counts.items():
+            apply_rollup_delta(connection, key, -count)
+        return sum(counts.values())
+
+    @staticmethod
+    def rebuild(db: Session, since: Optional[datetime] = None) -> Dict[str, int]:
+        """Reconstruir a tabela a partir dos eventos (backfill)
+
+        `since`: reconstruir só a partir desta hora, preservando as contagens
+        anteriores (meses arquivados, que não estão mais na tabela events).
+        """
+        if since is None:
+            counts = EventRollupService._aggregate(db)
+            db.query(EventRollup).delete()
+        else:
+            since = hour_bucket(since)
+            counts = EventRollupService._aggregate(db, Event.timestamp >= since)
+            db.query(EventRollup).filter(EventRollup.bucket >= since).delete()
+        rows = [
+            {"camera_id": camera_id, "event_type": event_type, "bucket": bucket, "count": count}
+            for (camera_id, event_type, bucket), count in counts.items()
+        ]
+        for start in range(0, len(rows), 5000):
+            db.execute(EventRollup.__table__.insert(), rows[start:start + 5000])
+        db.commit()
+        logger.info(f"Agregação horária reconstruída: {sum(counts.values())} eventos em {len(rows)} linhas")
+        return {"events": sum(counts.values()), "rows": len(rows)}
+
+    @staticmethod
+    def count_by_type(db: Session, since: datetime) -> Dict[str, int]:
+        """Contagem por tipo a partir de `since`
+
+        Horas completas vêm da agregação; só a fração da primeira hora (de
+        `since` até a próxima hora cheia) é contada nos eventos.
+        """
+        first_full_hour = hour_bucket(since)
+        if first_full_hour < since:
+            first_full_hour += timedelta(hours=1)
+
+        counts: Dict[str, int] = {}
+        rows = db.query(EventRollup.event_type, func.sum(EventRollup.count)).filter(
+            EventRollup.bucket >= first_full_hour
+        ).group_by(EventRollup.event_type).all()
+        for event_type, count in rows:
+            counts[event_type] = counts.get(event_type, 0) + int(count or 0)
+
+        if first_full_hour > since:
+            rows = db.query(Event.event_type, func.count(Event.id)).filter(
+                Event.timestamp >= since, Event.timestamp < first_full_hour
+            ).group_by(Event.event_type).all()
+            for event_type, count in rows:
+                counts[event_type] = counts.get(event_type, 0) + count
+        return counts
+
+    @staticmethod
+    def get_timeline(
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "hour",
+        camera_id: Optional[int] = None,
+        event_type: Optional[EventType] = None
+    ) -> List[Dict]:
+        """Série de contagens por hora ou dia, por tipo, incluindo intervalos vazios"""
+        query = db.query(EventRollup.bucket, EventRollup.event_type, func.sum(EventRollup.count)).filter(
+            EventRollup.bucket >= hour_bucket(start_date),
+            EventRollup.bucket <= end_date
+        )
+        if camera_id:
+            query = query.filter(EventRollup.camera_id == camera_id)
+        if event_type:
+            query = query.filter(EventRollup.event_type == event_type)
+
+        def slot(bucket: datetime) -> datetime:
+            bucket = bucket.replace(tzinfo=None)
+            return bucket.replace(hour=0) if interval == "day" else bucket
+
+        series: Dict[datetime, Dict[str, int]] = {}
+        step = timedelta(days=1) if interval == "day" else timedelta(hours=1)
+        current, last = slot(hour_bucket(start_date)), slot(hour_bucket(end_date))
+        while current <= last:
+            series[current] = {t.value: 0 for t in EventType}
+            current += step
+
+        for bucket, kind, count in query.group_by(EventRollup.bucket, EventRollup.event_type).all():
+            point = series.setdefault(slot(bucket), {t.value: 0 for t in EventType})
+            point[kind] = point.get(kind, 0) + int(count or 0)
+
+        return [
+            {"bucket": bucket, "total": sum(counts.values()), "counts": counts}
+            for bucket, counts in sorted(series.items())
+        ]
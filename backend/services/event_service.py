@@ -1,16 +1,36 @@
 """
 Serviço de gerenciamento de eventos
 """
+import base64
+import csv
+import io
+import json
 import os
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Tuple
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy.orm import Session, Query
+from sqlalchemy import func, desc, and_, or_, case, select
 from fastapi import HTTPException, status
 
 from models.event import Event, EventType
 from models.camera import Camera
+from models.event_detection import BBOX_SCALE, CLASS_IDS, GRID_SIZE, EventDetection, cell_ranges
+from models.event_rollup import EventRollup
 from schemas.event import EventCreate, EventUpdate, EventStats
+from services.event_rollup_service import EventRollupService
+from services.recent_events_cache import recent_events_cache
+from services.stats_cache import stats_cache
+from config import settings
+
+# Colunas de evento incluídas na exportação (além do nome da câmera)
+EXPORT_EVENT_COLUMNS = ('id', 'timestamp', 'event_type', 'description', 'confidence',
+                        'detected_objects', 'image_path', 'video_path')
+EXPORT_FIELDS = ['id', 'timestamp', 'camera_name', 'event_type', 'description', 'confidence',
+                 'detected_objects', 'image_path', 'video_path']
+# Tamanho aproximado (caracteres) de cada parte enviada ao cliente
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Períodos aceitos pelo heatmap (dias)
+HEATMAP_RANGES = {"1d": 1, "7d": 7, "30d": 30}
 
 
 class EventService:
@@ -41,6 +61,7 @@ class EventService:
         db.add(db_event)
         db.commit()
         db.refresh(db_event)
+        recent_events_cache.add(db_event)
         return db_event
 
     @staticmethod
@@ -49,17 +70,26 @@ class EventService:
         return db.query(Event).filter(Event.id == event_id).first()
 
     @staticmethod
-    def get_events(
-        db: Session, 
-        skip: int = 0, 
-        limit: int = 100,
+    def _filtered_query(
+        db: Session,
         camera_id: Optional[int] = None,
         event_type: Optional[EventType] = None,
         start_date: Optional[datetime] = None,
-        end_date: Optional[datetime] = None
-    ) -> List[Event]:
-        """Obter lista de eventos com filtros"""
+        end_date: Optional[datetime] = None,
+        object_class: Optional[str] = None
+    ) -> Query:
         query = db.query(Event)
+
+        if object_class:
+            # Subconsulta resolvida pelo índice (class_id, camera_id, timestamp) das detecções
+            detections = select(EventDetection.event_id).where(EventDetection.class_id == CLASS_IDS[object_class])
+            if camera_id:
+                detections = detections.where(EventDetection.camera_id == camera_id)
+            if start_date:
+                detections = detections.where(EventDetection.timestamp >= start_date)
+            if end_date:
+                detections = detections.where(EventDetection.timestamp <= end_date)
+            query = query.filter(Event.id.in_(detections))
         
         if camera_id:
             query = query.filter(Event.camera_id == camera_id)
@@ -72,9 +102,75 @@ class EventService:
         
         if end_date:
             query = query.filter(Event.timestamp <= end_date)
-        
+
+        return query
+
+    @staticmethod
+    def get_events(
+        db: Session, 
+        skip: int = 0, 
+        limit: int = 100,
+        camera_id: Optional[int] = None,
+        event_type: Optional[EventType] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        object_class: Optional[str] = None
+    ) -> List[Event]:
+        """Obter lista de eventos com filtros"""
+        query = EventService._filtered_query(db, camera_id, event_type, start_date, end_date, object_class)
         return query.order_by(desc(Event.timestamp)).offset(skip).limit(limit).all()
 
+    @staticmethod
+    def encode_cursor(event: Event) -> str:
+        """Cursor opaco com a posição (timestamp, id) do último evento da página"""
+        payload = json.dumps({"t": event.timestamp.isoformat(), "i": event.id}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        """Decodificar cursor; ValueError se inválido"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return datetime.fromisoformat(payload["t"]), int(payload["i"])
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError("Cursor inválido") from e
+
+    @staticmethod
+    def paginate(query: Query, limit: int, cursor: Optional[str] = None) -> Tuple[List[Event], Optional[str]]:
+        """Paginação por chave (timestamp, id) decrescente
+
+        Cada página continua a partir do último evento da anterior: o custo não
+        cresce com a profundidade e eventos novos não deslocam as páginas.
+        """
+        if cursor:
+            timestamp, event_id = EventService.decode_cursor(cursor)
+            query = query.filter(or_(
+                Event.timestamp < timestamp,
+                and_(Event.timestamp == timestamp, Event.id < event_id)
+            ))
+        # Um evento a mais indica se existe próxima página
+        events = query.order_by(desc(Event.timestamp), desc(Event.id)).limit(limit + 1).all()
+        if len(events) <= limit:
+            return events, None
+        events = events[:limit]
+        return events, EventService.encode_cursor(events[-1])
+
+    @staticmethod
+    def get_events_page(
+        db: Session,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        camera_id: Optional[int] = None,
+        event_type: Optional[EventType] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        object_class: Optional[str] = None
+    ) -> Tuple[List[Event], Optional[str]]:
+        """Obter página de eventos com filtros (paginação por cursor)"""
+        query = EventService._filtered_query(db, camera_id, event_type, start_date, end_date, object_class)
+        return EventService.paginate(query, limit, cursor)
+
     @staticmethod
     def update_event(db: Session, event_id: int, event_update: EventUpdate) -> Optional[Event]:
         """Atualizar evento"""
@@ -88,6 +184,7 @@ class EventService:
 
         db.commit()
         db.refresh(db_event)
+        recent_events_cache.update(db_event)
         return db_event
 
     @staticmethod
@@ -97,58 +194,21 @@ class EventService:
         if not db_event:
             return False
 
-        # Remover arquivos associados
-        if db_event.image_path and os.path.exists(db_event.image_path):
-            os.remove(db_event.image_path)
-        
-        if db_event.video_path and os.path.exists(db_event.video_path):
-            os.remove(db_event.video_path)
+        from services.retention_service import remove_files
 
+        paths = [db_event.image_path, db_event.video_path]
         db.delete(db_event)
         db.commit()
+        recent_events_cache.remove([event_id])
+        # Arquivos removidos após o commit (URL pública /uploads/... ou caminho salvo)
+        remove_files(paths)
         return True
 
     @staticmethod
     def get_event_stats(db: Session) -> EventStats:
         """Obter estatísticas de eventos com tolerância a dados vazios/inconsistentes"""
         try:
-            # Totais
-            total_events = db.query(Event).count()
-            today = datetime.now().date()
-            events_today = db.query(Event).filter(func.date(Event.timestamp) == today).count()
-            week_start = today - timedelta(days=today.weekday())
-            events_this_week = db.query(Event).filter(func.date(Event.timestamp) >= week_start).count()
-            month_start = today.replace(day=1)
-            events_this_month = db.query(Event).filter(func.date(Event.timestamp) >= month_start).count()
-
-            # Contagem por tipo (aceitar tanto enum quanto string)
-            intrusion_count = db.query(Event).filter(Event.event_type.in_([EventType.INTRUSION, "intrusion"])) .count()
-            movement_count = db.query(Event).filter(Event.event_type.in_([EventType.MOVEMENT, "movement"])) .count()
-            alert_count    = db.query(Event).filter(Event.event_type.in_([EventType.ALERT,    "alert"]))    .count()
-
-            # Câmera mais ativa
-            most_active_camera = db.query(
-                Camera.name,
-                func.count(Event.id).label('event_count')
-            ).join(Event, Event.camera_id == Camera.id).group_by(Camera.id).order_by(desc('event_count')).first()
-
-            # Hora de pico
-            peak_hour = db.query(
-                func.extract('hour', Event.timestamp).label('hour'),
-                func.count(Event.id).label('event_count')
-            ).group_by('hour').order_by(desc('event_count')).first()
-
-            return EventStats(
-                total_events=total_events,
-                events_today=events_today,
-                events_this_week=events_this_week,
-                events_this_month=events_this_month,
-                intrusion_count=intrusion_count,
-                movement_count=movement_count,
-                alert_count=alert_count,
-                most_active_camera=most_active_camera[0] if most_active_camera else None,
-                peak_hour=int(peak_hour[0]) if peak_hour else None
-            )
+            return stats_cache.get_or_compute("events:stats", lambda: EventService._compute_event_stats(db))
         except Exception:
             # Em caso de qualquer erro, devolve zeros para não quebrar o dashboard
             return EventStats(
@@ -163,6 +223,124 @@ class EventService:
                 peak_hour=None
             )
 
+    @staticmethod
+    def _compute_event_stats(db: Session) -> EventStats:
+        """Totais e contagens por tipo a partir da agregação horária
+
+        Os limites de dia/semana/mês caem em horas cheias, então somar as
+        linhas de event_rollups dá o mesmo resultado que contar os eventos.
+        """
+        today_start = datetime.combine(datetime.now().date(), datetime.min.time())
+        week_start = today_start - timedelta(days=today_start.weekday())
+        month_start = today_start.replace(day=1)
+
+        def count_where(condition):
+            return func.coalesce(func.sum(case((condition, EventRollup.count), else_=0)), 0)
+
+        totals = db.query(
+            func.coalesce(func.sum(EventRollup.count), 0),
+            count_where(EventRollup.bucket >= today_start),
+            count_where(EventRollup.bucket >= week_start),
+            count_where(EventRollup.bucket >= month_start),
+            count_where(EventRollup.event_type == EventType.INTRUSION.value),
+            count_where(EventRollup.event_type == EventType.MOVEMENT.value),
+            count_where(EventRollup.event_type == EventType.ALERT.value),
+        ).one()
+
+        # Câmera mais ativa
+        most_active_camera = db.query(
+            Camera.name,
+            func.sum(EventRollup.count).label('event_count')
+        ).join(EventRollup, EventRollup.camera_id == Camera.id).group_by(Camera.id, Camera.name).order_by(
+            desc('event_count')
+        ).first()
+
+        # Hora de pico
+        peak_hour = db.query(
+            func.extract('hour', EventRollup.bucket).label('hour'),
+            func.sum(EventRollup.count).label('event_count')
+        ).group_by('hour').order_by(desc('event_count')).first()
+
+        return EventStats(
+            total_events=int(totals[0]),
+            events_today=int(totals[1]),
+            events_this_week=int(totals[2]),
+            events_this_month=int(totals[3]),
+            intrusion_count=int(totals[4]),
+            movement_count=int(totals[5]),
+            alert_count=int(totals[6]),
+            most_active_camera=most_active_camera[0] if most_active_camera else None,
+            peak_hour=int(peak_hour[0]) if peak_hour and peak_hour[0] is not None else None
+        )
+
+    @staticmethod
+    def count_events_by_type(db: Session, since: datetime) -> Dict[str, int]:
+        """Contagem de eventos por tipo a partir de `since` (agregação horária)"""
+        return EventRollupService.count_by_type(db, since)
+
+    @staticmethod
+    def get_heatmap_data(
+        db: Session,
+        camera_id: int,
+        date_range: str = "7d",
+        object_class: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Heatmap 32x32 dos centros das detecções da câmera no período (1d, 7d, 30d)"""
+        from ai.heatmap_generator import HeatmapGenerator
+
+        days = HEATMAP_RANGES.get(date_range)
+        if days is None:
+            raise ValueError(f"Período inválido: {date_range}")
+        query = db.query(EventDetection.cell_id, func.sum(EventDetection.confidence)).filter(
+            EventDetection.camera_id == camera_id,
+            EventDetection.timestamp >= datetime.now() - timedelta(days=days)
+        )
+        if object_class:
+            query = query.filter(EventDetection.class_id == CLASS_IDS[object_class])
+
+        # Agregação por célula no banco: O(células) linhas em vez de uma por detecção
+        cells = query.group_by(EventDetection.cell_id).all()
+        generator = HeatmapGenerator((GRID_SIZE, GRID_SIZE))
+        generator.generate_from_cells([(cell_id, float(weight or 0)) for cell_id, weight in cells])
+        return {"camera_id": camera_id, "date_range": date_range, "data": generator.get_points(),
+                "resolution": f"{GRID_SIZE}x{GRID_SIZE}"}
+
+    @staticmethod
+    def get_events_in_region(
+        db: Session,
+        camera_id: int,
+        region: Tuple[float, float, float, float],
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        object_class: Optional[str] = None
+    ) -> Tuple[List[Event], Optional[str]]:
+        """Eventos com alguma detecção centrada no retângulo (x1, y1, x2, y2 em frações do frame)
+
+        O retângulo vira intervalos de células da grade (índice camera_id,
+        cell_id, timestamp); o centro exato só é conferido nas células da borda.
+        """
+        x1, y1, x2, y2 = (int(round(max(0.0, min(1.0, value)) * BBOX_SCALE)) for value in region)
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+
+        detections = select(EventDetection.event_id).where(
+            EventDetection.camera_id == camera_id,
+            or_(*[EventDetection.cell_id.between(first, last) for first, last in cell_ranges(x1, y1, x2, y2)]),
+            (EventDetection.x1 + EventDetection.x2).between(2 * x1, 2 * x2),
+            (EventDetection.y1 + EventDetection.y2).between(2 * y1, 2 * y2),
+        )
+        if start_date:
+            detections = detections.where(EventDetection.timestamp >= start_date)
+        if end_date:
+            detections = detections.where(EventDetection.timestamp <= end_date)
+        if object_class:
+            detections = detections.where(EventDetection.class_id == CLASS_IDS[object_class])
+
+        query = db.query(Event).filter(Event.id.in_(detections))
+        return EventService.paginate(query, limit, cursor)
+
     @staticmethod
     def get_events_by_camera(db: Session, camera_id: int, limit: int = 50) -> List[Event]:
         """Obter eventos por câmera"""
@@ -171,9 +349,9 @@ class EventService:
         ).order_by(desc(Event.timestamp)).limit(limit).all()
 
     @staticmethod
-    def get_recent_events(db: Session, limit: int = 10) -> List[Event]:
-        """Obter eventos recentes"""
-        return db.query(Event).order_by(desc(Event.timestamp)).limit(limit).all()
+    def get_recent_events(db: Session, limit: int = 10) -> List[Dict[str, Any]]:
+        """Obter eventos recentes (do cache em memória, já serializados)"""
+        return recent_events_cache.get(db, limit)
 
     @staticmethod
     def mark_event_as_notified(db: Session, event_id: int) -> bool:
@@ -184,6 +362,7 @@ class EventService:
 
         db_event.is_notified = True
         db.commit()
+        recent_events_cache.update(db_event)
         return True
 
     @staticmethod
@@ -194,44 +373,82 @@ class EventService:
         ).order_by(Event.timestamp).all()
 
     @staticmethod
-    def export_events(
+    def iter_export_rows(
         db: Session,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         camera_id: Optional[int] = None,
         event_type: Optional[EventType] = None
-    ) -> List[Dict[str, Any]]:
-        """Exportar eventos para relatório"""
-        query = db.query(Event).join(Camera)
-        
+    ) -> Iterator[Dict[str, Any]]:
+        """Eventos para relatório, lidos em lotes de um cursor do servidor
+
+        Só as colunas exportadas são selecionadas, com o nome da câmera no
+        mesmo JOIN; a memória usada não depende do número de eventos.
+        """
+        query = select(*[Event.__table__.c[name] for name in EXPORT_EVENT_COLUMNS],
+                       Camera.name.label('camera_name')).outerjoin(Camera, Camera.id == Event.camera_id)
+
         if start_date:
-            query = query.filter(Event.timestamp >= start_date)
-        
+            query = query.where(Event.timestamp >= start_date)
+
         if end_date:
-            query = query.filter(Event.timestamp <= end_date)
-        
+            query = query.where(Event.timestamp <= end_date)
+
         if camera_id:
-            query = query.filter(Event.camera_id == camera_id)
-        
+            query = query.where(Event.camera_id == camera_id)
+
         if event_type:
-            query = query.filter(Event.event_type == event_type)
-        
-        events = query.order_by(desc(Event.timestamp)).all()
-        
-        # Converter para formato de exportação
-        export_data = []
-        for event in events:
-            export_data.append({
-                'id': event.id,
-                'timestamp': event.timestamp.isoformat(),
-                'camera_name': event.camera.name,
-                'event_type': event.event_type,
-                'description': event.description,
-                'confidence': event.confidence,
-                'detected_objects': event.detected_objects,
-                'image_path': event.image_path,
-                'video_path': event.video_path
-            })
-        
-        return export_data
+            query = query.where(Event.event_type == event_type)
+
+        query = query.order_by(desc(Event.timestamp), desc(Event.id))
+        result = db.execute(query.execution_options(yield_per=settings.export_batch_size))
+        for row in result.mappings():
+            item = {name: row[name] for name in EXPORT_FIELDS}
+            item['timestamp'] = row['timestamp'].isoformat() if row['timestamp'] else None
+            yield item
+
+    @staticmethod
+    def export_events(
+        db: Session,
+        export_format: str = "json",
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        camera_id: Optional[int] = None,
+        event_type: Optional[EventType] = None
+    ) -> Iterator[str]:
+        """Exportar eventos para relatório em partes (json, ndjson ou csv)"""
+        rows = EventService.iter_export_rows(db, start_date, end_date, camera_id, event_type)
+
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+            for row in rows:
+                row['detected_objects'] = json.dumps(row['detected_objects']) if row['detected_objects'] else ''
+                writer.writerow(row)
+                if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+            return
 
+        # json: array completo, compatível com o formato anterior; ndjson: um evento por linha
+        ndjson = export_format == "ndjson"
+        parts: List[str] = [] if ndjson else ["["]
+        size, first = 0, True
+        for row in rows:
+            line = json.dumps(row, ensure_ascii=False, default=str)
+            if ndjson:
+                line += "\n"
+            elif not first:
+                line = "," + line
+            first = False
+            parts.append(line)
+            size += len(line)
+            if size >= EXPORT_CHUNK_SIZE:
+                yield "".join(parts)
+                parts, size = [], 0
+        if not ndjson:
+            parts.append("]")
+        yield "".join(parts)
@@ -0,0 +1,260 @@
+"""
+Serviço de HLS com múltiplas renditions para visualização remota
+
+Os frames do StreamService são enviados a um único processo ffmpeg por câmera,
+que gera as renditions (ex.: 360p/720p) em segmentos curtos com playlists
+rotativas no disco. A codificação só acontece enquanto algum cliente pediu uma
+playlist nos últimos `hls_idle_timeout` segundos; a captura aberta para o HLS é
+encerrada junto com o segmentador.
+"""
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import settings
+from services.stream_service import stream_service
+
+logger = logging.getLogger(__name__)
+
+MASTER_PLAYLIST = "master.m3u8"
+
+# Bitrate de vídeo sugerido por altura de rendition (kbps)
+RENDITION_BITRATES = {240: 400, 360: 800, 480: 1200, 720: 2500, 1080: 5000}
+
+
+class HLSSegmenter:
+    """Segmentador HLS de uma câmera (processo ffmpeg + thread de alimentação)"""
+
+    def __init__(self, camera_id: int, output_dir: str,
+                 on_exit: Optional[Callable[["HLSSegmenter"], None]] = None):
+        self.camera_id = camera_id
+        self.output_dir = output_dir
+        # Captura do StreamService aberta para este segmentador (encerrada ao sair)
+        self.owned_capture = None
+        self._on_exit = on_exit
+        self.fps = max(1, settings.hls_fps)
+        self.last_request = time.time()
+        self.running = False
+        self.renditions: List[int] = []
+        self._process: Optional[subprocess.Popen] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def touch(self):
+        """Registrar pedido de playlist por um cliente"""
+        self.last_request = time.time()
+
+    def is_idle(self) -> bool:
+        return time.time() - self.last_request > settings.hls_idle_timeout
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._feed_frames, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def _select_renditions(self, source_height: int) -> List[int]:
+        """Renditions configuradas que não excedem a resolução da fonte"""
+        heights = sorted({int(h) for h in settings.hls_renditions.split(",") if h.strip().isdigit()})
+        selected = [h for h in heights if h <= source_height]
+        return selected or [min(heights + [source_height])]
+
+    def _build_command(self, width: int, height: int) -> List[str]:
+        count = len(self.renditions)
+        gop = self.fps * settings.hls_segment_seconds
+        splits = "".join(f"[v{i}]" for i in range(count))
+        filters = [f"[0:v]split={count}{splits}"]
+        filters += [f"[v{i}]scale=-2:{h}[v{i}out]" for i, h in enumerate(self.renditions)]
+
+        command = [
+            settings.ffmpeg_path, "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}",
+            "-r", str(self.fps), "-i", "-",
+            "-filter_complex", ";".join(filters),
+        ]
+        for i, h in enumerate(self.renditions):
+            bitrate = RENDITION_BITRATES.get(h, max(300, int(h * 3.5)))
+            command += [
+                "-map", f"[v{i}out]",
+                f"-c:v:{i}", "libx264",
+                f"-b:v:{i}", f"{bitrate}k",
+                f"-maxrate:v:{i}", f"{int(bitrate * 1.2)}k",
+                f"-bufsize:v:{i}", f"{bitrate * 2}k",
+            ]
+
+        segment_ext = "m4s" if settings.hls_segment_type == "fmp4" else "ts"
+        command += [
+            "-preset", "veryfast", "-tune", "zerolatency", "-pix_fmt", "yuv420p",
+            "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+            "-f", "hls",
+            "-hls_time", str(settings.hls_segment_seconds),
+            "-hls_list_size", str(settings.hls_playlist_size),
+            "-hls_flags", "delete_segments+independent_segments",
+            "-hls_segment_type", settings.hls_segment_type,
+            "-master_pl_name", MASTER_PLAYLIST,
+            "-var_stream_map", " ".join(f"v:{i},name:{h}p" for i, h in enumerate(self.renditions)),
+            "-hls_segment_filename", os.path.join(self.output_dir, "%v", f"segment_%05d.{segment_ext}"),
+            os.path.join(self.output_dir, "%v", "index.m3u8"),
+        ]
+        return command
+
+    def _open_encoder(self, width: int, height: int):
+        self.renditions = self._select_renditions(height)
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+        for h in self.renditions:
+            os.makedirs(os.path.join(self.output_dir, f"{h}p"), exist_ok=True)
+        self._process = subprocess.Popen(
+            self._build_command(width, height),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        logger.info(f"Segmentador HLS iniciado para câmera {self.camera_id}: {width}x{height} -> "
+                    f"{', '.join(f'{h}p' for h in self.renditions)}")
+
+    def _close_encoder(self):
+        if self._process:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=5)
+            except Exception:
+                self._process.kill()
+            self._process = None
+
+    def _feed_frames(self):
+        """Enviar o frame mais recente ao ffmpeg em taxa constante"""
+        interval = 1.0 / self.fps
+        size: Optional[Tuple[int, int]] = None
+        try:
+            while self.running and not self.is_idle():
+                started = time.time()
+                _, frame = stream_service.get_latest_raw_frame(self.camera_id)
+                if frame is not None:
+                    height, width = frame.shape[:2]
+                    if size != (width, height):
+                        self._close_encoder()
+                        self._open_encoder(width, height)
+                        size = (width, height)
+                    # Repetir o último frame mantém a taxa constante para o encoder
+                    self._process.stdin.write(frame.tobytes())
+                time.sleep(max(0.0, interval - (time.time() - started)))
+        except (BrokenPipeError, OSError) as e:
+            logger.error(f"Processo ffmpeg encerrou para câmera {self.camera_id}: {e}")
+        except Exception as e:
+            logger.error(f"Erro no segmentador HLS da câmera {self.camera_id}: {e}", exc_info=True)
+        finally:
+            # Diretório próprio: um novo segmentador da câmera não é afetado pela limpeza
+            self.running = False
+            self._close_encoder()
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+            logger.info(f"Segmentador HLS finalizado para câmera {self.camera_id}")
+            if self._on_exit:
+                self._on_exit(self)
+
+
+class HLSService:
+    """Serviço para gerenciar segmentadores HLS sob demanda"""
+
+    def __init__(self):
+        self.segmenters: Dict[int, HLSSegmenter] = {}
+        self._lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        """Verificar se o ffmpeg está disponível"""
+        return shutil.which(settings.ffmpeg_path) is not None
+
+    def get_output_dir(self, camera_id: int) -> str:
+        """Diretório de um novo segmentador (um por instância, dentro do da câmera)"""
+        return os.path.join(settings.hls_dir, str(camera_id), uuid.uuid4().hex[:12])
+
+    def request_playlist(self, camera_id: int, start: bool = True, capture=None) -> Optional[HLSSegmenter]:
+        """Registrar pedido de playlist, iniciando o segmentador se necessário
+
+        `start=False` só mantém ativo um segmentador em execução (None se não
+        houver). `capture`: captura aberta para o HLS, encerrada com o segmentador.
+        """
+        with self._lock:
+            segmenter = self.segmenters.get(camera_id)
+            if segmenter is None or not segmenter.running:
+                if not start:
+                    return None
+                previous = segmenter
+                segmenter = HLSSegmenter(camera_id, self.get_output_dir(camera_id), on_exit=self._segmenter_finished)
+                # Segmentador anterior ainda encerrando: a captura dele passa para o novo
+                segmenter.owned_capture = capture or (previous.owned_capture if previous else None)
+                self.segmenters[camera_id] = segmenter
+                segmenter.start()
+            elif capture is not None and segmenter.owned_capture is None:
+                segmenter.owned_capture = capture
+            segmenter.touch()
+            return segmenter
+
+    def _segmenter_finished(self, segmenter: HLSSegmenter):
+        """Remover o segmentador encerrado e liberar a captura aberta para ele"""
+        camera_id = segmenter.camera_id
+        with self._lock:
+            current = self.segmenters.get(camera_id)
+            if current is segmenter:
+                del self.segmenters[camera_id]
+            elif current is not None:
+                # Substituído por um novo segmentador, que herdou a captura
+                return
+        capture = segmenter.owned_capture
+        if capture is None or stream_service.active_streams.get(camera_id) is not capture:
+            return
+        from services.webrtc_service import webrtc_service
+        if webrtc_service.get_peer_count(camera_id):
+            # Peers WebRTC ainda assistindo: a captura passa a ser encerrada pelo WebRTC
+            webrtc_service.adopt_capture(camera_id, capture)
+            return
+        logger.info(f"Encerrando captura aberta para o HLS da câmera {camera_id}")
+        stream_service.stop_stream(camera_id)
+
+    def adopt_capture(self, camera_id: int, capture) -> bool:
+        """Assumir captura aberta por outro consumidor se há segmentador ativo"""
+        with self._lock:
+            segmenter = self.segmenters.get(camera_id)
+            if segmenter is None or not segmenter.running:
+                return False
+            if segmenter.owned_capture is None:
+                segmenter.owned_capture = capture
+            return True
+
+    def resolve_file(self, camera_id: int, path: str) -> Optional[str]:
+        """Resolver caminho de playlist/segmento dentro do diretório do segmentador atual"""
+        segmenter = self.segmenters.get(camera_id)
+        if segmenter is None:
+            return None
+        base = os.path.realpath(segmenter.output_dir)
+        full_path = os.path.realpath(os.path.join(base, path))
+        if not full_path.startswith(base + os.sep):
+            return None
+        return full_path if os.path.isfile(full_path) else None
+
+    def is_active(self, camera_id: int) -> bool:
+        segmenter = self.segmenters.get(camera_id)
+        return bool(segmenter and segmenter.running)
+
+    def stop(self, camera_id: int):
+        """Parar segmentador de uma câmera"""
+        with self._lock:
+            segmenter = self.segmenters.pop(camera_id, None)
+        if segmenter:
+            segmenter.stop()
+
+    def shutdown(self):
+        """Parar todos os segmentadores"""
+        for camera_id in list(self.segmenters.keys()):
+            self.stop(camera_id)
+
+
+# Instância global do serviço
+hls_service = HLSService()
@@ -0,0 +1,207 @@
+"""
+Inferência YOLO em lote
+
+Requisições de inferência (monitores de câmera e clientes que enviam frames pela
+API) entram numa fila única; uma thread dedicada agrupa até
+`inference_batch_size` frames com o mesmo tamanho de entrada, aguardando no
+máximo `inference_batch_wait_ms` para completar o lote, e executa uma única
+chamada ao modelo. A confiança de cada requisição é aplicada na conversão do
+resultado, então frames com sensibilidades diferentes compartilham o lote.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Classes relevantes para vigilância
+RELEVANT_CLASSES = ('person', 'car', 'truck', 'bus', 'motorcycle', 'bicycle')
+
+
+class InferenceRequest:
+    """Frame aguardando inferência"""
+
+    def __init__(self, frame: np.ndarray, conf: float, imgsz: Optional[int]):
+        self.frame = frame
+        self.conf = conf
+        self.imgsz = imgsz
+        self.future: Future = Future()
+        self.enqueued_at = time.time()
+
+
+def objects_from_result(result, names: Dict[int, str], conf: float) -> List[Dict]:
+    """Converter resultado do YOLO em objetos relevantes com confiança >= conf"""
+    objects = []
+    boxes = result.boxes
+    if boxes is None:
+        return objects
+    for box in boxes:
+        confidence = float(box.conf[0].cpu().numpy())
+        if confidence < conf:
+            continue
+        class_id = int(box.cls[0].cpu().numpy())
+        class_name = names[class_id]
+        if class_name not in RELEVANT_CLASSES:
+            continue
+        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+        objects.append({
+            'bbox': [int(x1), int(y1), int(x2), int(y2)],
+            'confidence': confidence,
+            'class': class_name,
+            'class_id': class_id,
+            'center': [int((x1 + x2) / 2), int((y1 + y2) / 2)],
+            'area': int((x2 - x1) * (y2 - y1))
+        })
+    return objects
+
+
+class InferenceBatcher:
+    """Fila única de inferência com agrupamento em lotes"""
+
+    def __init__(self):
+        self.model = None
+        self._pending: Deque[InferenceRequest] = deque()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        # Estatísticas
+        self.batches = 0
+        self.frames = 0
+        self.max_batch = 0
+        self.avg_wait_ms = 0.0
+        self.avg_batch_ms = 0.0
+        self.errors = 0
+
+    def set_model(self, model):
+        self.model = model
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name="inference-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, frame: np.ndarray, conf: float, imgsz: Optional[int] = None) -> Future:
+        """Enfileirar frame; o Future recebe a lista de objetos detectados"""
+        if self.model is None:
+            raise RuntimeError("Modelo YOLO não carregado")
+        if not self._running:
+            self.start()
+        request = InferenceRequest(frame, conf, imgsz)
+        with self._condition:
+            self._pending.append(request)
+            self._condition.notify()
+        return request.future
+
+    def infer(self, frame: np.ndarray, conf: float, imgsz: Optional[int] = None) -> List[Dict]:
+        """Inferência bloqueante de um frame pelo caminho em lote"""
+        return self.submit(frame, conf, imgsz).result(timeout=settings.inference_timeout)
+
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def _take_batch(self) -> List[InferenceRequest]:
+        """Aguardar o primeiro frame e completar o lote até o limite de espera"""
+        with self._condition:
+            while self._running and not self._pending:
+                self._condition.wait(timeout=1.0)
+            if not self._running:
+                return []
+            deadline = self._pending[0].enqueued_at + settings.inference_batch_wait_ms / 1000.0
+            batch_size = max(1, settings.inference_batch_size)
+            while len(self._pending) < batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._condition.wait(timeout=remaining)
+
+            # Lote com o mesmo tamanho de entrada do primeiro frame da fila
+            imgsz = self._pending[0].imgsz
+            batch, remaining_requests = [], deque()
+            while self._pending:
+                request = self._pending.popleft()
+                if request.imgsz == imgsz and len(batch) < batch_size:
+                    batch.append(request)
+                else:
+                    remaining_requests.append(request)
+            self._pending = remaining_requests
+            backlog = len(self._pending)
+
+        # Fila além de um lote indica inferência saturada
+        from services.overload_controller import overload_controller
+        overload_controller.set_queue_depth(max(0, backlog - batch_size))
+        return batch
+
+    def _loop(self):
+        while self._running:
+            batch = self._take_batch()
+            if batch:
+                self._run_batch(batch)
+
+    def _run_batch(self, batch: List[InferenceRequest]):
+        started = time.time()
+        try:
+            model = self.model
+            if model is None:
+                raise RuntimeError("Modelo YOLO não carregado")
+            kwargs = {"conf": min(r.conf for r in batch), "verbose": False}
+            if batch[0].imgsz:
+                kwargs["imgsz"] = batch[0].imgsz
+            results = model([r.frame for r in batch], **kwargs)
+            for request, result in zip(batch, results):
+                request.future.set_result(objects_from_result(result, model.names, request.conf))
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Erro na inferência em lote ({len(batch)} frame(s)): {e}", exc_info=True)
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+        finished = time.time()
+        wait_ms = sum(started - r.enqueued_at for r in batch) / len(batch) * 1000
+        batch_ms = (finished - started) * 1000
+        alpha = 0.1 if self.batches else 1.0
+        self.avg_wait_ms += alpha * (wait_ms - self.avg_wait_ms)
+        self.avg_batch_ms += alpha * (batch_ms - self.avg_batch_ms)
+        self.batches += 1
+        self.frames += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+
+    def get_stats(self) -> Dict:
+        return {
+            "running": self._running,
+            "model_loaded": self.model is not None,
+            "queue_depth": self.queue_depth(),
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_batch_size": round(self.frames / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch,
+            "avg_wait_ms": round(self.avg_wait_ms, 2),
+            "avg_batch_ms": round(self.avg_batch_ms, 2),
+            "errors": self.errors,
+            "config": {
+                "batch_size": settings.inference_batch_size,
+                "batch_wait_ms": settings.inference_batch_wait_ms,
+            },
+        }
+
+    def shutdown(self):
+        with self._condition:
+            self._running = False
+            pending, self._pending = list(self._pending), deque()
+            self._condition.notify_all()
+        for request in pending:
+            request.future.cancel()
+
+
+# Instância global do serviço
+inference_batcher = InferenceBatcher()
@@ -0,0 +1,240 @@
+"""
+Gerenciador de tarefas em segundo plano
+
+Tarefas longas (análise de vídeo, operações em lote) rodam num pool de threads
+limitado e expõem status, progresso e resultado para consulta pela API. Tarefas
+de ciclo de vida dos monitores (início/reinício em lote) usam um pool próprio
+para não esperar atrás de análises, retenção ou arquivamento demorados.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from config import settings
+from websocket_manager import manager
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus:
+    """Status possíveis de uma tarefa"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+# Filas de execução: tarefas gerais e ciclo de vida dos monitores
+LANE_DEFAULT = "default"
+LANE_LIFECYCLE = "lifecycle"
+
+
+class JobCancelled(Exception):
+    """Levantada dentro da tarefa quando o cancelamento foi solicitado"""
+
+
+class Job:
+    """Tarefa em segundo plano com progresso"""
+
+    def __init__(self, kind: str, params: Optional[Dict] = None, owner: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.owner = owner
+        self.status = JobStatus.QUEUED
+        self.progress = 0.0
+        self.message: Optional[str] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = False
+        # Excluir do histórico ao terminar (exclusão pedida durante a execução)
+        self.discard_requested = False
+        # Chamada quando a tarefa sai do histórico (limpeza de arquivos gerados)
+        self.on_discard: Optional[Callable[["Job"], None]] = None
+        self._listeners: List[Callable[["Job"], None]] = []
+
+    def can_be_cancelled_by(self, user) -> bool:
+        """Dono da tarefa ou admin (tarefas do sistema, sem dono, só admin)"""
+        return user.role == "admin" or (self.owner is not None and self.owner == user.email)
+
+    def add_listener(self, listener: Callable[["Job"], None]):
+        """Registrar função chamada a cada atualização de progresso/status"""
+        self._listeners.append(listener)
+
+    def _notify(self):
+        for listener in self._listeners:
+            try:
+                listener(self)
+            except Exception as e:
+                logger.debug(f"Erro ao notificar progresso da tarefa {self.id}: {e}")
+
+    def update(self, progress: Optional[float] = None, message: Optional[str] = None):
+        """Atualizar progresso (0-1); levanta JobCancelled se o cancelamento foi pedido"""
+        if progress is not None:
+            self.progress = max(0.0, min(1.0, progress))
+        if message is not None:
+            self.message = message
+        self._notify()
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": round(self.progress, 4),
+            "message": self.message,
+            "params": self.params,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": round((self.finished_at or time.time()) - self.started_at, 2) if self.started_at else None,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+def broadcast_progress(job: Job):
+    """Listener que publica status/progresso da tarefa no WebSocket /ws"""
+    manager.broadcast_threadsafe({
+        "type": "system_notification",
+        "event": "job_progress",
+        "job": job.to_dict(),
+    })
+
+
+class JobManager:
+    """Pool limitado de tarefas com histórico das mais recentes"""
+
+    def __init__(self):
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._executors = {
+            LANE_DEFAULT: ThreadPoolExecutor(max_workers=max(1, settings.job_max_concurrent),
+                                             thread_name_prefix="job"),
+            LANE_LIFECYCLE: ThreadPoolExecutor(max_workers=max(1, settings.job_lifecycle_concurrent),
+                                               thread_name_prefix="job-lifecycle"),
+        }
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, func: Callable[[Job], Any], params: Optional[Dict] = None,
+               owner: Optional[str] = None, listener: Optional[Callable[[Job], None]] = None,
+               on_discard: Optional[Callable[[Job], None]] = None, lane: str = LANE_DEFAULT) -> Job:
+        """Enfileirar tarefa; `func(job)` devolve o resultado e pode chamar job.update()
+
+        `lane`: LANE_LIFECYCLE para tarefas curtas e prioritárias (pool próprio).
+
+        `on_discard(job)` é chamada quando a tarefa sai do histórico (excluída
+        ou descartada pelo limite `job_history_size`).
+        """
+        job = Job(kind, params, owner)
+        job.on_discard = on_discard
+        if listener:
+            job.add_listener(listener)
+        with self._lock:
+            self.jobs[job.id] = job
+            discarded = self._trim()
+        self._discard(discarded)
+        self._executors[lane].submit(self._run, job, func)
+        return job
+
+    def _run(self, job: Job, func: Callable[[Job], Any]):
+        try:
+            self._execute(job, func)
+        finally:
+            with self._lock:
+                discard = job.discard_requested and self.jobs.pop(job.id, None) is not None
+            if discard:
+                self._discard([job])
+
+    def _execute(self, job: Job, func: Callable[[Job], Any]):
+        if job.cancel_requested:
+            job.status = JobStatus.CANCELLED
+            job.finished_at = time.time()
+            job._notify()
+            return
+        job.status = JobStatus.RUNNING
+        job.started_at = time.time()
+        job._notify()
+        try:
+            job.result = func(job)
+            job.status = JobStatus.COMPLETED
+            job.progress = 1.0
+        except JobCancelled:
+            job.status = JobStatus.CANCELLED
+            logger.info(f"Tarefa {job.kind} {job.id} cancelada")
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+            logger.error(f"Tarefa {job.kind} {job.id} falhou: {e}", exc_info=True)
+        finally:
+            job.finished_at = time.time()
+            job._notify()
+
+    def _trim(self) -> List[Job]:
+        """Descartar tarefas finalizadas mais antigas além do limite do histórico"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in JobStatus.FINISHED]
+        excess = len(self.jobs) - settings.job_history_size
+        return [self.jobs.pop(job_id) for job_id in finished[:max(0, excess)]]
+
+    @staticmethod
+    def _discard(jobs: List[Job]):
+        """Chamar a limpeza das tarefas que saíram do histórico (fora do lock)"""
+        for job in jobs:
+            if job.on_discard:
+                try:
+                    job.on_discard(job)
+                except Exception as e:
+                    logger.warning(f"Erro ao limpar tarefa {job.kind} {job.id}: {e}")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def list(self, kind: Optional[str] = None) -> List[Job]:
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return [job for job in reversed(jobs) if kind is None or job.kind == kind]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Solicitar cancelamento (efetivo no próximo job.update())"""
+        job = self.jobs.get(job_id)
+        if job and job.status not in JobStatus.FINISHED:
+            job.cancel_requested = True
+        return job
+
+    def remove(self, job_id: str) -> Optional[Job]:
+        """Excluir tarefa do histórico; se ainda ativa, cancela e exclui ao terminar"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return None
+            if job.status not in JobStatus.FINISHED:
+                job.cancel_requested = True
+                job.discard_requested = True
+                return job
+            del self.jobs[job_id]
+        self._discard([job])
+        return job
+
+    def shutdown(self):
+        for job in list(self.jobs.values()):
+            if job.status not in JobStatus.FINISHED:
+                job.cancel_requested = True
+        for executor in self._executors.values():
+            executor.shutdown(wait=False)
+
+
+# Instância global do gerenciador
+job_manager = JobManager()
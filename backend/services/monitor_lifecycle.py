@@ -0,0 +1,124 @@
+"""
+Operações em lote no ciclo de vida dos monitores de câmera
+
+Parar um monitor pode aguardar até 5s pelo fim do frame em andamento; feito
+câmera a câmera dentro da requisição, reiniciar dezenas de câmeras leva
+minutos. Aqui cada operação em lote vira uma tarefa do gerenciador de tarefas:
+as câmeras são processadas em paralelo (até `lifecycle_concurrency`), com o
+resultado por câmera disponível durante a execução e publicado no WebSocket.
+"""
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from config import settings
+from database import SessionLocal
+from models.camera import Camera
+from services.detection_service import detection_service
+from services.job_manager import LANE_LIFECYCLE, Job, broadcast_progress, job_manager
+
+logger = logging.getLogger(__name__)
+
+ACTION_START = "start"
+ACTION_RESTART = "restart"
+
+
+class MonitorLifecycleService:
+    """Início/reinício concorrente de monitores como tarefas em segundo plano"""
+
+    def _load_targets(self, camera_ids: Optional[List[int]] = None) -> List[Dict]:
+        """Câmeras com detecção habilitada e URL configurada"""
+        db = SessionLocal()
+        try:
+            query = db.query(Camera).filter(Camera.detection_enabled == True)  # noqa: E712
+            if camera_ids is not None:
+                query = query.filter(Camera.id.in_(camera_ids))
+            return [
+                {"id": camera.id, "name": camera.name, "stream_url": camera.stream_url}
+                for camera in query.order_by(Camera.id).all()
+                if camera.stream_url
+            ]
+        finally:
+            db.close()
+
+    def submit_start_all(self, owner: Optional[str] = None) -> Job:
+        """Iniciar monitoramento de todas as câmeras habilitadas (inicialização da API)"""
+        return self._submit(ACTION_START, None, owner, user_email=None)
+
+    def submit_restart_all(self, owner: Optional[str] = None, user_email: Optional[str] = None) -> Job:
+        """Reiniciar monitoramento de todas as câmeras habilitadas"""
+        return self._submit(ACTION_RESTART, None, owner, user_email)
+
+    def _submit(self, action: str, camera_ids: Optional[List[int]], owner: Optional[str],
+                user_email: Optional[str]) -> Job:
+        return job_manager.submit(
+            f"monitor_{action}_all",
+            lambda job: self._run(job, action, camera_ids, user_email),
+            params={"action": action, "camera_ids": camera_ids},
+            owner=owner,
+            listener=broadcast_progress,
+            lane=LANE_LIFECYCLE,
+        )
+
+    def _apply(self, action: str, camera: Dict, user_email: Optional[str]):
+        if action == ACTION_RESTART:
+            detection_service.stop_monitoring(camera["id"])
+        detection_service.start_monitoring(camera["id"], camera["stream_url"], user_email)
+
+    def _run(self, job: Job, action: str, camera_ids: Optional[List[int]],
+             user_email: Optional[str]) -> Dict:
+        cameras = self._load_targets(camera_ids)
+        # Todas as chaves criadas antes de iniciar: durante a execução só os valores mudam
+        results: Dict[str, Dict] = {
+            str(camera["id"]): {"name": camera["name"], "status": "pending"} for camera in cameras
+        }
+        summary = {"action": action, "total": len(cameras), "succeeded": 0, "failed": 0, "cameras": results}
+        job.result = summary
+        if not cameras:
+            job.update(1.0, "Nenhuma câmera com detecção habilitada")
+            return summary
+
+        def apply(camera: Dict) -> float:
+            started = time.time()
+            results[str(camera["id"])] = {"name": camera["name"], "status": "running"}
+            self._apply(action, camera, user_email)
+            return time.time() - started
+
+        job.update(0.0, f"{len(cameras)} câmera(s) em processamento")
+        workers = max(1, min(settings.lifecycle_concurrency, len(cameras)))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lifecycle")
+        futures = {executor.submit(apply, camera): camera for camera in cameras}
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    camera = futures[future]
+                    try:
+                        duration = future.result()
+                        results[str(camera["id"])] = {"name": camera["name"], "status": "ok",
+                                                      "duration": round(duration, 2)}
+                        summary["succeeded"] += 1
+                    except Exception as e:
+                        logger.error(f"Falha na operação '{action}' da câmera {camera['id']}: {e}")
+                        results[str(camera["id"])] = {"name": camera["name"], "status": "failed",
+                                                      "error": str(e)}
+                        summary["failed"] += 1
+                finished = summary["succeeded"] + summary["failed"]
+                if done:
+                    job.update(finished / len(cameras), f"{finished}/{len(cameras)} câmera(s) concluída(s)")
+        finally:
+            # Cancelamento: câmeras ainda não iniciadas são descartadas
+            executor.shutdown(wait=False, cancel_futures=True)
+            for future in pending:
+                if future.cancelled():
+                    camera = futures[future]
+                    results[str(camera["id"])] = {"name": camera["name"], "status": "cancelled"}
+
+        logger.info(f"Operação '{action}' concluída: {summary['succeeded']} ok, {summary['failed']} falha(s)")
+        return summary
+
+
+# Instância global do serviço
+monitor_lifecycle = MonitorLifecycleService()
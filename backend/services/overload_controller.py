@@ -0,0 +1,212 @@
+"""
+Controle de sobrecarga da inferência
+
+Acompanha a profundidade da fila (tarefas atrasadas no escalonador mais a fila
+de inferência, quando houver) e a latência por frame. Sob saturação, degrada as
+câmeras de menor prioridade, uma por vez e um nível por vez: entrada reduzida
+do YOLO, depois só movimento, depois taxa reduzida. Quando a carga fica baixa
+por um período contínuo, os níveis são restaurados na ordem inversa. Cada
+transição é registrada em métricas e notificada via WebSocket.
+"""
+import enum
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Optional
+
+from config import settings
+from services.analysis_budget import analysis_budget
+from services.camera_scheduler import ScheduledTask, camera_scheduler
+from websocket_manager import manager
+
+logger = logging.getLogger(__name__)
+
+# Fator de suavização da latência por frame
+EWMA_ALPHA = 0.2
+
+
+class DegradationLevel(int, enum.Enum):
+    """Níveis de degradação, do normal ao mais agressivo"""
+    NORMAL = 0
+    REDUCED_INPUT = 1  # YOLO com imagem de entrada menor
+    MOTION_ONLY = 2    # sem YOLO, apenas detecção de movimento
+    REDUCED_RATE = 3   # movimento com taxa de análise reduzida
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+
+class OverloadController:
+    """Controlador de degradação por câmera sob saturação da inferência"""
+
+    def __init__(self):
+        self.levels: Dict[int, DegradationLevel] = {}
+        self.latency: Dict[int, float] = {}
+        self.external_queue_depth = 0
+        self.overloaded = False
+        self.calm_since: Optional[float] = None
+        self.transitions: Deque[Dict] = deque(maxlen=100)
+        self.transition_count = 0
+        self._lock = threading.Lock()
+        self._task: Optional[ScheduledTask] = None
+
+    def start(self):
+        """Agendar avaliação periódica no escalonador de câmeras"""
+        if self._task is not None and self._task.is_alive():
+            return
+        self._task = camera_scheduler.submit("overload-controller", self._evaluate_step)
+
+    def stop(self):
+        if self._task is not None:
+            camera_scheduler.cancel(self._task)
+            self._task = None
+
+    def register(self, camera_id: int):
+        with self._lock:
+            self.levels.setdefault(camera_id, DegradationLevel.NORMAL)
+
+    def unregister(self, camera_id: int):
+        with self._lock:
+            self.levels.pop(camera_id, None)
+            self.latency.pop(camera_id, None)
+
+    def get_level(self, camera_id: int) -> DegradationLevel:
+        return self.levels.get(camera_id, DegradationLevel.NORMAL)
+
+    def record_latency(self, camera_id: int, seconds: float):
+        """Registrar latência de um frame (leitura até fim da análise)"""
+        previous = self.latency.get(camera_id)
+        self.latency[camera_id] = seconds if previous is None else previous + EWMA_ALPHA * (seconds - previous)
+
+    def set_queue_depth(self, depth: int):
+        """Profundidade da fila de inferência externa (ex.: batcher)"""
+        self.external_queue_depth = depth
+
+    def _signals(self) -> Dict:
+        stats = camera_scheduler.get_stats()
+        latencies = list(self.latency.values())
+        return {
+            "queue_depth": stats["overdue_tasks"] + self.external_queue_depth,
+            "latency_ms": (max(latencies) * 1000) if latencies else 0.0,
+        }
+
+    def _evaluate_step(self) -> float:
+        try:
+            self.evaluate()
+        except Exception as e:
+            logger.error(f"Erro no controle de sobrecarga: {e}", exc_info=True)
+        return settings.overload_eval_interval
+
+    def evaluate(self):
+        """Avaliar sinais e aplicar no máximo uma transição"""
+        signals = self._signals()
+        now = time.time()
+        high = (signals["queue_depth"] >= settings.overload_queue_high
+                or signals["latency_ms"] >= settings.overload_latency_high_ms)
+        low = (signals["queue_depth"] <= settings.overload_queue_low
+               and signals["latency_ms"] <= settings.overload_latency_low_ms)
+
+        if high:
+            self.overloaded = True
+            self.calm_since = None
+            self._degrade_one(signals)
+        elif low:
+            if self.calm_since is None:
+                self.calm_since = now
+            # Histerese: só recuperar após carga baixa contínua
+            if now - self.calm_since >= settings.overload_recovery_seconds:
+                if not self._recover_one(signals):
+                    self.overloaded = False
+                self.calm_since = now
+        else:
+            self.calm_since = None
+
+    def _priority(self, camera_id: int) -> float:
+        report = analysis_budget.cameras.get(camera_id)
+        return report.weight(time.time()) if report else 1.0
+
+    def _degrade_one(self, signals: Dict):
+        with self._lock:
+            candidates = [(level, self._priority(cid), cid) for cid, level in self.levels.items()
+                          if level < DegradationLevel.REDUCED_RATE]
+        if not candidates:
+            return
+        # Menor nível primeiro (degradação em largura), menor prioridade antes
+        level, _, camera_id = min(candidates)
+        self._set_level(camera_id, DegradationLevel(level + 1), "overload", signals)
+
+    def _recover_one(self, signals: Dict) -> bool:
+        with self._lock:
+            candidates = [(level, self._priority(cid), cid) for cid, level in self.levels.items()
+                          if level > DegradationLevel.NORMAL]
+        if not candidates:
+            return False
+        # Maior nível primeiro, maior prioridade antes
+        level, _, camera_id = max(candidates)
+        self._set_level(camera_id, DegradationLevel(level - 1), "recovered", signals)
+        return True
+
+    def _set_level(self, camera_id: int, new_level: DegradationLevel, reason: str, signals: Dict):
+        with self._lock:
+            if camera_id not in self.levels:
+                return
+            previous = self.levels[camera_id]
+            self.levels[camera_id] = new_level
+
+        rate_factor = settings.overload_rate_factor if new_level >= DegradationLevel.REDUCED_RATE else 1.0
+        analysis_budget.set_rate_factor(camera_id, rate_factor)
+
+        transition = {
+            "camera_id": camera_id,
+            "from": previous.label,
+            "to": new_level.label,
+            "reason": reason,
+            "queue_depth": signals["queue_depth"],
+            "latency_ms": round(signals["latency_ms"], 1),
+            "timestamp": datetime.now().isoformat(),
+        }
+        self.transitions.append(transition)
+        self.transition_count += 1
+        logger.warning(f"Câmera {camera_id}: degradação {previous.label} -> {new_level.label} ({reason}, "
+                       f"fila={signals['queue_depth']}, latência={signals['latency_ms']:.0f}ms)")
+        manager.broadcast_threadsafe({
+            "type": "system_notification",
+            "event": "degradation_changed",
+            **transition,
+        })
+
+    def get_status(self) -> Dict:
+        signals = self._signals()
+        with self._lock:
+            levels = dict(self.levels)
+        counts: Dict[str, int] = {level.label: 0 for level in DegradationLevel}
+        for level in levels.values():
+            counts[level.label] += 1
+        return {
+            "overloaded": self.overloaded,
+            "queue_depth": signals["queue_depth"],
+            "latency_ms": round(signals["latency_ms"], 1),
+            "thresholds": {
+                "queue_high": settings.overload_queue_high,
+                "queue_low": settings.overload_queue_low,
+                "latency_high_ms": settings.overload_latency_high_ms,
+                "latency_low_ms": settings.overload_latency_low_ms,
+            },
+            "levels": counts,
+            "cameras": {
+                camera_id: {
+                    "level": level.label,
+                    "latency_ms": round(self.latency.get(camera_id, 0.0) * 1000, 1),
+                }
+                for camera_id, level in levels.items()
+            },
+            "transition_count": self.transition_count,
+            "recent_transitions": list(self.transitions)[-20:],
+        }
+
+
+# Instância global do controlador
+overload_controller = OverloadController()
@@ -0,0 +1,200 @@
+"""
+Cache em memória dos eventos mais recentes
+
+Dashboard e telas de monitoramento consultam os mesmos poucos eventos mais
+novos a cada poucos segundos, em cada cliente. O cache mantém os
+`recent_events_cache_size` eventos mais recentes (já serializados) no total e
+por câmera, alimentado por quem grava eventos e aquecido do banco na
+inicialização; leituras que cabem no cache não tocam o banco.
+
+Cada lista guarda exatamente os N primeiros eventos por (timestamp, id)
+decrescente: inserções mais antigas que o último item de uma lista cheia são
+ignoradas, exclusões só encurtam a lista e uma leitura maior que o conteúdo
+recarrega a lista do banco. Atualizações e exclusões chamam `update`/`remove`;
+exclusões em massa chamam `remove` com os ids ou `drop_camera`.
+"""
+import bisect
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.event import Event
+from schemas.event import Event as EventSchema
+
+logger = logging.getLogger(__name__)
+
+# Chave de ordenação: (-timestamp, -id) para manter a lista crescente no bisect
+SortKey = Tuple[int, int]
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _sort_key(timestamp: datetime, event_id: int) -> SortKey:
+    return -((timestamp.replace(tzinfo=None) - datetime.min) // MICROSECOND), -event_id
+
+
+class _RecentList:
+    """Eventos mais recentes de um escopo (global ou uma câmera), do mais novo ao mais antigo"""
+
+    def __init__(self):
+        self.keys: List[SortKey] = []
+        self.items: List[Dict] = []
+        self.loaded = False
+        # True se o banco não tem eventos além dos da lista
+        self.exhausted = False
+
+    def load(self, events: List[Event], size: int):
+        self.keys = [_sort_key(event.timestamp, event.id) for event in events]
+        self.items = [serialize_event(event) for event in events]
+        self.loaded = True
+        self.exhausted = len(events) < size
+
+    def insert(self, key: SortKey, item: Dict, size: int):
+        if not self.loaded:
+            return
+        if self.keys and key > self.keys[-1] and not self.exhausted:
+            # Mais antigo que o último: pode haver eventos do banco entre eles
+            return
+        index = bisect.bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.items.insert(index, item)
+        if len(self.items) > size:
+            self.keys.pop()
+            self.items.pop()
+            self.exhausted = False
+
+    def discard(self, event_ids) -> bool:
+        indexes = [index for index, item in enumerate(self.items) if item["id"] in event_ids]
+        for index in reversed(indexes):
+            del self.keys[index]
+            del self.items[index]
+        return bool(indexes)
+
+
+def serialize_event(event: Event) -> Dict:
+    """Evento no formato da resposta da API (schema Event, valores JSON)"""
+    return EventSchema.model_validate(event).model_dump(mode="json")
+
+
+class RecentEventsCache:
+    """Listas dos eventos mais recentes, global e por câmera"""
+
+    def __init__(self):
+        self._global = _RecentList()
+        self._cameras: Dict[int, _RecentList] = {}
+        self._lock = threading.Lock()
+        # Incrementada a cada escrita: recargas concorrentes com escritas são descartadas
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size(self) -> int:
+        return max(1, settings.recent_events_cache_size)
+
+    def _list(self, camera_id: Optional[int]) -> _RecentList:
+        if camera_id is None:
+            return self._global
+        return self._cameras.setdefault(camera_id, _RecentList())
+
+    def warm(self, db: Session):
+        """Carregar do banco a lista global e a de cada câmera com eventos"""
+        from models.camera import Camera
+
+        self._reload(db, None)
+        for camera_id, in db.query(Camera.id):
+            self._reload(db, camera_id)
+        logger.info(f"Cache de eventos recentes aquecido: {len(self._global.items)} evento(s), "
+                    f"{len(self._cameras)} câmera(s)")
+
+    def get(self, db: Session, limit: int, camera_id: Optional[int] = None) -> List[Dict]:
+        """Os `limit` eventos mais recentes (serializados), do mais novo ao mais antigo"""
+        if limit > self.size:
+            # Maior que o cache: consulta direta
+            self.misses += 1
+            return [serialize_event(event) for event in self._query(db, limit, camera_id)]
+        with self._lock:
+            recent = self._list(camera_id)
+            if recent.loaded and (len(recent.items) >= limit or recent.exhausted):
+                self.hits += 1
+                return recent.items[:limit]
+        self.misses += 1
+        return self._reload(db, camera_id)[:limit]
+
+    @staticmethod
+    def _query(db: Session, limit: int, camera_id: Optional[int]) -> List[Event]:
+        query = db.query(Event)
+        if camera_id is not None:
+            query = query.filter(Event.camera_id == camera_id)
+        return query.order_by(desc(Event.timestamp), desc(Event.id)).limit(limit).all()
+
+    def _reload(self, db: Session, camera_id: Optional[int]) -> List[Dict]:
+        version = self._version
+        events = self._query(db, self.size, camera_id)
+        with self._lock:
+            recent = self._list(camera_id)
+            if version == self._version:
+                recent.load(events, self.size)
+                return recent.items
+        # Houve escrita durante a consulta: usar o resultado sem instalá-lo
+        return [serialize_event(event) for event in events]
+
+    def add(self, event: Event):
+        """Registrar evento recém-gravado (após o commit)"""
+        try:
+            key, item = _sort_key(event.timestamp, event.id), serialize_event(event)
+        except Exception as e:
+            logger.warning(f"Erro ao serializar evento {event.id} para o cache de recentes: {e}")
+            self.invalidate()
+            return
+        with self._lock:
+            self._version += 1
+            self._global.insert(key, item, self.size)
+            if event.camera_id is not None:
+                self._list(event.camera_id).insert(key, item, self.size)
+
+    def update(self, event: Event):
+        """Substituir evento alterado (se estiver no cache)"""
+        with self._lock:
+            self._version += 1
+            removed = self._global.discard({event.id})
+            camera_removed = event.camera_id is not None and self._list(event.camera_id).discard({event.id})
+        if removed or camera_removed:
+            self.add(event)
+
+    def remove(self, event_ids: Iterable[int]):
+        """Retirar eventos excluídos"""
+        event_ids = set(event_ids)
+        if not event_ids:
+            return
+        with self._lock:
+            self._version += 1
+            for recent in [self._global, *self._cameras.values()]:
+                recent.discard(event_ids)
+
+    def drop_camera(self, camera_id: int):
+        """Retirar todos os eventos de uma câmera excluída"""
+        with self._lock:
+            self._version += 1
+            self._cameras.pop(camera_id, None)
+            ids = {item["id"] for item in self._global.items if item["camera_id"] == camera_id}
+            self._global.discard(ids)
+
+    def invalidate(self):
+        """Descartar tudo (próximas leituras recarregam do banco)"""
+        with self._lock:
+            self._version += 1
+            self._global = _RecentList()
+            self._cameras.clear()
+
+    def get_stats(self) -> Dict:
+        return {"size": self.size, "events": len(self._global.items), "cameras": len(self._cameras),
+                "hits": self.hits, "misses": self.misses}
+
+
+# Instância global do cache
+recent_events_cache = RecentEventsCache()
@@ -0,0 +1,472 @@
+"""
+Retenção de eventos e coleta de screenshots órfãos
+
+Cada câmera pode limitar a idade (`retention_days`) e o espaço em disco
+(`retention_max_mb`) dos seus eventos; câmeras sem política própria usam
+`retention_default_days`/`retention_default_max_mb` (0 = sem limite). Uma
+passada periódica remove os eventos mais antigos em lotes de
+`retention_batch_size` (uma transação curta por lote, arquivos apagados depois
+do commit), aplica os mesmos limites aos arquivos dos meses arquivados e apaga
+screenshots que não pertencem a nenhum evento. Exclusões em massa pela API e os
+arquivos de câmeras removidas usam o mesmo caminho, como tarefas do job_manager.
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models.camera import Camera
+from models.event import Event, EventType
+from models.event_archive import ARCHIVE_DONE, EventArchive
+from models.event_detection import EventDetection
+from services.event_archive_service import EventArchiveService
+from services.event_rollup_service import EventRollupService
+from services.event_service import EventService
+from services.job_manager import Job, JobStatus, job_manager
+from services.recent_events_cache import recent_events_cache
+from services.stats_cache import stats_cache
+from services.video_analysis_service import video_analysis_service
+
+logger = logging.getLogger(__name__)
+
+SCREENSHOT_URL_PREFIX = "/uploads/screenshots/"
+# Eventos antigos sem tamanho registrado medidos por lote na passada de espaço
+FILE_BYTES_BACKFILL_BATCH = 1000
+# Nomes de screenshots por consulta de referência (um LIKE por nome e coluna)
+REFERENCE_QUERY_CHUNK = 100
+
+
+def resolve_upload_path(path: Optional[str]) -> Optional[str]:
+    """Caminho em disco de um arquivo de evento (URL pública /uploads/... ou caminho salvo)"""
+    if not path:
+        return None
+    if path.startswith("/uploads/"):
+        rel_path = path[len("/uploads/"):]
+        # Normalizar separadores de caminho para Windows
+        if os.path.sep != '/':
+            rel_path = rel_path.replace('/', os.path.sep)
+        return os.path.join(settings.upload_dir, rel_path)
+    if not os.path.isabs(path) and not os.path.exists(path):
+        # Caminho relativo sem /uploads/
+        return os.path.join(settings.upload_dir, path)
+    return path
+
+
+def remove_files(paths: Iterable[Optional[str]]) -> Tuple[int, int]:
+    """Remover arquivos de eventos, tolerando ausentes; devolve (removidos, bytes)"""
+    removed = freed = 0
+    for path in paths:
+        disk_path = resolve_upload_path(path)
+        if not disk_path:
+            continue
+        try:
+            size = os.path.getsize(disk_path)
+            os.remove(disk_path)
+            removed += 1
+            freed += size
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Erro ao remover arquivo de evento {disk_path}: {e}")
+    return removed, freed
+
+
+def file_size(*paths: Optional[str]) -> int:
+    """Soma do tamanho em disco dos arquivos existentes"""
+    total = 0
+    for path in paths:
+        disk_path = resolve_upload_path(path)
+        if disk_path:
+            try:
+                total += os.path.getsize(disk_path)
+            except OSError:
+                pass
+    return total
+
+
+class RetentionService:
+    """Políticas de retenção por câmera, exclusão em lotes e coleta de arquivos órfãos"""
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._job: Optional[Job] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def effective_policy(camera: Camera) -> Dict[str, int]:
+        """Limites aplicados à câmera (política própria ou padrão global; 0 = sem limite)"""
+        days = camera.retention_days if camera.retention_days is not None else settings.retention_default_days
+        max_mb = camera.retention_max_mb if camera.retention_max_mb is not None else settings.retention_default_max_mb
+        return {"days": max(0, days), "max_mb": max(0, max_mb)}
+
+    @staticmethod
+    def usage(db: Session, camera_id: int) -> Dict[str, int]:
+        """Eventos e bytes registrados da câmera (eventos sem tamanho medido contam 0)"""
+        events, total = db.query(func.count(Event.id), func.coalesce(func.sum(Event.file_bytes), 0)).filter(
+            Event.camera_id == camera_id
+        ).one()
+        return {"events": events, "bytes": int(total or 0)}
+
+    @staticmethod
+    def delete_events(db: Session, ids: List[int]) -> Dict[str, int]:
+        """Remover um lote de eventos (uma transação) e depois seus arquivos
+
+        Arquivos são apagados após o commit: se o processo cair no meio, sobram
+        no máximo arquivos sem evento, que a coleta de órfãos remove.
+        """
+        if not ids:
+            return {"events": 0, "files": 0, "bytes": 0}
+        paths = [
+            path
+            for image_path, video_path in db.query(Event.image_path, Event.video_path).filter(Event.id.in_(ids))
+            for path in (image_path, video_path) if path
+        ]
+        # Exclusão em massa não passa pelo ORM: agregação e detecções ajustadas aqui
+        EventRollupService.subtract_events(db, Event.id.in_(ids))
+        db.query(EventDetection).filter(EventDetection.event_id.in_(ids)).delete(synchronize_session=False)
+        deleted = db.query(Event).filter(Event.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        recent_events_cache.remove(ids)
+        files, freed = remove_files(paths)
+        stats_cache.invalidate("events:")
+        return {"events": deleted, "files": files, "bytes": freed}
+
+    def submit(self, owner: Optional[str] = None) -> Job:
+        """Executar a passada de retenção como tarefa (reaproveita a tarefa em andamento)"""
+        with self._lock:
+            if self._job and self._job.status not in JobStatus.FINISHED:
+                return self._job
+            self._job = job_manager.submit("retention", self._run, params={
+                "default_days": settings.retention_default_days,
+                "default_max_mb": settings.retention_default_max_mb,
+            }, owner=owner)
+            return self._job
+
+    def _run(self, job: Job) -> Dict:
+        db = SessionLocal()
+        try:
+            cameras = db.query(Camera).order_by(Camera.id).all()
+            policies = {camera.id: self.effective_policy(camera) for camera in cameras}
+            result = {"events": 0, "files": 0, "bytes": 0, "cameras": []}
+
+            job.update(0.0, "Aplicando a retenção aos meses arquivados")
+            result["archived"], archived_bytes = self._prune_archived_files(db, policies, job)
+            self._add(result, {"events": 0, **result["archived"]})
+
+            for index, camera in enumerate(cameras):
+                job.update(index / max(1, len(cameras) + 1),
+                           f"Retenção da câmera {camera.name} ({index + 1}/{len(cameras)})")
+                policy = policies[camera.id]
+                removed = {"events": 0, "files": 0, "bytes": 0}
+                if policy["days"]:
+                    self._add(removed, self._age_pass(db, camera.id, policy["days"], job))
+                if policy["max_mb"]:
+                    self._add(removed, self._size_pass(db, camera.id, policy["max_mb"] * 1024 * 1024, job,
+                                                       archived_bytes.get(camera.id, 0)))
+                if removed["events"]:
+                    logger.info(f"Retenção da câmera {camera.id}: {removed['events']} evento(s) e "
+                                f"{removed['files']} arquivo(s) removidos ({removed['bytes']} bytes)")
+                    result["cameras"].append({"camera_id": camera.id, **removed})
+                self._add(result, removed)
+
+            job.update(len(cameras) / max(1, len(cameras) + 1), "Removendo screenshots sem evento")
+            result["orphans"] = self.collect_orphans(db, job)
+            result["analysis"] = video_analysis_service.collect_orphans()
+            job.update(1.0, f"{result['events']} evento(s) e {result['files'] + result['orphans']['files']} "
+                            f"arquivo(s) removidos")
+            return result
+        finally:
+            db.close()
+
+    @staticmethod
+    def _add(total: Dict[str, int], removed: Dict[str, int]):
+        for key in ("events", "files", "bytes"):
+            total[key] += removed[key]
+
+    def _age_pass(self, db: Session, camera_id: int, days: int, job: Job) -> Dict[str, int]:
+        """Remover eventos mais antigos que `days` dias, do mais antigo ao mais novo"""
+        cutoff = datetime.now() - timedelta(days=days)
+        removed = {"events": 0, "files": 0, "bytes": 0}
+        while True:
+            ids = [event_id for event_id, in db.query(Event.id).filter(
+                Event.camera_id == camera_id, Event.timestamp < cutoff
+            ).order_by(Event.timestamp, Event.id).limit(max(1, settings.retention_batch_size))]
+            if not ids:
+                return removed
+            self._add(removed, self.delete_events(db, ids))
+            job.update(job.progress, f"Câmera {camera_id}: {removed['events']} evento(s) expirado(s) removido(s)")
+
+    def _size_pass(self, db: Session, camera_id: int, max_bytes: int, job: Job,
+                   archived_bytes: int = 0) -> Dict[str, int]:
+        """Remover os eventos mais antigos até os arquivos da câmera caberem em `max_bytes`
+
+        `archived_bytes`: arquivos de meses arquivados que continuam em disco
+        (já reduzidos ao necessário por `_prune_archived_files`).
+        """
+        self._measure_files(db, camera_id, job)
+        removed = {"events": 0, "files": 0, "bytes": 0}
+        excess = self.usage(db, camera_id)["bytes"] + archived_bytes - max_bytes
+        while excess > 0:
+            ids = []
+            for event_id, size in db.query(Event.id, Event.file_bytes).filter(
+                Event.camera_id == camera_id
+            ).order_by(Event.timestamp, Event.id).limit(max(1, settings.retention_batch_size)):
+                if excess <= 0:
+                    break
+                ids.append(event_id)
+                excess -= size or 0
+            if not ids:
+                break
+            self._add(removed, self.delete_events(db, ids))
+            job.update(job.progress, f"Câmera {camera_id}: {removed['bytes']} bytes liberados")
+        return removed
+
+    @staticmethod
+    def _measure_files(db: Session, camera_id: int, job: Job):
+        """Registrar o tamanho dos arquivos de eventos gravados antes da coluna file_bytes"""
+        while True:
+            rows = db.query(Event.id, Event.image_path, Event.video_path).filter(
+                Event.camera_id == camera_id, Event.file_bytes.is_(None)
+            ).limit(FILE_BYTES_BACKFILL_BATCH).all()
+            if not rows:
+                return
+            db.bulk_update_mappings(Event, [
+                {"id": event_id, "file_bytes": file_size(image_path, video_path)}
+                for event_id, image_path, video_path in rows
+            ])
+            db.commit()
+            job.update(job.progress, f"Câmera {camera_id}: medindo arquivos de eventos antigos")
+
+    def _prune_archived_files(self, db: Session, policies: Dict[int, Dict[str, int]],
+                              job: Job) -> Tuple[Dict[str, int], Dict[int, int]]:
+        """Aplicar a retenção das câmeras aos arquivos dos meses arquivados
+
+        Os eventos arquivados saíram da tabela, mas seus screenshots/vídeos
+        continuam em disco e são sempre mais antigos que os eventos quentes:
+        expiram pela idade e são os primeiros removidos quando a câmera passa
+        do limite de espaço. Devolve (removidos, bytes arquivados restantes por
+        câmera); arquivos cujos arquivos de eventos acabaram são marcados
+        `files_pruned` e não são mais lidos.
+        """
+        removed = {"files": 0, "bytes": 0}
+        remaining: Dict[int, int] = {}
+        default = {"days": max(0, settings.retention_default_days),
+                   "max_mb": max(0, settings.retention_default_max_mb)}
+        if not any(policy["days"] or policy["max_mb"] for policy in [default, *policies.values()]):
+            return removed, remaining
+        archives = db.query(EventArchive).filter(
+            EventArchive.status == ARCHIVE_DONE, EventArchive.files_pruned.is_(False)
+        ).order_by(EventArchive.month_start).all()
+        if not archives:
+            return removed, remaining
+
+        # 1ª leitura (só com limite de espaço): bytes arquivados de cada câmera
+        if any(policy["max_mb"] for policy in [default, *policies.values()]):
+            for archive in archives:
+                for camera_id, _, _, size in self._archived_files(archive):
+                    remaining[camera_id] = remaining.get(camera_id, 0) + size
+        excess: Dict[int, int] = {}
+        for camera_id, archived in remaining.items():
+            max_mb = policies.get(camera_id, default)["max_mb"]
+            if max_mb:
+                self._measure_files(db, camera_id, job)
+                excess[camera_id] = self.usage(db, camera_id)["bytes"] + archived - max_mb * 1024 * 1024
+
+        # 2ª leitura: do mês mais antigo ao mais novo, remover os expirados e os excedentes
+        now = datetime.now()
+        for archive in archives:
+            kept = 0
+            for camera_id, timestamp, path, size in self._archived_files(archive):
+                days = policies.get(camera_id, default)["days"]
+                expired = bool(days) and timestamp < now - timedelta(days=days)
+                if not expired and excess.get(camera_id, 0) <= 0:
+                    kept += 1
+                    continue
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Erro ao remover arquivo de evento arquivado {path}: {e}")
+                    kept += 1
+                    continue
+                removed["files"] += 1
+                removed["bytes"] += size
+                if camera_id in remaining:
+                    remaining[camera_id] -= size
+                if camera_id in excess:
+                    excess[camera_id] -= size
+            if not kept:
+                archive.files_pruned = True
+                db.commit()
+            job.update(job.progress, f"Meses arquivados: {removed['files']} arquivo(s) removido(s)")
+        if removed["files"]:
+            logger.info(f"Retenção dos meses arquivados: {removed['files']} arquivo(s) removidos "
+                        f"({removed['bytes']} bytes)")
+        return removed, remaining
+
+    @staticmethod
+    def _archived_files(archive: EventArchive) -> Iterator[Tuple[Optional[int], datetime, str, int]]:
+        """Arquivos ainda em disco dos eventos de um mês arquivado: (câmera, timestamp, caminho, bytes)"""
+        with gzip.open(archive.path, "rt", encoding="utf-8") as archive_file:
+            for line in archive_file:
+                event = json.loads(line)
+                timestamp = datetime.fromisoformat(event["timestamp"]).replace(tzinfo=None)
+                for path in (event.get("image_path"), event.get("video_path")):
+                    disk_path = resolve_upload_path(path)
+                    if not disk_path:
+                        continue
+                    try:
+                        size = os.path.getsize(disk_path)
+                    except OSError:
+                        continue
+                    yield event.get("camera_id"), timestamp, disk_path, size
+
+    def collect_orphans(self, db: Session, job: Optional[Job] = None) -> Dict[str, int]:
+        """Remover screenshots que não pertencem a nenhum evento
+
+        Só considera arquivos mais antigos que `screenshot_gc_grace_minutes`
+        (o evento é gravado depois da imagem) e preserva os dos meses
+        arquivados, cujos eventos saíram da tabela mas continuam nos arquivos
+        (a retenção deles é feita por `_prune_archived_files`).
+        """
+        directory = os.path.join(settings.upload_dir, "screenshots")
+        if not os.path.isdir(directory):
+            return {"files": 0, "bytes": 0}
+        newest = time.time() - settings.screenshot_gc_grace_minutes * 60
+        archived_until = EventArchiveService.archived_until(db)
+        oldest = archived_until.timestamp() if archived_until else None
+
+        removed = {"files": 0, "bytes": 0}
+        candidates: Dict[str, Tuple[str, int]] = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if stat.st_mtime > newest or (oldest is not None and stat.st_mtime < oldest):
+                    continue
+                candidates[entry.name] = (entry.path, stat.st_size)
+                if len(candidates) >= max(1, settings.retention_batch_size):
+                    self._remove_unreferenced(db, candidates, removed)
+                    candidates = {}
+                    if job:
+                        job.update(job.progress, f"{removed['files']} screenshot(s) sem evento removido(s)")
+        self._remove_unreferenced(db, candidates, removed)
+        if removed["files"]:
+            logger.info(f"{removed['files']} screenshot(s) sem evento removido(s) ({removed['bytes']} bytes)")
+        return removed
+
+    @staticmethod
+    def _remove_unreferenced(db: Session, candidates: Dict[str, Tuple[str, int]], removed: Dict[str, int]):
+        if not candidates:
+            return
+        # Eventos guardam a URL pública, caminhos relativos ou absolutos, às
+        # vezes com separadores do Windows: comparar pelo nome do arquivo
+        names = list(candidates)
+        referenced = set()
+        for start in range(0, len(names), REFERENCE_QUERY_CHUNK):
+            chunk = names[start:start + REFERENCE_QUERY_CHUNK]
+            for row in db.query(Event.image_path, Event.video_path).filter(or_(*[
+                column.endswith(name, autoescape=True)
+                for name in chunk for column in (Event.image_path, Event.video_path)
+            ])):
+                referenced.update(os.path.basename(path.replace("\\", "/")) for path in row if path)
+        for name, (path, size) in candidates.items():
+            if name in referenced:
+                continue
+            try:
+                os.remove(path)
+                removed["files"] += 1
+                removed["bytes"] += size
+            except OSError as e:
+                logger.warning(f"Erro ao remover screenshot órfão {path}: {e}")
+
+    def submit_bulk_delete(
+        self,
+        camera_id: Optional[int] = None,
+        event_type: Optional[EventType] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        owner: Optional[str] = None
+    ) -> Job:
+        """Excluir em segundo plano, em lotes, os eventos que atendem aos filtros"""
+        filters = {"camera_id": camera_id, "event_type": event_type, "start_date": start_date, "end_date": end_date}
+
+        def run(job: Job) -> Dict:
+            db = SessionLocal()
+            try:
+                query = EventService._filtered_query(db, **filters)
+                total = query.count()
+                removed = {"events": 0, "files": 0, "bytes": 0}
+                job.update(0.0, f"{total} evento(s) a remover")
+                while True:
+                    ids = [event.id for event in EventService._filtered_query(db, **filters).with_entities(
+                        Event.id
+                    ).order_by(Event.id).limit(max(1, settings.retention_batch_size))]
+                    if not ids:
+                        break
+                    self._add(removed, self.delete_events(db, ids))
+                    job.update(removed["events"] / max(1, total), f"{removed['events']}/{total} evento(s) removido(s)")
+                logger.info(f"Exclusão em massa: {removed['events']} evento(s) e {removed['files']} arquivo(s) removidos")
+                return removed
+            finally:
+                db.close()
+
+        return job_manager.submit("event_bulk_delete", run, params={
+            key: value.isoformat() if isinstance(value, datetime) else getattr(value, "value", value)
+            for key, value in filters.items() if value is not None
+        }, owner=owner)
+
+    def submit_file_removal(self, paths: List[str], owner: Optional[str] = None,
+                            params: Optional[Dict] = None) -> Job:
+        """Apagar em segundo plano arquivos de eventos já removidos do banco"""
+        def run(job: Job) -> Dict:
+            removed = {"files": 0, "bytes": 0}
+            batch_size = max(1, settings.retention_batch_size)
+            for start in range(0, len(paths), batch_size):
+                files, freed = remove_files(paths[start:start + batch_size])
+                removed["files"] += files
+                removed["bytes"] += freed
+                job.update((start + batch_size) / max(1, len(paths)), f"{removed['files']} arquivo(s) removido(s)")
+            return removed
+
+        return job_manager.submit("event_files_delete", run, params={**(params or {}), "files": len(paths)},
+                                  owner=owner)
+
+    def start(self):
+        """Retenção periódica em segundo plano"""
+        if self._running or settings.retention_interval_minutes <= 0:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._background_loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+
+    def _background_loop(self):
+        while self._running:
+            try:
+                self.submit(owner="system")
+            except Exception as e:
+                logger.error(f"Erro ao agendar retenção de eventos: {e}")
+            slept = 0.0
+            while self._running and slept < settings.retention_interval_minutes * 60:
+                time.sleep(1.0)
+                slept += 1.0
+
+
+# Instância global do serviço
+retention_service = RetentionService()
@@ -0,0 +1,63 @@
+"""
+Cache com expiração para estatísticas do dashboard
+
+O dashboard atualiza a cada 30s em cada operador conectado; as estatísticas
+são calculadas no máximo uma vez por `stats_cache_ttl` segundos e
+compartilhadas. Requisições simultâneas para a mesma chave aguardam um único
+cálculo em vez de consultar o banco em paralelo.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StatsCache:
+    """Cache chave -> valor com TTL e cálculo único por chave"""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[float, Any]] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        ttl = settings.stats_cache_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return compute()
+
+        cached = self._values.get(key)
+        if cached and cached[0] > time.time():
+            self.hits += 1
+            return cached[1]
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Outra requisição pode ter calculado enquanto esta aguardava
+            cached = self._values.get(key)
+            if cached and cached[0] > time.time():
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+            value = compute()
+            self._values[key] = (time.time() + ttl, value)
+            return value
+
+    def invalidate(self, prefix: str = ""):
+        """Descartar valores cujas chaves começam com `prefix` (todos, se vazio)"""
+        for key in [k for k in list(self._values) if k.startswith(prefix)]:
+            self._values.pop(key, None)
+
+    def get_stats(self) -> Dict:
+        return {"keys": len(self._values), "hits": self.hits, "misses": self.misses,
+                "ttl": settings.stats_cache_ttl}
+
+
+# Instância global do cache
+stats_cache = StatsCache()
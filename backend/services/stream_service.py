@@ -2,24 +2,32 @@
 Serviço de streaming para converter RTSP para formatos compatíveis com navegador
 """
 import cv2
-import threading
+import numpy as np
 import time
 import base64
 import io
 from PIL import Image
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 import asyncio
 from fastapi import FastAPI
 from fastapi.responses import StreamingResponse
 import uvicorn
 
+from services.camera_scheduler import camera_scheduler, ScheduledTask
+from services.capture_supervisor import capture_supervisor, SupervisedCapture
+
 class StreamService:
     """Serviço para gerenciar streams de câmeras"""
     
     def __init__(self):
-        self.active_streams: Dict[int, cv2.VideoCapture] = {}
-        self.stream_threads: Dict[int, threading.Thread] = {}
+        self.active_streams: Dict[int, SupervisedCapture] = {}
+        self.stream_tasks: Dict[int, ScheduledTask] = {}
+        self.frame_counts: Dict[int, int] = {}
         self.latest_frames: Dict[int, bytes] = {}
+        # Frame bruto (BGR) mais recente e contador de sequência, usados por
+        # consumidores que precisam codificar novamente (ex.: WebRTC)
+        self.latest_raw_frames: Dict[int, np.ndarray] = {}
+        self.frame_sequence: Dict[int, int] = {}
         self.stream_running: Dict[int, bool] = {}
         
     def start_stream(self, camera_id: int, stream_url: str):
@@ -30,32 +38,23 @@ class StreamService:
                 
             print(f"Iniciando stream para câmera {camera_id}: {stream_url}")
             
-            # Conectar à câmera
-            if stream_url.startswith("webcam://"):
-                camera_index = int(stream_url.split("://")[1])
-                cap = cv2.VideoCapture(camera_index)
-            else:
-                cap = cv2.VideoCapture(stream_url)
-                
-            if not cap.isOpened():
+            # Conectar à câmera através do supervisor (reconexão com backoff)
+            cap = capture_supervisor.open(camera_id, stream_url, "stream", fps=10)
+            if not cap.ensure_connected(timeout=10):
                 print(f"Erro ao conectar à câmera {camera_id} - URL: {stream_url}")
+                cap.release()
                 return False
                 
-            # Configurar propriedades da câmera
-            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reduzir buffer
-            cap.set(cv2.CAP_PROP_FPS, 10)  # 10 FPS
-            
             self.active_streams[camera_id] = cap
             self.stream_running[camera_id] = True
             
-            # Iniciar thread de captura
-            thread = threading.Thread(
-                target=self._capture_frames,
-                args=(camera_id, cap),
-                daemon=True
+            # Captura como tarefa cooperativa no escalonador de câmeras
+            self.frame_counts[camera_id] = 0
+            self.stream_tasks[camera_id] = camera_scheduler.submit(
+                f"stream:{camera_id}",
+                lambda: self._capture_step(camera_id, cap),
+                on_stop=lambda: self._finish_capture(camera_id, cap),
             )
-            self.stream_threads[camera_id] = thread
-            thread.start()
             
             print(f"Stream iniciado com sucesso para câmera {camera_id}")
             return True
@@ -69,9 +68,9 @@ class StreamService:
         if camera_id in self.stream_running:
             self.stream_running[camera_id] = False
             
-        if camera_id in self.stream_threads:
-            self.stream_threads[camera_id].join(timeout=2)
-            del self.stream_threads[camera_id]
+        task = self.stream_tasks.pop(camera_id, None)
+        if task:
+            camera_scheduler.cancel(task, timeout=2)
             
         if camera_id in self.active_streams:
             self.active_streams[camera_id].release()
@@ -79,44 +78,51 @@ class StreamService:
             
         if camera_id in self.latest_frames:
             del self.latest_frames[camera_id]
+        self.latest_raw_frames.pop(camera_id, None)
+        self.frame_sequence.pop(camera_id, None)
             
         print(f"Stream parado para câmera {camera_id}")
         
-    def _capture_frames(self, camera_id: int, cap: cv2.VideoCapture):
-        """Capturar frames da câmera"""
-        frame_count = 0
-        try:
-            while self.stream_running.get(camera_id, False):
-                ret, frame = cap.read()
-                if not ret:
-                    print(f"Erro ao ler frame da câmera {camera_id}")
-                    time.sleep(0.2)
-                    continue
-                    
-                # Converter frame para JPEG
-                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                frame_bytes = buffer.tobytes()
-                
-                # Armazenar frame mais recente
-                self.latest_frames[camera_id] = frame_bytes
-                frame_count += 1
-                
-                if frame_count % 100 == 0:  # Log a cada 100 frames
-                    print(f"Câmera {camera_id}: {frame_count} frames capturados")
-                
-                time.sleep(0.1)  # 10 FPS
-                
-        except Exception as e:
-            print(f"Erro na captura de frames da câmera {camera_id}: {e}")
-        finally:
-            print(f"Captura de frames finalizada para câmera {camera_id}")
-            if camera_id in self.active_streams:
-                self.active_streams[camera_id].release()
-                
+    def _capture_step(self, camera_id: int, cap: SupervisedCapture) -> Optional[float]:
+        """Capturar um frame da câmera (passo da tarefa no escalonador)"""
+        if not self.stream_running.get(camera_id, False):
+            return None
+
+        ret, frame = cap.read()
+        if not ret:
+            # Aguardar o backoff de reconexão do supervisor
+            return min(max(cap.wait_time(), 0.2), 1.0)
+
+        # Converter frame para JPEG
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        frame_bytes = buffer.tobytes()
+
+        # Armazenar frame mais recente
+        self.latest_frames[camera_id] = frame_bytes
+        self.latest_raw_frames[camera_id] = frame
+        self.frame_sequence[camera_id] = self.frame_sequence.get(camera_id, 0) + 1
+        frame_count = self.frame_counts.get(camera_id, 0) + 1
+        self.frame_counts[camera_id] = frame_count
+
+        if frame_count % 100 == 0:  # Log a cada 100 frames
+            print(f"Câmera {camera_id}: {frame_count} frames capturados")
+
+        return 0.1  # 10 FPS
+
+    def _finish_capture(self, camera_id: int, cap: SupervisedCapture):
+        """Liberar captura ao encerrar a tarefa"""
+        print(f"Captura de frames finalizada para câmera {camera_id}")
+        cap.release()
+        self.frame_counts.pop(camera_id, None)
+
     def get_latest_frame(self, camera_id: int) -> Optional[bytes]:
         """Obter frame mais recente"""
         return self.latest_frames.get(camera_id)
         
+    def get_latest_raw_frame(self, camera_id: int) -> Tuple[int, Optional[np.ndarray]]:
+        """Obter frame bruto mais recente junto com seu número de sequência"""
+        return self.frame_sequence.get(camera_id, 0), self.latest_raw_frames.get(camera_id)
+        
     def generate_mjpeg_stream(self, camera_id: int):
         """Gerar stream MJPEG para o navegador"""
         def generate():
@@ -0,0 +1,329 @@
+"""
+Análise offline de arquivos de vídeo
+
+Decodifica o arquivo o mais rápido possível (sem o ritmo de tempo real dos
+monitores), dividido em trechos de tempo processados em paralelo por processos
+de trabalho. Cada trecho roda o mesmo pipeline de detecção/zona das câmeras ao
+vivo, com aquecimento do modelo de fundo antes do início do trecho. O resultado
+é uma linha do tempo de eventos com uma miniatura por evento.
+
+Miniaturas e o vídeo enviado por upload são apagados quando a tarefa sai do
+histórico do job_manager (excluída pela API ou descartada pelo limite); os que
+sobram sem tarefa (ex.: após reinício) são removidos pela passada de retenção.
+"""
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+
+from config import settings
+from services.job_manager import Job, job_manager
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.avi', '.mkv', '.mov')
+
+# Diretórios de onde vídeos podem ser analisados
+SOURCE_DIRS = (Path("temp_videos"), Path(settings.upload_dir) / "videos")
+
+# Identificador de rastreamento usado nos processos de trabalho (fora da faixa de câmeras)
+ANALYSIS_TRACK_ID = -1
+
+# Nome dos vídeos gravados por /analysis/upload
+UPLOAD_NAME = re.compile(r"^[0-9a-f]{32}\.[a-z0-9]+$")
+
+
+def _analyze_range(video_path: str, start_frame: int, end_frame: int, options: Dict) -> Dict:
+    """Analisar um trecho do vídeo (executado em processo de trabalho)"""
+    # Importado no processo de trabalho: cada processo carrega o próprio modelo uma vez
+    from collections import deque
+    from services.detection_service import detection_service
+
+    fps = options["fps"]
+    step = max(1, int(round(fps / options["sample_fps"])))
+    warmup_start = max(0, start_frame - int(options["warmup_seconds"] * fps))
+
+    detector = detection_service
+    # Carregamento preguiçoso: o processo de trabalho aguarda o modelo uma vez
+    detector.ensure_model()
+    detector.tracking_data[ANALYSIS_TRACK_ID] = {'objects': {}, 'next_id': 0, 'frame_count': 0}
+    detector.motion_history[ANALYSIS_TRACK_ID] = deque(maxlen=30)
+    bg_subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=True, varThreshold=50, history=500)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+    cap = cv2.VideoCapture(video_path)
+    detections: List[Dict] = []
+    analysed = 0
+    # Miniatura só na primeira detecção de cada evento (mesma regra de _build_timeline)
+    last_time: Optional[float] = None
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, warmup_start)
+        index = warmup_start
+        while index < end_frame:
+            if (index - warmup_start) % step:
+                # Frames fora da amostragem: avançar sem decodificar a imagem completa
+                if not cap.grab():
+                    break
+                index += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            if index < start_frame:
+                # Aquecimento: só alimentar o modelo de fundo
+                bg_subtractor.apply(frame)
+            else:
+                analysed += 1
+                objects: List[Dict] = []
+                if detector._advanced_detection(
+                    frame, ANALYSIS_TRACK_ID, options["sensitivity"], options.get("detection_line"),
+                    options.get("detection_zone"), bg_subtractor, kernel, objects_out=objects
+                ):
+                    detection = {"frame": index, "time": round(index / fps, 3),
+                                 "objects": [{"class": obj["class"], "confidence": round(obj["confidence"], 3)}
+                                             for obj in objects]}
+                    if last_time is None or detection["time"] - last_time > options["merge_gap"]:
+                        thumbnail = os.path.join(options["output_dir"], f"frame_{index:08d}.jpg")
+                        height, width = frame.shape[:2]
+                        scale = options["thumbnail_width"] / float(width)
+                        small = cv2.resize(frame, (options["thumbnail_width"], max(1, int(height * scale))))
+                        cv2.imwrite(thumbnail, small, [cv2.IMWRITE_JPEG_QUALITY, 80])
+                        detection["thumbnail"] = os.path.basename(thumbnail)
+                    last_time = detection["time"]
+                    detections.append(detection)
+            index += 1
+    finally:
+        cap.release()
+    return {"start_frame": start_frame, "end_frame": end_frame, "analysed_frames": analysed,
+            "detections": detections}
+
+
+class VideoAnalysisService:
+    """Serviço de análise offline de vídeos"""
+
+    def __init__(self):
+        self.output_root = Path(settings.upload_dir) / "analysis"
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Tarefas de análise rodam em paralelo no job_manager: um único pool
+        self._pool_lock = threading.Lock()
+
+    def worker_count(self) -> int:
+        if settings.video_analysis_workers > 0:
+            return settings.video_analysis_workers
+        from services.cpu_topology import cpu_topology
+        return cpu_topology.plan.workers
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Pool de processos persistente (o modelo é carregado uma vez por processo)"""
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: o processo principal tem threads ativas (escalonador, captura)
+                self._pool = ProcessPoolExecutor(max_workers=self.worker_count(),
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor):
+        """Descartar pool quebrado (processo de trabalho morto); o próximo uso cria outro"""
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def resolve_video(self, filename: str) -> Optional[Path]:
+        """Localizar vídeo pelo nome nos diretórios permitidos (sem sair deles)"""
+        if not filename.lower().endswith(VIDEO_EXTENSIONS):
+            return None
+        for directory in SOURCE_DIRS:
+            base = directory.resolve()
+            candidate = (base / filename).resolve()
+            if candidate.parent == base and candidate.is_file():
+                return candidate
+        return None
+
+    def get_output_dir(self, job_id: str) -> Path:
+        return self.output_root / job_id
+
+    def start_analysis(self, video_path: Path, options: Dict, owner: Optional[str] = None,
+                       uploaded: bool = False) -> Job:
+        """Enfileirar análise de um arquivo de vídeo
+
+        `uploaded`: vídeo enviado só para esta análise, apagado junto com as miniaturas.
+        """
+        params = {"filename": video_path.name, **{k: v for k, v in options.items() if v is not None}}
+        return job_manager.submit(
+            "video_analysis",
+            lambda job: self._run(job, video_path, options),
+            params=params,
+            owner=owner,
+            on_discard=lambda job: self._discard_job(job, video_path if uploaded else None),
+        )
+
+    def _run(self, job: Job, video_path: Path, options: Dict) -> Dict:
+        cap = cv2.VideoCapture(str(video_path))
+        try:
+            if not cap.isOpened():
+                raise ValueError(f"Não foi possível abrir o vídeo {video_path.name}")
+            fps = cap.get(cv2.CAP_PROP_FPS) or 0
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        finally:
+            cap.release()
+        if fps <= 0 or total_frames <= 0:
+            raise ValueError("Vídeo sem FPS ou contagem de frames válidos")
+
+        output_dir = self.get_output_dir(job.id)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        range_options = {
+            "fps": fps,
+            "sample_fps": min(fps, options.get("sample_fps") or settings.video_analysis_sample_fps),
+            "warmup_seconds": settings.video_analysis_warmup_seconds,
+            "sensitivity": max(0.25, min(0.7, (options.get("sensitivity") or 50) / 100.0)),
+            "detection_line": options.get("detection_line"),
+            "detection_zone": options.get("detection_zone"),
+            "thumbnail_width": settings.video_analysis_thumbnail_width,
+            "merge_gap": settings.video_analysis_merge_gap,
+            "output_dir": str(output_dir),
+        }
+
+        # Trechos menores que o número de processos permitem reportar progresso
+        chunk_frames = max(1, int(settings.video_analysis_chunk_seconds * fps))
+        ranges = [(start, min(start + chunk_frames, total_frames))
+                  for start in range(0, total_frames, chunk_frames)]
+        job.update(0.0, f"Analisando {len(ranges)} trecho(s) com {self.worker_count()} processo(s)")
+
+        results: List[Dict] = []
+        remaining = list(ranges)
+        # Um processo morto (ex.: OOM ao carregar o modelo) quebra o pool inteiro:
+        # recriar o pool e reenviar uma vez os trechos que faltam
+        for attempt in range(2):
+            pool = self._get_pool()
+            try:
+                self._process_ranges(job, pool, video_path, remaining, range_options, results, len(ranges))
+                break
+            except BrokenProcessPool as e:
+                self._reset_pool(pool)
+                if attempt:
+                    raise RuntimeError("Processos de análise encerrados inesperadamente") from e
+                logger.warning(f"Pool de análise quebrado ({e}); recriando para {len(remaining)} trecho(s)")
+
+        detections = sorted((d for r in results for d in r["detections"]), key=lambda d: d["frame"])
+        timeline = self._build_timeline(detections, merge_gap=settings.video_analysis_merge_gap)
+        # Eventos que continuam no trecho seguinte deixam a miniatura do início do trecho sem uso
+        used = {event["thumbnail"] for event in timeline}
+        for detection in detections:
+            if detection.get("thumbnail") and detection["thumbnail"] not in used:
+                (output_dir / detection["thumbnail"]).unlink(missing_ok=True)
+        return {
+            "filename": video_path.name,
+            "fps": fps,
+            "total_frames": total_frames,
+            "duration_seconds": round(total_frames / fps, 2),
+            "analysed_frames": sum(r["analysed_frames"] for r in results),
+            "sample_fps": range_options["sample_fps"],
+            "events": timeline,
+        }
+
+    @staticmethod
+    def _process_ranges(job: Job, pool: ProcessPoolExecutor, video_path: Path, remaining: List[Tuple[int, int]],
+                        range_options: Dict, results: List[Dict], total: int):
+        """Enviar trechos ao pool e coletar resultados (concluídos saem de `remaining`)"""
+        futures = {pool.submit(_analyze_range, str(video_path), start, end, range_options): (start, end)
+                   for start, end in remaining}
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results.append(future.result())
+                    remaining.remove(futures[future])
+                job.update(len(results) / total, f"{len(results)}/{total} trecho(s) concluído(s)")
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    def _build_timeline(self, detections: List[Dict], merge_gap: float) -> List[Dict]:
+        """Agrupar detecções próximas no tempo em eventos (inclusive entre trechos)"""
+        events: List[Dict] = []
+        for detection in detections:
+            if events and detection["time"] - events[-1]["end_time"] <= merge_gap:
+                events[-1]["end_time"] = detection["time"]
+                events[-1]["detections"] += 1
+                continue
+            events.append({
+                "start_time": detection["time"],
+                "end_time": detection["time"],
+                "start_frame": detection["frame"],
+                "detections": 1,
+                "thumbnail": detection.get("thumbnail"),
+            })
+        return events
+
+    def resolve_thumbnail(self, job_id: str, name: str) -> Optional[Path]:
+        base = self.get_output_dir(job_id).resolve()
+        candidate = (base / name).resolve()
+        if candidate.parent == base and candidate.is_file():
+            return candidate
+        return None
+
+    def _discard_job(self, job: Job, upload: Optional[Path]):
+        # O vídeo enviado pode estar sendo reanalisado por outra tarefa (a coleta o remove depois)
+        if upload is not None and any(other.params.get("filename") == upload.name
+                                      for other in job_manager.list("video_analysis")):
+            upload = None
+        self.delete_output(job.id, upload)
+
+    def delete_output(self, job_id: str, upload: Optional[Path] = None):
+        """Apagar miniaturas da análise e o vídeo enviado para ela"""
+        shutil.rmtree(self.get_output_dir(job_id), ignore_errors=True)
+        if upload is not None:
+            try:
+                upload.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Erro ao remover vídeo enviado {upload}: {e}")
+
+    def collect_orphans(self) -> Dict[str, int]:
+        """Remover miniaturas e vídeos enviados de análises fora do histórico de tarefas"""
+        jobs = job_manager.list("video_analysis")
+        job_ids = {job.id for job in jobs}
+        filenames = {job.params.get("filename") for job in jobs}
+        oldest = time.time() - settings.video_analysis_orphan_grace_minutes * 60
+        removed = {"outputs": 0, "videos": 0}
+        for directory, kind in ((self.output_root, "outputs"), (Path(settings.upload_dir) / "videos", "videos")):
+            if not directory.is_dir():
+                continue
+            for entry in directory.iterdir():
+                try:
+                    if entry.stat().st_mtime > oldest:
+                        continue
+                except OSError:
+                    continue
+                if kind == "outputs" and entry.is_dir() and entry.name not in job_ids:
+                    shutil.rmtree(entry, ignore_errors=True)
+                elif kind == "videos" and UPLOAD_NAME.match(entry.name) and entry.name not in filenames:
+                    entry.unlink(missing_ok=True)
+                else:
+                    continue
+                removed[kind] += 1
+        if removed["outputs"] or removed["videos"]:
+            logger.info(f"Análises sem tarefa: {removed['outputs']} pasta(s) de miniaturas e "
+                        f"{removed['videos']} vídeo(s) enviado(s) removidos")
+        return removed
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Instância global do serviço
+video_analysis_service = VideoAnalysisService()
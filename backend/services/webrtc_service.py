@@ -0,0 +1,262 @@
+"""
+Serviço de WebRTC para visualização ao vivo de baixa latência
+
+Os frames capturados pelo StreamService são codificados em H.264 UMA única vez
+por câmera e os mesmos pacotes são entregues a todos os peers conectados, em vez
+de cada peer ter seu próprio codificador. A captura aberta pela sinalização
+WebRTC é encerrada quando o último peer da câmera se desconecta (ou passa para
+o HLS, se ele estiver ativo).
+"""
+import asyncio
+import fractions
+import logging
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from config import settings
+from services.stream_service import stream_service
+
+logger = logging.getLogger(__name__)
+
+# aiortc/PyAV são dependências opcionais
+try:
+    import av
+    from aiortc import RTCPeerConnection, RTCRtpSender, RTCSessionDescription
+    from aiortc.mediastreams import MediaStreamError, MediaStreamTrack
+    AIORTC_AVAILABLE = True
+except ImportError:
+    av = None
+    AIORTC_AVAILABLE = False
+    MediaStreamTrack = object
+
+VIDEO_CLOCK_RATE = 90000
+VIDEO_TIME_BASE = fractions.Fraction(1, VIDEO_CLOCK_RATE)
+
+
+class SharedH264Encoder:
+    """Codificador H.264 compartilhado por todos os peers de uma câmera"""
+
+    def __init__(self, camera_id: int, fps: int, bitrate: int, keyframe_interval: int):
+        self.camera_id = camera_id
+        self.fps = max(1, fps)
+        self.bitrate = bitrate
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.subscribers: Set["EncodedVideoTrack"] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.frames_encoded = 0
+        self._codec = None
+        self._size = None
+        self._last_sequence = 0
+
+    def _create_codec(self, width: int, height: int):
+        codec = av.CodecContext.create("libx264", "w")
+        codec.width = width
+        codec.height = height
+        codec.pix_fmt = "yuv420p"
+        codec.framerate = fractions.Fraction(self.fps, 1)
+        codec.time_base = VIDEO_TIME_BASE
+        codec.bit_rate = self.bitrate
+        codec.options = {
+            "profile": "baseline",
+            "level": "31",
+            "preset": "ultrafast",
+            "tune": "zerolatency",
+            "g": str(self.keyframe_interval),
+            "keyint_min": str(self.keyframe_interval),
+        }
+        return codec
+
+    def _encode(self, frame: np.ndarray) -> List["av.Packet"]:
+        """Codificar um frame BGR (executado fora do event loop)"""
+        # H.264 exige dimensões pares
+        height, width = frame.shape[:2]
+        width, height = width - (width % 2), height - (height % 2)
+        if self._codec is None or self._size != (width, height):
+            self._codec = self._create_codec(width, height)
+            self._size = (width, height)
+
+        video_frame = av.VideoFrame.from_ndarray(frame[:height, :width], format="bgr24")
+        video_frame = video_frame.reformat(format="yuv420p")
+        video_frame.pts = int(self.frames_encoded * VIDEO_CLOCK_RATE / self.fps)
+        video_frame.time_base = VIDEO_TIME_BASE
+        self.frames_encoded += 1
+
+        packets = self._codec.encode(video_frame)
+        for packet in packets:
+            packet.time_base = VIDEO_TIME_BASE
+        return packets
+
+    async def run(self):
+        """Ler frames do StreamService, codificar e distribuir para os peers"""
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / self.fps
+        logger.info(f"Codificador WebRTC iniciado para câmera {self.camera_id}")
+        try:
+            while self.subscribers:
+                sequence, frame = stream_service.get_latest_raw_frame(self.camera_id)
+                if frame is not None and sequence != self._last_sequence:
+                    self._last_sequence = sequence
+                    packets = await loop.run_in_executor(None, self._encode, frame)
+                    for packet in packets:
+                        for track in list(self.subscribers):
+                            track.push(packet)
+                await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Erro no codificador WebRTC da câmera {self.camera_id}: {e}", exc_info=True)
+        finally:
+            self._codec = None
+            for track in list(self.subscribers):
+                track.stop()
+            logger.info(f"Codificador WebRTC finalizado para câmera {self.camera_id}")
+
+
+class EncodedVideoTrack(MediaStreamTrack):
+    """Track de vídeo que entrega pacotes H.264 já codificados ao RTCRtpSender"""
+
+    kind = "video"
+
+    def __init__(self, encoder: SharedH264Encoder):
+        super().__init__()
+        self.encoder = encoder
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=settings.webrtc_fps)
+        self._waiting_keyframe = True
+
+    def push(self, packet):
+        """Enfileirar pacote; peers lentos descartam até o próximo keyframe"""
+        if self._waiting_keyframe:
+            if not packet.is_keyframe:
+                return
+            self._waiting_keyframe = False
+        if self._queue.full():
+            # Esvaziar a fila e sincronizar novamente no próximo keyframe
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._waiting_keyframe = not packet.is_keyframe
+            if self._waiting_keyframe:
+                return
+        self._queue.put_nowait(packet)
+
+    async def recv(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+        return await self._queue.get()
+
+    def stop(self):
+        super().stop()
+        self.encoder.subscribers.discard(self)
+
+
+class WebRTCService:
+    """Serviço para gerenciar peers WebRTC e codificadores compartilhados"""
+
+    def __init__(self):
+        self.encoders: Dict[int, SharedH264Encoder] = {}
+        self.peer_connections: Set["RTCPeerConnection"] = set()
+        # Capturas do StreamService abertas para peers WebRTC (encerradas sem peers)
+        self.owned_captures: Dict[int, object] = {}
+
+    def is_available(self) -> bool:
+        """Verificar se as dependências de WebRTC estão instaladas e habilitadas"""
+        return AIORTC_AVAILABLE and settings.webrtc_enabled
+
+    def _subscribe(self, camera_id: int) -> EncodedVideoTrack:
+        encoder = self.encoders.get(camera_id)
+        if encoder is None or encoder.task is None or encoder.task.done():
+            encoder = SharedH264Encoder(
+                camera_id,
+                fps=settings.webrtc_fps,
+                bitrate=settings.webrtc_bitrate,
+                keyframe_interval=settings.webrtc_keyframe_interval,
+            )
+            self.encoders[camera_id] = encoder
+        track = EncodedVideoTrack(encoder)
+        encoder.subscribers.add(track)
+        if encoder.task is None:
+            encoder.task = asyncio.ensure_future(encoder.run())
+        return track
+
+    async def handle_offer(self, camera_id: int, sdp: str, offer_type: str = "offer",
+                           capture=None) -> Dict[str, str]:
+        """Processar oferta SDP de um peer e devolver a resposta
+
+        `capture`: captura do StreamService aberta para este peer; encerrada
+        quando não restar nenhum peer da câmera.
+        """
+        if not self.is_available():
+            raise RuntimeError("WebRTC indisponível (instale aiortc ou habilite WEBRTC_ENABLED)")
+
+        pc = RTCPeerConnection()
+        self.peer_connections.add(pc)
+        track = self._subscribe(camera_id)
+        if capture is not None:
+            self.adopt_capture(camera_id, capture)
+
+        @pc.on("connectionstatechange")
+        async def on_connectionstatechange():
+            logger.info(f"Peer WebRTC da câmera {camera_id}: {pc.connectionState}")
+            if pc.connectionState in ("failed", "closed"):
+                await self._close_peer(pc, track)
+
+        try:
+            sender = pc.addTrack(track)
+
+            # Forçar H.264 (antes de aplicar a oferta): os pacotes já codificados
+            # são repassados ao RTP sem recodificação
+            capabilities = RTCRtpSender.getCapabilities("video")
+            preferences = [c for c in capabilities.codecs if c.mimeType == "video/H264"]
+            for transceiver in pc.getTransceivers():
+                if transceiver.sender == sender:
+                    transceiver.setCodecPreferences(preferences)
+
+            await pc.setRemoteDescription(RTCSessionDescription(sdp=sdp, type=offer_type))
+            answer = await pc.createAnswer()
+            await pc.setLocalDescription(answer)
+        except Exception:
+            await self._close_peer(pc, track)
+            raise
+
+        return {"sdp": pc.localDescription.sdp, "type": pc.localDescription.type}
+
+    async def _close_peer(self, pc: "RTCPeerConnection", track: EncodedVideoTrack):
+        track.stop()
+        self.peer_connections.discard(pc)
+        await pc.close()
+        camera_id = track.encoder.camera_id
+        if not self.get_peer_count(camera_id):
+            await asyncio.get_running_loop().run_in_executor(None, self._release_capture, camera_id)
+
+    def adopt_capture(self, camera_id: int, capture):
+        """Assumir a captura aberta por outro consumidor (encerrada quando não houver peers)"""
+        self.owned_captures.setdefault(camera_id, capture)
+
+    def _release_capture(self, camera_id: int):
+        """Encerrar a captura aberta para o WebRTC (ou passá-la ao HLS ainda ativo)"""
+        capture = self.owned_captures.pop(camera_id, None)
+        if capture is None or stream_service.active_streams.get(camera_id) is not capture:
+            return
+        from services.hls_service import hls_service
+        if hls_service.adopt_capture(camera_id, capture):
+            return
+        logger.info(f"Encerrando captura aberta para o WebRTC da câmera {camera_id}")
+        stream_service.stop_stream(camera_id)
+
+    def get_peer_count(self, camera_id: int) -> int:
+        """Número de peers conectados a uma câmera"""
+        encoder = self.encoders.get(camera_id)
+        return len(encoder.subscribers) if encoder else 0
+
+    async def shutdown(self):
+        """Fechar todos os peers e codificadores"""
+        await asyncio.gather(*[pc.close() for pc in list(self.peer_connections)], return_exceptions=True)
+        self.peer_connections.clear()
+        for encoder in self.encoders.values():
+            if encoder.task and not encoder.task.done():
+                encoder.task.cancel()
+        self.encoders.clear()
+
+
+# Instância global do serviço
+webrtc_service = WebRTCService()
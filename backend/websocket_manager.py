@@ -1,13 +1,17 @@
-from typing import Set
+import asyncio
+from typing import Optional, Set
 from fastapi import WebSocket
 
 
 class WebSocketManager:
     def __init__(self) -> None:
         self.active: Set[WebSocket] = set()
+        # Loop do servidor, usado para enviar mensagens a partir de outras threads
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
 
     async def connect(self, ws: WebSocket) -> None:
         await ws.accept()
+        self.loop = asyncio.get_running_loop()
         self.active.add(ws)
 
     def disconnect(self, ws: WebSocket) -> None:
@@ -25,6 +29,13 @@ class WebSocketManager:
         for ws in stale:
             self.disconnect(ws)
 
+    def broadcast_threadsafe(self, data: dict) -> None:
+        # Agenda o envio no loop do servidor (para uso em threads de trabalho)
+        loop = self.loop
+        if not self.active or loop is None or loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.broadcast(data), loop)
+
 
 manager = WebSocketManager()
 
@@ -112,6 +112,12 @@ export interface EventStats {
   peak_hour?: number;
 }
 
+export interface EventTimelinePoint {
+  bucket: string;
+  total: number;
+  counts: Record<string, number>;
+}
+
 export interface CameraStats {
   total_cameras: number;
   online_cameras: number;
@@ -309,6 +315,20 @@ export const cameraService = {
     await api.post(`/cameras/${id}/configure-zone`, zoneConfig);
   },
 
+  // Obter política de retenção, limites efetivos e uso da câmera
+  getRetentionPolicy: async (id: number): Promise<any> => {
+    const response = await api.get(`/cameras/${id}/retention`);
+    return response.data;
+  },
+
+  // Configurar retenção (null = padrão global, 0 = sem limite)
+  configureRetentionPolicy: async (id: number, policy: {
+    retention_days?: number | null;
+    retention_max_mb?: number | null;
+  }): Promise<void> => {
+    await api.put(`/cameras/${id}/retention`, policy);
+  },
+
   // Obter estatísticas das câmeras
   getCameraStats: async (): Promise<CameraStats> => {
     const response = await api.get('/cameras/stats/summary');
@@ -372,6 +392,18 @@ export const eventService = {
     return response.data;
   },
 
+  // Obter série de eventos por hora/dia (gráficos do dashboard)
+  getEventTimeline: async (params?: {
+    interval?: 'hour' | 'day';
+    start_date?: string;
+    end_date?: string;
+    camera_id?: number;
+    event_type?: 'intrusion' | 'movement' | 'alert';
+  }): Promise<EventTimelinePoint[]> => {
+    const response = await api.get('/events/stats/timeline', { params });
+    return response.data;
+  },
+
   // Marcar evento como notificado
   markEventAsNotified: async (id: number): Promise<void> => {
     await api.post(`/events/${id}/mark-notified`);
@@ -383,11 +415,24 @@ export const eventService = {
     end_date?: string;
     camera_id?: number;
     event_type?: 'intrusion' | 'movement' | 'alert';
-  }): Promise<any[]> => {
+    format?: 'json' | 'ndjson' | 'csv';
+    compress?: boolean;
+  }): Promise<any> => {
     const response = await api.get('/events/export/data', { params });
     return response.data;
   },
 
+  // Excluir eventos em segundo plano (devolve a tarefa, acompanhada em /jobs)
+  bulkDeleteEvents: async (filters: {
+    camera_id?: number;
+    event_type?: 'intrusion' | 'movement' | 'alert';
+    start_date?: string;
+    end_date?: string;
+  }): Promise<any> => {
+    const response = await api.post('/events/bulk-delete', filters);
+    return response.data;
+  },
+
   // Obter dados do heatmap
   getHeatmapData: async (cameraId: number, dateRange?: string): Promise<any> => {
     const response = await api.get(`/events/heatmap/${cameraId}`, {